@@ -3,12 +3,29 @@ Olympus - Math Olympiad Learning Platform
 Production version with database, AI tutor, and real content
 """
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, jsonify, abort
 from config import config
 from models import db, migrate, User, Course, Question, Exam, Submission, ChatMessage, LiveClass
+from services.chat_hub import chat_hub, RedisBackend
+from services.chat_buffer import chat_buffer
+from services.ai_jobs import ai_jobs, QueueFullError
+from services.conversations import conversations
+from services.resilience import ModelUnavailableError
+from services.question_search import question_search
+from services.question_changes import question_changes
+from services.question_facets import question_facets
+from services.near_duplicates import near_duplicates
+from services.related_questions import related_questions
+from services.user_stats import user_stats, dashboard_summary
+from services.leaderboards import leaderboards
+from services.exam_sessions import exam_sessions, ExamSessionError
+from services.grading import grader
+from services.exam_papers import exam_papers
 # Import Gemini lazily to avoid Python 3.14 compatibility issues at startup
 # from services.gemini_tutor import gemini_tutor
 from datetime import datetime
+import click
+import json
 import os
 
 app = Flask(__name__)
@@ -18,6 +35,21 @@ app.config.from_object(config['development'])
 db.init_app(app)
 migrate.init_app(app, db)
 
+if app.config['CHAT_HUB_BACKEND'] == 'redis':
+    chat_hub.set_backend(RedisBackend(app.config['REDIS_URL']))
+chat_buffer.init_app(app)
+ai_jobs.init_app(app)
+conversations.init_app(app)
+question_search.init_app(app)
+question_changes.init_app(app)
+near_duplicates.init_app(app)
+question_facets.init_app(app)
+related_questions.init_app(app)
+user_stats.init_app(app)
+leaderboards.init_app(app)
+exam_sessions.init_app(app)
+exam_papers.init_app(app)
+
 # Context processor for templates
 @app.context_processor
 def inject_user():
@@ -120,6 +152,16 @@ def logout():
 # PROTECTED ROUTES
 # ============================================================================
 
+def sse_event(data, event=None, event_id=None):
+    """Format one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
 def login_required(f):
     """Decorator to check if user is logged in"""
     def wrapper(*args, **kwargs):
@@ -134,31 +176,26 @@ def login_required(f):
 @login_required
 def dashboard():
     user_id = session['user']['id']
-    user = User.query.get(user_id)
     
     # Redirect teachers/admins to teacher panel
-    if user.role in ['teacher', 'admin']:
+    if session['user'].get('role') in ['teacher', 'admin']:
         return redirect(url_for('teacher_panel'))
     
-    # Student dashboard
-    submissions = Submission.query.filter_by(user_id=user_id).all()
-    avg_score = sum([s.score for s in submissions]) / len(submissions) if submissions else 0
+    # Student dashboard: one user_stats row plus the cached site-wide summary
+    record = user_stats.get(user_id)
+    completed = record.attempt_count if record else 0
     
     stats = {
-        'enrolled_courses': Course.query.filter_by(is_published=True).count(),
-        'completed_exams': len(submissions),
-        'learning_hours': len(submissions) * 1.5,
-        'avg_score': int(avg_score)
+        'enrolled_courses': dashboard_summary.get()['enrolled_courses'],
+        'completed_exams': completed,
+        'learning_hours': completed * 1.5,
+        'avg_score': int(record.avg_score) if record else 0
     }
     
-    upcoming_classes = LiveClass.query.filter(
-        LiveClass.scheduled_start > datetime.utcnow()
-    ).order_by(LiveClass.scheduled_start).limit(5).all()
-    
-    # Get recent submissions for activity feed
-    recent_submissions = Submission.query.filter_by(user_id=user_id).order_by(Submission.submitted_at.desc()).limit(5).all()
-    
-    return render_template('dashboard.html', stats=stats, upcoming_classes=upcoming_classes, recent_submissions=recent_submissions)
+    return render_template('dashboard.html',
+                         stats=stats,
+                         upcoming_classes=dashboard_summary.upcoming_classes(),
+                         recent_submissions=record.recent_activity() if record else [])
 
 @app.route('/courses')
 def courses():
@@ -187,10 +224,137 @@ def exams():
                          completed_exams=completed_exams,
                          submissions={s.exam_id: s for s in completed_submissions})
 
-@app.route('/questions')
+def published_exam_or_404(exam_id):
+    exam = db.session.get(Exam, exam_id)
+    if exam is None or not exam.is_published:
+        abort(404)
+    return exam
+
+def released_paper(exam_id):
+    """
+    The exam's pre-rendered paper once its start time has passed, else an error response.
+    Release is decided from the exam row, never from the cached paper.
+    Returns:
+        (exam, paper, None) or (None, None, error response)
+    """
+    exam = db.session.get(Exam, exam_id)
+    if exam is None or not exam.is_published:
+        return None, None, (jsonify({'error': 'Exam not found'}), 404)
+    if exam.scheduled_date and datetime.utcnow() < exam.scheduled_date:
+        wait = int((exam.scheduled_date - datetime.utcnow()).total_seconds()) + 1
+        return None, None, (jsonify({'error': 'পরীক্ষা এখনও শুরু হয়নি', 'starts_in': wait}),
+                            403, {'Retry-After': str(wait)})
+    paper = exam_papers.get(exam_id, revision=exam.paper_revision or 0)
+    if paper is None:
+        return None, None, (jsonify({'error': 'Exam not found'}), 404)
+    return exam, paper, None
+
+@app.route('/api/exams/<int:exam_id>/start', methods=['POST'])
 @login_required
-def questions():
-    # Get all olympiad questions
+def start_exam(exam_id):
+    """Open or resume the student's attempt; the questions come from the pre-rendered paper URLs"""
+    exam, paper, error = released_paper(exam_id)
+    if error:
+        return error
+    try:
+        attempt = exam_sessions.start(exam, session['user']['id'])
+    except ExamSessionError as e:
+        return jsonify({'error': str(e)}), e.status
+    
+    return jsonify({
+        'exam': exam.to_dict(),
+        'attempt': attempt,
+        'paper': {
+            'etag': paper.etag,
+            'json': url_for('exam_paper_version', exam_id=exam_id, etag=paper.etag, fmt='json'),
+            'html': url_for('exam_paper_version', exam_id=exam_id, etag=paper.etag, fmt='html')
+        }
+    })
+
+def paper_response(paper, fmt):
+    if fmt == 'html':
+        return Response(paper.body_html, mimetype='text/html')
+    return Response(paper.body_json, mimetype='application/json')
+
+@app.route('/api/exams/<int:exam_id>/paper', methods=['GET'])
+@login_required
+def exam_paper(exam_id):
+    """Current paper (?format=json|html); revalidates by ETag"""
+    _, paper, error = released_paper(exam_id)
+    if error:
+        return error
+    response = paper_response(paper, request.args.get('format', 'json'))
+    response.set_etag(paper.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/exams/<int:exam_id>/paper/<etag>.<any(json, html):fmt>', methods=['GET'])
+@login_required
+def exam_paper_version(exam_id, etag, fmt):
+    """One rendered version of a paper; its URL changes with its content, so it is cached for a year"""
+    _, paper, error = released_paper(exam_id)
+    if error:
+        return error
+    if etag != paper.etag:
+        return redirect(url_for('exam_paper_version', exam_id=exam_id, etag=paper.etag, fmt=fmt))
+    response = paper_response(paper, fmt)
+    response.set_etag(paper.etag)
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response.make_conditional(request)
+
+@app.route('/api/exams/<int:exam_id>/autosave', methods=['POST'])
+@login_required
+def autosave_exam(exam_id):
+    """Accept only the answers changed since the last autosave: {"answers": {question_id: answer}, "seq": n}"""
+    data = request.get_json(silent=True) or {}
+    changes = data.get('answers')
+    if not isinstance(changes, dict):
+        return jsonify({'error': 'answers must be an object'}), 400
+    try:
+        result = exam_sessions.autosave(exam_id, session['user']['id'], changes, data.get('seq'))
+    except ExamSessionError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify(result)
+
+@app.route('/api/exams/<int:exam_id>/submit', methods=['POST'])
+@login_required
+def submit_exam(exam_id):
+    """Submit the attempt; safe to retry, every call returns the same submission"""
+    changes = (request.get_json(silent=True) or {}).get('answers') or {}
+    if not isinstance(changes, dict):
+        return jsonify({'error': 'answers must be an object'}), 400
+    try:
+        submission = exam_sessions.submit(exam_id, session['user']['id'], changes)
+    except ExamSessionError as e:
+        return jsonify({'error': str(e)}), e.status
+    return jsonify({'success': True, 'submission': submission.to_dict()})
+
+@app.route('/api/exams/<int:exam_id>/leaderboard', methods=['GET'])
+@login_required
+def exam_leaderboard(exam_id):
+    """Top students for an exam from the cached snapshot"""
+    published_exam_or_404(exam_id)
+    snapshot = leaderboards.snapshot(exam_id)
+    limit = max(1, min(request.args.get('limit', 20, type=int), leaderboards.snapshot_size))
+    response = jsonify(dict(snapshot, entries=snapshot['entries'][:limit]))
+    # Student names are only for logged-in users: browsers may reuse it, shared caches may not
+    response.headers['Cache-Control'] = f'private, max-age={leaderboards.snapshot_ttl}'
+    return response
+
+@app.route('/api/exams/<int:exam_id>/rank', methods=['GET'])
+@login_required
+def exam_rank(exam_id):
+    """The logged-in student's rank and percentile for an exam"""
+    published_exam_or_404(exam_id)
+    rank = leaderboards.rank(exam_id, session['user']['id'])
+    if rank is None:
+        return jsonify({'error': 'এই পরীক্ষায় আপনার কোনো জমা নেই'}), 404
+    response = jsonify(dict(rank, exam_id=exam_id))
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def filtered_questions():
+    """Question query with the topic/difficulty filters from the request args"""
     topic = request.args.get('topic', '')
     difficulty = request.args.get('difficulty', '')
     
@@ -199,13 +363,78 @@ def questions():
         query = query.filter_by(topic=topic)
     if difficulty:
         query = query.filter_by(difficulty=difficulty)
-    
-    all_questions = query.order_by(Question.created_at.desc()).all()
-    topics = db.session.query(Question.topic).distinct().all()
+    return query
+
+@app.route('/questions')
+@login_required
+def questions():
+    # One page of olympiad questions; later pages are fetched from /api/questions
+    try:
+        page, next_cursor = Question.keyset_page(
+            filtered_questions(), request.args.get('cursor'), app.config['ITEMS_PER_PAGE']
+        )
+    except ValueError:
+        return redirect(url_for('questions', topic=request.args.get('topic', ''),
+                                difficulty=request.args.get('difficulty', '')))
+    facets = question_facets.get()
     
     return render_template('questions.html', 
-                         questions=all_questions, 
-                         topics=[t[0] for t in topics])
+                         questions=page, 
+                         related=related_questions.for_questions([q.id for q in page]),
+                         next_cursor=next_cursor,
+                         topics=sorted(facets['topic']),
+                         facets=facets)
+
+@app.route('/api/questions', methods=['GET'])
+@login_required
+def api_questions():
+    """
+    Keyset-paginated questions for infinite scroll.
+    Query args: topic, difficulty, cursor (next_cursor of the previous page), limit
+    """
+    limit = max(1, min(request.args.get('limit', app.config['ITEMS_PER_PAGE'], type=int), 100))
+    try:
+        page, next_cursor = Question.keyset_page(filtered_questions(), request.args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return jsonify({
+        'questions': [dict(q.to_dict(), related=related_questions.related(q.id)) for q in page],
+        'next_cursor': next_cursor
+    })
+
+@app.route('/api/questions/<int:question_id>/related', methods=['GET'])
+@login_required
+def api_related_questions(question_id):
+    """Precomputed similar questions by topic and content (served from memory)"""
+    return jsonify({'question_id': question_id, 'related': related_questions.related(question_id)})
+
+@app.route('/api/questions/facets', methods=['GET'])
+@login_required
+def api_question_facets():
+    """Question counts per topic, difficulty and source (served from memory)"""
+    return jsonify(question_facets.get())
+
+@app.route('/api/questions/search', methods=['GET'])
+@login_required
+def search_questions():
+    """
+    Ranked full-text search over the question bank.
+    Query args: q, topic, difficulty, limit
+    Snippets are HTML-escaped with matches wrapped in <mark>.
+    """
+    query_text = request.args.get('q', '').strip()
+    if not query_text:
+        return jsonify({'error': 'Search text required'}), 400
+    
+    limit = max(1, min(request.args.get('limit', app.config['ITEMS_PER_PAGE'], type=int), 100))
+    results, took_ms = question_search.search(
+        query_text,
+        limit=limit,
+        topic=request.args.get('topic') or None,
+        difficulty=request.args.get('difficulty') or None
+    )
+    return jsonify({'results': results, 'took_ms': took_ms})
 
 @app.route('/classes')
 @login_required
@@ -247,13 +476,50 @@ def teacher_panel():
     
     # Recent activity
     recent_students = User.query.filter_by(role='student').order_by(User.created_at.desc()).limit(5).all()
-    recent_messages = ChatMessage.query.order_by(ChatMessage.created_at.desc()).limit(10).all()
+    recent_messages = ChatMessage.query_with_author().order_by(ChatMessage.created_at.desc()).limit(10).all()
     
     return render_template('teacher_panel.html', 
                          stats=stats,
                          recent_students=recent_students,
                          recent_messages=recent_messages)
 
+@app.route('/teacher/duplicates')
+@login_required
+def duplicate_questions():
+    """Possible duplicate problems in the question bank, for admins to review"""
+    if session['user'].get('role') not in ['teacher', 'admin']:
+        flash('এই পেজে প্রবেশের অনুমতি নেই', 'danger')
+        return redirect(url_for('dashboard'))
+    
+    threshold = request.args.get('threshold', near_duplicates.threshold, type=float)
+    pairs = near_duplicates.pairs(threshold=threshold)
+    ids = {qid for pair in pairs for qid in pair[:2]}
+    questions = {q.id: q for q in Question.query.filter(Question.id.in_(ids))} if ids else {}
+    
+    return render_template('duplicates.html',
+                         pairs=[(questions[a], questions[b], score) for a, b, score in pairs
+                                if a in questions and b in questions],
+                         threshold=threshold)
+
+@app.route('/teacher/exams/<int:exam_id>/regrade', methods=['POST'])
+@login_required
+def regrade_exam_submissions(exam_id):
+    """Correct answer keys ({"answer_key": {question_id: key}}) and rescore every submission"""
+    if session['user'].get('role') not in ['teacher', 'admin']:
+        return jsonify({'error': 'Forbidden'}), 403
+    db.get_or_404(Exam, exam_id)
+    
+    data = request.get_json(silent=True) or {}
+    corrections = data.get('answer_key') or {}
+    if not isinstance(corrections, dict):
+        return jsonify({'error': 'answer_key must be an object'}), 400
+    try:
+        corrections = grader.validate_corrections(exam_id, corrections)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # A dry run grades with the corrected key in memory and saves neither the key nor the scores
+    return jsonify(grader.regrade(exam_id, dry_run=bool(data.get('dry_run')), corrections=corrections))
+
 # ============================================================================
 # AI TUTOR
 # ============================================================================
@@ -264,59 +530,293 @@ def ai_chat():
     """AI Chat is a locked feature - requires login"""
     return render_template('ai_chat.html')
 
+def precomputed_answer(question):
+    """Stored Bangla solution of a bank question quoted in the prompt, used while the model is unavailable"""
+    from services.question_ingest import content_hash
+    
+    # The statement may be the whole prompt, follow a lead-in ("Solve this:") or sit on its own line;
+    # each candidate is hashed like stored statements so the lookup uses the content_hash index
+    lines = question.splitlines()
+    candidates = {question, question.split(':', 1)[-1], '\n'.join(lines[1:]), *lines}
+    hashes = [content_hash(candidate) for candidate in candidates if candidate.strip()]
+    with app.app_context():
+        match = Question.query.filter(
+            Question.content_hash.in_(hashes),
+            Question.solution_bangla.isnot(None)
+        ).first()
+        return match.solution_bangla if match else None
+
+def get_gemini_tutor():
+    """Import the tutor lazily (Python 3.14 startup issues) and register app fallbacks once"""
+    from services.gemini_tutor import gemini_tutor
+    if precomputed_answer not in gemini_tutor.fallbacks:
+        gemini_tutor.fallbacks.append(precomputed_answer)
+    return gemini_tutor
+
+def load_ai_request():
+    """
+    Read the question and its history from an AI request body.
+    Bodies with a conversation_id key (null starts a new conversation) use
+    server-side memory and record the question there; others may send their
+    own short context.
+    Returns:
+        (question, context, summary, conversation_id)
+    """
+    data = request.get_json() or {}
+    question = data.get('message', '').strip()
+    if not question or 'conversation_id' not in data:
+        return question, data.get('context', []), None, None
+    
+    conversation = conversations.get_or_create(session['user']['id'], data['conversation_id'])
+    summary, context = conversations.history(conversation)
+    conversations.add_question(conversation, question)
+    return question, context, summary, conversation.id
+
 @app.route('/api/ai/ask', methods=['POST'])
 @login_required
 def ai_ask():
     """AI Chat API - requires authentication"""
     # Lazy import to avoid Python 3.14 startup issues
     try:
-        from services.gemini_tutor import gemini_tutor
+        gemini_tutor = get_gemini_tutor()
     except Exception as e:
         return jsonify({
             'error': f'AI টিউটর লোড করতে সমস্যা হয়েছে। Error: {str(e)}',
             'details': 'Gemini API initialization failed. Please check API key and Python version compatibility.'
         }), 500
     
-    data = request.get_json()
-    question = data.get('message', '')
-    context = data.get('context', [])
+    question, context, summary, conversation_id = load_ai_request()
     
     if not question:
         return jsonify({'error': 'প্রশ্ন লিখুন'}), 400
     
     # Get response from Gemini
     try:
-        response = gemini_tutor.ask(question, context)
+        response = gemini_tutor.ask(question, context, summary, raise_errors=True)
+        if conversation_id:
+            conversations.record_answer(conversation_id, response)
         return jsonify({
             'response': response,
+            'conversation_id': conversation_id,
             'timestamp': datetime.utcnow().isoformat(),
             'status': 'success'
         })
+    except ModelUnavailableError as e:
+        return jsonify({
+            'error': 'AI টিউটর এখন ব্যস্ত, একটু পরে আবার চেষ্টা করো',
+            'details': str(e)
+        }), 503, {'Retry-After': '10'}
     except Exception as e:
         return jsonify({
             'error': 'AI টিউটর রেসপন্স দিতে ব্যর্থ হয়েছে',
             'details': str(e)
         }), 500
 
+@app.route('/api/ai/ask/stream', methods=['POST'])
+@login_required
+def ai_ask_stream():
+    """
+    Streaming AI Chat API - relays the answer as Server-Sent Events.
+    Events: `conversation` with the conversation id (memory mode only),
+    unnamed events carrying {"text": chunk}, then `done`, or `error` if the
+    model fails part way through.
+    """
+    try:
+        gemini_tutor = get_gemini_tutor()
+    except Exception as e:
+        return jsonify({
+            'error': f'AI টিউটর লোড করতে সমস্যা হয়েছে। Error: {str(e)}',
+            'details': 'Gemini API initialization failed. Please check API key and Python version compatibility.'
+        }), 500
+    
+    question, context, summary, conversation_id = load_ai_request()
+    
+    if not question:
+        return jsonify({'error': 'প্রশ্ন লিখুন'}), 400
+    
+    def generate():
+        try:
+            if conversation_id:
+                yield sse_event({'conversation_id': conversation_id}, event='conversation')
+            chunks = []
+            for chunk in gemini_tutor.ask_stream(question, context, summary):
+                chunks.append(chunk)
+                yield sse_event({'text': chunk})
+            if conversation_id:
+                conversations.record_answer(conversation_id, ''.join(chunks))
+            yield sse_event({'timestamp': datetime.utcnow().isoformat()}, event='done')
+        except Exception as e:
+            print(f"Error in Gemini stream: {e}")
+            yield sse_event({
+                'error': 'AI টিউটর রেসপন্স দিতে ব্যর্থ হয়েছে',
+                'details': str(e)
+            }, event='error')
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/ai/jobs', methods=['POST'])
+@login_required
+def ai_submit_job():
+    """
+    Queue an AI question on the background pool.
+    Returns 202 with a job id to poll, or 503 right away when the pool is full.
+    """
+    try:
+        gemini_tutor = get_gemini_tutor()
+    except Exception as e:
+        return jsonify({
+            'error': f'AI টিউটর লোড করতে সমস্যা হয়েছে। Error: {str(e)}',
+            'details': 'Gemini API initialization failed. Please check API key and Python version compatibility.'
+        }), 500
+    
+    question, context, summary, conversation_id = load_ai_request()
+    
+    if not question:
+        return jsonify({'error': 'প্রশ্ন লিখুন'}), 400
+    
+    def answer():
+        response = gemini_tutor.ask(question, context, summary, raise_errors=True)
+        if conversation_id:
+            conversations.record_answer(conversation_id, response)
+        return response
+    
+    try:
+        job = ai_jobs.submit(session['user']['id'], answer)
+    except QueueFullError as e:
+        return jsonify({
+            'error': 'AI টিউটর এখন ব্যস্ত, একটু পরে আবার চেষ্টা করো',
+            'details': str(e)
+        }), 503, {'Retry-After': '5'}
+    
+    return jsonify(dict(job.to_dict(), conversation_id=conversation_id)), 202
+
+@app.route('/api/ai/jobs/<job_id>', methods=['GET'])
+@login_required
+def ai_job_status(job_id):
+    """Status and, once finished, the result of a queued AI job"""
+    job = ai_jobs.get(job_id)
+    if not job or job.owner_id != session['user']['id']:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job.to_dict())
+
+@app.route('/api/ai/status', methods=['GET'])
+@login_required
+def ai_status():
+    """Circuit breaker state, latency percentiles and cache/queue stats for staff"""
+    if session['user'].get('role') not in ['teacher', 'admin']:
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        gemini_tutor = get_gemini_tutor()
+    except Exception as e:
+        return jsonify({'error': f'AI টিউটর লোড করতে সমস্যা হয়েছে। Error: {str(e)}'}), 500
+    
+    return jsonify(dict(gemini_tutor.status(), jobs=ai_jobs.stats()))
+
+@app.route('/api/ai/conversations/<int:conversation_id>', methods=['GET'])
+@login_required
+def ai_conversation(conversation_id):
+    """Stored turns of a tutor conversation, so the chat survives reloads"""
+    conversation = conversations.get(session['user']['id'], conversation_id)
+    if not conversation:
+        return jsonify({'error': 'Conversation not found'}), 404
+    
+    return jsonify(conversation.to_dict())
+
 # ============================================================================
 # LIVE CLASS CHAT API
 # ============================================================================
 
+def fetch_chat_page(class_id, since_id=None, limit=None):
+    """
+    Serialized messages after the since_id cursor, or the latest page when no
+    cursor is given. Served from the in-memory buffer when it covers the cursor.
+    """
+    limit = limit or app.config['CHAT_PAGE_LIMIT']
+    messages = chat_buffer.messages(class_id, since_id, limit)
+    if messages is not None:
+        return messages
+    
+    query = ChatMessage.query_with_author().filter_by(live_class_id=class_id)
+    if not since_id:
+        # Ended classes are not buffered: their latest page comes from the table
+        return [msg.to_dict() for msg in reversed(query.order_by(ChatMessage.id.desc()).limit(limit).all())]
+    messages = query.filter(ChatMessage.id > since_id).order_by(ChatMessage.id).limit(limit).all()
+    return [msg.to_dict() for msg in messages]
+
 @app.route('/api/chat/messages', methods=['GET'])
 def get_chat_messages():
-    class_id = request.args.get('class_id')
+    """
+    Incremental chat feed.
+    Query args:
+        class_id: Live class to read (defaults to the current live class)
+        since_id: Only return messages with id greater than this cursor
+        limit: Max messages per response (capped at CHAT_PAGE_LIMIT)
+    Without since_id the latest `limit` messages are returned, oldest first.
+    """
+    class_id = request.args.get('class_id', type=int)
+    since_id = request.args.get('since_id', type=int)
+    max_limit = app.config['CHAT_PAGE_LIMIT']
+    limit = max(1, min(request.args.get('limit', max_limit, type=int), max_limit))
     
-    if class_id:
-        messages = ChatMessage.query.filter_by(live_class_id=int(class_id)).order_by(ChatMessage.created_at).all()
-    else:
+    if not class_id:
         # Get latest class messages
         latest_class = LiveClass.query.filter_by(is_live=True).first()
-        if latest_class:
-            messages = ChatMessage.query.filter_by(live_class_id=latest_class.id).order_by(ChatMessage.created_at).all()
-        else:
-            messages = []
+        if not latest_class:
+            return jsonify([])
+        class_id = latest_class.id
     
-    return jsonify([msg.to_dict() for msg in messages])
+    return jsonify(fetch_chat_page(class_id, since_id, limit))
+
+@app.route('/api/chat/stream', methods=['GET'])
+def stream_chat_messages():
+    """
+    Server-Sent Events stream of new chat messages for a live class.
+    Query args:
+        class_id: Live class to follow (defaults to the current live class)
+        since_id: Replay stored messages after this id before going live
+    Browsers resend the last event id on reconnect, which is used as the cursor.
+    """
+    class_id = request.args.get('class_id', type=int)
+    since_id = request.args.get('since_id', type=int) or request.headers.get('Last-Event-ID', type=int) or 0
+    heartbeat = app.config['CHAT_STREAM_HEARTBEAT']
+    
+    if not class_id:
+        latest_class = LiveClass.query.filter_by(is_live=True).first()
+        if not latest_class:
+            return jsonify({'error': 'No live class'}), 404
+        class_id = latest_class.id
+    
+    # Subscribe before reading the backlog so nothing published in between is lost
+    sub = chat_hub.subscribe(class_id)
+    backlog = fetch_chat_page(class_id, since_id)
+    db.session.remove()
+    
+    def generate():
+        last_id = since_id
+        try:
+            for message in backlog:
+                last_id = message['id']
+                yield sse_event(message, event_id=message['id'])
+            
+            while not sub.closed:
+                message = sub.get(timeout=heartbeat)
+                if message is None:
+                    yield ': keep-alive\n\n'
+                elif message['id'] > last_id:
+                    last_id = message['id']
+                    yield sse_event(message, event_id=message['id'])
+        finally:
+            chat_hub.unsubscribe(sub)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @app.route('/api/chat/send', methods=['POST'])
 @login_required
@@ -328,23 +828,19 @@ def send_chat_message():
     if not message_text:
         return jsonify({'error': 'Message required'}), 400
     
-    user_id = session['user']['id']
-    
     # Get or create current live class
     if class_id:
         live_class = LiveClass.query.get(class_id)
     else:
         live_class = LiveClass.query.filter_by(is_live=True).first()
+    live_class_id = live_class.id if live_class else None
     
-    msg = ChatMessage(
-        user_id=user_id,
-        live_class_id=live_class.id if live_class else None,
-        message=message_text
-    )
-    db.session.add(msg)
-    db.session.commit()
+    # Written to the database in the next batch; publishing puts it in every worker's buffer
+    message = chat_buffer.append(session['user'], live_class_id, message_text)
+    if live_class_id:
+        chat_hub.publish(live_class_id, message)
     
-    return jsonify(msg.to_dict())
+    return jsonify(message)
 
 # ============================================================================
 # ERROR HANDLERS
@@ -369,6 +865,12 @@ def init_db():
     db.create_all()
     print("✅ Database initialized")
 
+@app.cli.command()
+def rebuild_search_index():
+    """Create the question search index if needed and re-index all questions"""
+    question_search.rebuild()
+    print(f"✅ Search index rebuilt for {Question.query.count()} questions")
+
 @app.cli.command()
 def seed_db():
     """Seed database with sample data"""
@@ -427,6 +929,204 @@ def seed_db():
     db.session.commit()
     print("✅ Database seeded with sample data")
 
+@app.cli.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=2000, show_default=True, help='Questions per insert transaction')
+@click.option('--skip-near-duplicates', is_flag=True, help='Drop reworded copies of stored questions instead of flagging them')
+@click.option('--upsert', is_flag=True, help='Update solutions and metadata of questions already stored')
+def ingest_questions(path, batch_size, skip_near_duplicates, upsert):
+    """Bulk-load questions from a JSON Lines file (.jsonl or .jsonl.gz), skipping duplicates"""
+    import gzip
+    from services.question_ingest import QuestionIngestor
+    
+    if db.engine.dialect.name == 'sqlite':
+        # The LSH and search index B-trees quickly outgrow SQLite's default 2 MB page cache
+        db.session.execute(db.text('PRAGMA cache_size = -262144'))
+    
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        records = (json.loads(line) for line in f if line.strip())
+        report = QuestionIngestor(batch_size=batch_size).ingest(
+            records, skip_near_duplicates=skip_near_duplicates, upsert=upsert
+        )
+    print(f"✅ Ingested {report['inserted']} of {report['received']} questions "
+          f"({report['duplicates_existing']} already stored, {report['updated']} updated, {report['duplicates_in_input']} repeated, "
+          f"{report['invalid']} invalid, {report['near_duplicates']} near-duplicates "
+          f"{'skipped' if skip_near_duplicates else 'flagged'})")
+
+@app.cli.command()
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+def export_questions(path):
+    """Stream the question bank to a JSON Lines file (.jsonl or .jsonl.gz) for ingest-questions"""
+    import gzip
+    from services.question_ingest import ingestor
+    
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8') as f:
+        written = ingestor.export(f)
+    print(f"✅ Exported {written} questions to {path}")
+
+@app.cli.command()
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='Only recompute these users (repeatable)')
+def rebuild_user_stats(user_ids):
+    """Recompute per-student dashboard stats from the submissions table"""
+    rebuilt = user_stats.rebuild(list(user_ids) or None)
+    print(f"✅ Rebuilt dashboard stats for {rebuilt} students")
+
+@app.cli.command()
+@click.option('--minutes', default=24 * 60, show_default=True, help='Render exams starting within this many minutes')
+@click.option('--exam-id', 'exam_ids', type=int, multiple=True, help='Render these exams regardless of schedule (repeatable)')
+@click.option('--force', is_flag=True, help='Re-render papers that were already rendered')
+def render_exam_papers(minutes, exam_ids, force):
+    """Pre-render exam papers so candidates never wait on question queries at the start time"""
+    if exam_ids:
+        for exam_id in exam_ids:
+            if force:
+                exam_papers.invalidate(exam_id)
+            paper = exam_papers.get(exam_id)
+            print(f"✅ Exam {exam_id}: {paper.etag}" if paper else f"❌ Exam {exam_id} not found")
+        return
+    rendered = exam_papers.prerender_due(minutes=minutes, force=force)
+    print(f"✅ Rendered {rendered} exam papers")
+
+@app.cli.command()
+@click.argument('exam_id', type=int)
+@click.option('--dry-run', is_flag=True, help='Report how many scores would change without saving')
+def regrade_exam(exam_id, dry_run):
+    """Rescore every submission of an exam against its current answer key"""
+    if not db.session.get(Exam, exam_id):
+        print(f"❌ Exam {exam_id} not found")
+        return
+    report = grader.regrade(exam_id, dry_run=dry_run)
+    print(f"✅ Regraded {report['submissions']} submissions in {report['total_seconds']}s "
+          f"(load {report['load_seconds']}s, scoring {report['score_seconds']}s): "
+          f"{report['changed']} scores {'would change' if dry_run else 'changed'} for {report['students']} students")
+
+@app.cli.command()
+@click.option('--submissions', 'sizes', type=int, multiple=True, help='Submission counts to time (default 10000 and 100000)')
+@click.option('--questions', default=25, show_default=True, help='Questions per exam')
+@click.option('--parts', default=2, show_default=True, help='Answer parts per question')
+def benchmark_grading(sizes, questions, parts):
+    """Time vectorized grading against per-submission scoring on synthetic answers"""
+    import random
+    import time
+    from services.grading import AnswerKey
+    
+    key_values = [[str(random.randrange(1000)) for _ in range(parts)] for _ in range(questions)]
+    key = AnswerKey([(q, random.randint(1, 5), ';'.join(values), True) for q, values in enumerate(key_values)])
+    
+    for size in sizes or (10000, 100000):
+        answers = [{
+            str(q): ';'.join(value if random.random() < 0.6 else str(random.randrange(1000)) for value in values)
+            for q, values in enumerate(key_values) if random.random() < 0.9
+        } for _ in range(size)]
+        
+        start = time.time()
+        codes = key.encode(answers)
+        encoded = time.time()
+        vectorized = key.score_codes(codes)
+        scored = time.time()
+        looped = [int(key.score([submission])[0]) for submission in answers[:min(size, 5000)]]
+        per_row = (time.time() - scored) / len(looped)
+        
+        assert looped == vectorized[:len(looped)].tolist()
+        print(f"✅ {size} submissions x {questions} questions: encode {encoded - start:.2f}s, "
+              f"score {scored - encoded:.3f}s; one at a time ~{per_row * size:.1f}s")
+
+@app.cli.command()
+@click.option('--missing-only', is_flag=True, help='Only sign questions that have no MinHash signature yet')
+def rebuild_duplicate_index(missing_only):
+    """Recompute MinHash signatures and the LSH near-duplicate index"""
+    indexed = near_duplicates.rebuild(missing_only=missing_only)
+    print(f"✅ Near-duplicate index rebuilt for {indexed} questions")
+
+@app.cli.command()
+@click.argument('urls', nargs=-1)
+@click.option('--index', 'index_url', help='Topic index page whose links are crawled too')
+@click.option('--pattern', help='Regex the index links must match')
+@click.option('--workers', type=int, help='Concurrent fetches (default SCRAPER_WORKERS)')
+@click.option('--all', 'reparse_all', is_flag=True, help='Reparse pages that have not changed since the last run')
+def scrape_questions(urls, index_url, pattern, workers, reparse_all):
+    """Crawl AoPS pages concurrently and save new problems"""
+    from services.question_scraper import scraper
+    
+    if not urls and not index_url:
+        print("❌ Give at least one URL or --index")
+        return
+    questions, stats = scraper.crawl(urls, index_url=index_url, link_pattern=pattern,
+                                     only_changed=not reparse_all, workers=workers)
+    saved = scraper.save_questions_to_db(questions)
+    print(f"✅ Crawled {stats['pages']} pages: {stats['parsed']} parsed, {stats['unchanged']} unchanged, "
+          f"{stats['failed']} failed; {saved} new questions")
+
+@app.cli.command()
+@click.option('--workers', default=4, show_default=True, help='Concurrent model calls')
+@click.option('--limit', type=int, help='Stop after this many questions')
+@click.option('--retries', default=3, show_default=True, help='Retries per question')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and retry earlier failures')
+def generate_bangla_solutions(workers, limit, retries, restart):
+    """Pre-generate Bangla explanations for questions that lack one"""
+    from services.gemini_tutor import gemini_tutor
+    from services.bangla_solutions import BanglaSolutionJob
+    
+    os.makedirs(app.instance_path, exist_ok=True)
+    job = BanglaSolutionJob(
+        gemini_tutor,
+        os.path.join(app.instance_path, 'bangla_solutions.checkpoint.json'),
+        workers=workers,
+        retries=retries
+    )
+    result = job.run(limit=limit, restart=restart)
+    print(f"✅ Generated {result['generated']} Bangla solutions ({result['failed']} failed)")
+
+@app.cli.command()
+@click.option('--requests', 'total', default=200, show_default=True, help='Requests to send')
+@click.option('--concurrency', default=20, show_default=True, help='Concurrent clients')
+@click.option('--distinct', default=50, show_default=True, help='Distinct questions (lower = more cache hits)')
+@click.option('--endpoint', type=click.Choice(['ask', 'stream']), default='ask', show_default=True)
+def benchmark_ai(total, concurrency, distinct, endpoint):
+    """Load-test the AI endpoints in-process (use AI_BACKEND=stub to run offline)"""
+    import random
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    
+    if app.config['AI_BACKEND'] != 'stub':
+        print("⚠️  AI_BACKEND is not 'stub' - this will call the real Gemini API")
+    
+    user = User.query.first()
+    if not user:
+        print("❌ Create a user first (flask seed-db)")
+        return
+    session_user = user.to_dict()
+    url = '/api/ai/ask' if endpoint == 'ask' else '/api/ai/ask/stream'
+    
+    def one_request(i):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user'] = session_user
+        question = f'অনুশীলন প্রশ্ন #{random.randrange(distinct)}: n² + 19n + 23 কখন পূর্ণবর্গ?'
+        start = time.time()
+        response = client.post(url, json={'message': question})
+        response.get_data()
+        return response.status_code, time.time() - start
+    
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(total)))
+    elapsed = time.time() - start
+    
+    latencies = sorted(latency for _, latency in results)
+    codes = {}
+    for code, _ in results:
+        codes[code] = codes.get(code, 0) + 1
+    
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000)
+    
+    print(f"✅ {total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s), status codes {codes}")
+    print(f"   latency ms: p50={percentile(50)} p95={percentile(95)} p99={percentile(99)}")
+    print(f"   tutor: {json.dumps(get_gemini_tutor().status(), ensure_ascii=False)}")
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
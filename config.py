@@ -12,12 +12,79 @@ class Config:
     # Gemini AI
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
     
+    # AI backend: gemini, or stub for offline load testing
+    AI_BACKEND = os.getenv('AI_BACKEND', 'gemini')
+    AI_STUB_LATENCY_MS = int(os.getenv('AI_STUB_LATENCY_MS', 800))  # Median simulated latency
+    AI_STUB_DISTRIBUTION = os.getenv('AI_STUB_DISTRIBUTION', 'lognormal')  # fixed, uniform, lognormal
+    AI_STUB_ERROR_RATE = float(os.getenv('AI_STUB_ERROR_RATE', 0))  # Fraction of calls that fail
+    AI_STUB_CHUNK_CHARS = 40  # Characters per streamed chunk
+    AI_STUB_SEED = os.getenv('AI_STUB_SEED')
+    
+    # AI backend resilience
+    AI_MAX_IN_FLIGHT = int(os.getenv('AI_MAX_IN_FLIGHT', 8))  # Concurrent model calls across the process
+    AI_CALL_TIMEOUT = int(os.getenv('AI_CALL_TIMEOUT', 30))  # Seconds before a model call is abandoned
+    AI_BREAKER_THRESHOLD = 5  # Consecutive failures that open the circuit breaker
+    AI_BREAKER_RESET = 30  # Seconds the breaker stays open before a trial call
+    
+    # AI prompt budget
+    AI_PROMPT_MAX_CHARS = int(os.getenv('AI_PROMPT_MAX_CHARS', 12000))  # Whole prompt incl. system prefix
+    AI_PROMPT_TURN_MAX_CHARS = 2000  # Longer history turns are clipped
+    
+    # AI conversation memory
+    AI_CONVERSATION_KEEP_TURNS = 8  # Recent turns kept verbatim
+    AI_CONVERSATION_SUMMARY_CHARS = 1500  # Cap on the rolling summary of older turns
+    
+    # AI response cache
+    AI_CACHE_PATH = os.getenv('AI_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'ai_cache.db'))
+    AI_CACHE_TTL = 7 * 24 * 3600  # Seconds a cached answer stays valid
+    AI_CACHE_MAX_ENTRIES = 10000  # Rows kept in the SQLite tier
+    AI_CACHE_MEMORY_ENTRIES = 256  # Answers kept in the in-memory LRU
+    
+    # AI background jobs
+    AI_JOB_WORKERS = int(os.getenv('AI_JOB_WORKERS', 4))  # Concurrent model calls
+    AI_JOB_QUEUE_DEPTH = int(os.getenv('AI_JOB_QUEUE_DEPTH', 32))  # Queued + running jobs before rejecting
+    AI_JOB_RESULT_TTL = 600  # Seconds a finished job's result is kept
+    
+    # Question scraper
+    SCRAPER_CACHE_PATH = os.getenv('SCRAPER_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'http_cache.db'))
+    SCRAPER_WORKERS = int(os.getenv('SCRAPER_WORKERS', 4))  # Concurrent page fetches
+    SCRAPER_HOST_INTERVAL = float(os.getenv('SCRAPER_HOST_INTERVAL', 1.0))  # Min seconds between requests to one host
+    SCRAPER_TIMEOUT = 10  # Seconds per request
+    
     # Agora.io Streaming
     AGORA_APP_ID = os.getenv('AGORA_APP_ID', '')
     AGORA_APP_CERTIFICATE = os.getenv('AGORA_APP_CERTIFICATE', '')
     
+    # Live chat push stream
+    CHAT_HUB_BACKEND = os.getenv('CHAT_HUB_BACKEND', 'local')  # local, redis
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    CHAT_STREAM_HEARTBEAT = 15  # Seconds between keep-alive comments
+    CHAT_BUFFER_SIZE = 200  # Recent messages kept in memory per live class
+    CHAT_FLUSH_INTERVAL = 0.5  # Seconds between batched chat writes
+    CHAT_FLUSH_MAX_RETRIES = 5  # Failed writes before a message is moved to instance/chat_dead_letter.jsonl
+    CHAT_BUFFER_SWEEP_INTERVAL = 60  # Seconds between checks that drop ended classes from the buffer
+    
+    # Question facet counts
+    QUESTION_FACETS_TTL = 300  # Seconds the counts are cached; bounds staleness from other processes' writes
+    
+    # Related questions
+    RELATED_QUESTIONS_K = 5  # Neighbours precomputed per question
+    RELATED_QUESTIONS_REFRESH = 60  # Seconds between checks for questions added by other processes
+    
+    # Exam leaderboards
+    LEADERBOARD_SNAPSHOT_SIZE = 100  # Entries kept in the cached top-N
+    LEADERBOARD_SNAPSHOT_TTL = 5  # Seconds a top-N snapshot may lag behind new submissions
+    LEADERBOARD_RELOAD_INTERVAL = 60  # Seconds before an exam index is reloaded from the database
+    
+    # Exam sessions
+    EXAM_AUTOSAVE_FLUSH_INTERVAL = 5  # Seconds between batched writes of autosaved answers
+    EXAM_AUTOSAVE_MAX_RETRIES = 5  # Failed writes before buffered answers go to instance/exam_autosave_dead_letter.jsonl
+    EXAM_SUBMIT_GRACE_SECONDS = 30  # Slack after the deadline for in-flight autosaves and submits
+    EXAM_PAPER_PRERENDER_MINUTES = 30  # Papers of exams starting this soon are rendered in the background
+    
     # App Settings
     ITEMS_PER_PAGE = 20
+    CHAT_PAGE_LIMIT = 100  # Max chat messages returned per poll
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file upload
 
 class DevelopmentConfig(Config):
@@ -0,0 +1,19 @@
+"""
+Database migration script for exam leaderboards
+Adds the submission index used to load each student's best score per exam
+"""
+
+from app import app
+from models import db
+
+def migrate():
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(db.text(
+                'CREATE INDEX IF NOT EXISTS ix_submissions_exam_user_score ON submissions (exam_id, user_id, score)'
+            ))
+        print("✅ Added ix_submissions_exam_user_score")
+        print("\n✅ Migration completed successfully!")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,22 @@
+"""
+Database migration script for exam paper revisions
+Pre-rendered papers are re-rendered when their exam's revision changes
+"""
+
+from app import app
+from models import db
+
+def migrate():
+    with app.app_context():
+        with db.engine.begin() as conn:
+            try:
+                conn.execute(db.text(
+                    'ALTER TABLE exams ADD COLUMN paper_revision INTEGER NOT NULL DEFAULT 0'
+                ))
+                print("✅ Added paper_revision column")
+            except Exception as e:
+                print(f"⚠️ paper_revision column might already exist: {e}")
+        print("\n✅ Migration completed successfully!")
+
+if __name__ == '__main__':
+    migrate()
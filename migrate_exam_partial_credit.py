@@ -0,0 +1,23 @@
+"""
+Database migration script for opt-in partial-credit answer keys
+Existing keys keep exact-answer grading; set partial_credit on a question
+to read its key as ';' parts with '|' alternatives
+"""
+
+from app import app
+from models import db
+
+def migrate():
+    with app.app_context():
+        with db.engine.begin() as conn:
+            try:
+                conn.execute(db.text(
+                    'ALTER TABLE exam_questions ADD COLUMN partial_credit BOOLEAN NOT NULL DEFAULT 0'
+                ))
+                print("✅ Added partial_credit column")
+            except Exception as e:
+                print(f"⚠️ partial_credit column might already exist: {e}")
+        print("\n✅ Migration completed successfully!")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,16 @@
+"""
+Database migration script for exam taking
+Creates the exam_questions and exam_attempts tables
+"""
+
+from app import app
+from models import db
+
+def migrate():
+    with app.app_context():
+        db.create_all()  # exam_questions, exam_attempts
+        print("✅ Created exam_questions and exam_attempts")
+        print("\n✅ Migration completed successfully!")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,27 @@
+"""
+Database migration script to add content hashes to questions
+Run this once on databases created before question deduplication
+"""
+
+from app import app
+from models import db
+from services.question_ingest import ingestor
+
+def migrate():
+    with app.app_context():
+        with db.engine.begin() as conn:
+            try:
+                conn.execute(db.text('ALTER TABLE questions ADD COLUMN content_hash VARCHAR(64)'))
+                print("✅ Added content_hash column")
+            except Exception as e:
+                print(f"⚠️ content_hash column might already exist: {e}")
+        
+        with db.engine.begin() as conn:
+            conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_questions_content_hash ON questions (content_hash)'))
+        
+        updated = ingestor.backfill_hashes()
+        print(f"✅ Hashed {updated} existing questions")
+        print("\n✅ Migration completed successfully!")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,25 @@
+"""
+Database migration script for near-duplicate detection
+Adds the MinHash column and LSH bucket table, then signs existing questions
+"""
+
+from app import app
+from models import db
+from services.near_duplicates import near_duplicates
+
+def migrate():
+    with app.app_context():
+        with db.engine.begin() as conn:
+            try:
+                conn.execute(db.text('ALTER TABLE questions ADD COLUMN minhash BLOB'))
+                print("✅ Added minhash column")
+            except Exception as e:
+                print(f"⚠️ minhash column might already exist: {e}")
+        
+        db.create_all()  # question_lsh_buckets
+        indexed = near_duplicates.rebuild(missing_only=True)
+        print(f"✅ Signed {indexed} existing questions")
+        print("\n✅ Migration completed successfully!")
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,22 @@
+"""
+Database migration script for per-student dashboard stats
+Creates the user_stats table and submission index, then backfills them
+"""
+
+from app import app
+from models import db
+from services.user_stats import user_stats
+
+def migrate():
+    with app.app_context():
+        db.create_all()  # user_stats
+        with db.engine.begin() as conn:
+            conn.execute(db.text(
+                'CREATE INDEX IF NOT EXISTS ix_submissions_user_submitted_at ON submissions (user_id, submitted_at)'
+            ))
+        rebuilt = user_stats.rebuild()
+        print(f"✅ Backfilled stats for {rebuilt} students")
+        print("\n✅ Migration completed successfully!")
+
+if __name__ == '__main__':
+    migrate()
@@ -75,6 +75,11 @@ class Course(db.Model):
 class Question(db.Model):
     """Olympiad question model"""
     __tablename__ = 'questions'
+    __table_args__ = (
+        # Keyset pagination walks (created_at, id) newest first, optionally within a topic
+        db.Index('ix_questions_created_at_id', 'created_at', 'id'),
+        db.Index('ix_questions_topic_created_at_id', 'topic', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -86,6 +91,8 @@ class Question(db.Model):
     source = db.Column(db.String(100))  # IMO, BdMO, AIME, etc.
     year = db.Column(db.Integer)
     problem_number = db.Column(db.String(20))
+    content_hash = db.Column(db.String(64), index=True)  # sha256 of the normalized statement, for dedup
+    minhash = db.Column(db.LargeBinary)  # MinHash signature of the statement, for near-duplicate search
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -101,6 +108,44 @@ class Question(db.Model):
             'year': self.year,
             'problem_number': self.problem_number
         }
+    
+    @staticmethod
+    def encode_cursor(question):
+        return f"{question.created_at.isoformat()}_{question.id}"
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Raises ValueError for malformed cursors"""
+        created_at, question_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(question_id)
+    
+    @classmethod
+    def keyset_page(cls, query, cursor=None, limit=20):
+        """
+        One page of query, newest first, seeking past the cursor instead of using OFFSET
+        Returns:
+            (questions, next_cursor) - next_cursor is None on the last page
+        """
+        if cursor:
+            created_at, question_id = cls.decode_cursor(cursor)
+            query = query.filter(db.tuple_(cls.created_at, cls.id) < (created_at, question_id))
+        
+        questions = query.order_by(cls.created_at.desc(), cls.id.desc()).limit(limit + 1).all()
+        next_cursor = cls.encode_cursor(questions[limit - 1]) if len(questions) > limit else None
+        return questions[:limit], next_cursor
+
+class QuestionBucket(db.Model):
+    """LSH band bucket of a question's MinHash signature"""
+    __tablename__ = 'question_lsh_buckets'
+    __table_args__ = (
+        # The primary key is the candidate lookup (band, bucket); on SQLite the rows live in that one
+        # B-tree instead of a rowid table plus an index, which halves the writes of a bulk import
+        {'sqlite_with_rowid': False},
+    )
+    
+    band = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.BigInteger, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True, index=True)
 
 class Exam(db.Model):
     """Exam model"""
@@ -115,10 +160,13 @@ class Exam(db.Model):
     passing_score = db.Column(db.Integer, default=60)
     scheduled_date = db.Column(db.DateTime)
     is_published = db.Column(db.Boolean, default=False)
+    paper_revision = db.Column(db.Integer, nullable=False, default=0)  # Bumped when the paper's content changes
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     submissions = db.relationship('Submission', backref='exam', lazy='dynamic', cascade='all, delete-orphan')
+    questions = db.relationship('ExamQuestion', backref='exam', order_by='ExamQuestion.position',
+                                cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -133,9 +181,32 @@ class Exam(db.Model):
             'is_published': self.is_published
         }
 
+class ExamQuestion(db.Model):
+    """A question on an exam paper, with its marks and answer key"""
+    __tablename__ = 'exam_questions'
+    __table_args__ = (
+        db.UniqueConstraint('exam_id', 'question_id', name='uq_exam_questions_exam_question'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False, index=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    points = db.Column(db.Integer, nullable=False, default=1)
+    answer_key = db.Column(db.String(200))
+    partial_credit = db.Column(db.Boolean, nullable=False, default=False)  # Key uses ';' parts and '|' alternatives
+    
+    question = db.relationship('Question')
+
 class Submission(db.Model):
     """Exam submission model"""
     __tablename__ = 'submissions'
+    __table_args__ = (
+        # A student's history, newest first (stats rebuilds, activity feed)
+        db.Index('ix_submissions_user_submitted_at', 'user_id', 'submitted_at'),
+        # Best score per student within an exam (leaderboard loads)
+        db.Index('ix_submissions_exam_user_score', 'exam_id', 'user_id', 'score'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -157,21 +228,79 @@ class Submission(db.Model):
             'time_taken_minutes': self.time_taken_minutes
         }
 
+class ExamAttempt(db.Model):
+    """A student's in-progress exam; becomes a Submission on submit (services/exam_sessions.py)"""
+    __tablename__ = 'exam_attempts'
+    __table_args__ = (
+        db.UniqueConstraint('exam_id', 'user_id', name='uq_exam_attempts_exam_user'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    answers = db.Column(db.JSON)  # question id (str) -> answer, merged from autosaves
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    deadline = db.Column(db.DateTime, nullable=False)
+    saved_at = db.Column(db.DateTime)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id'))  # Set once, on submit
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'exam_id': self.exam_id,
+            'answers': self.answers or {},
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'deadline': self.deadline.isoformat() if self.deadline else None,
+            'submission_id': self.submission_id
+        }
+
+class UserStats(db.Model):
+    """Running per-student exam totals, kept current on every submission write (services/user_stats.py)"""
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    best_score = db.Column(db.Integer)
+    last_activity_at = db.Column(db.DateTime)
+    recent = db.Column(db.JSON)  # Latest submissions for the activity feed, newest first
+    
+    @property
+    def avg_score(self):
+        return self.score_sum / self.attempt_count if self.attempt_count else 0
+    
+    def recent_activity(self):
+        """Recent submissions shaped like Submission rows for the dashboard template"""
+        return [
+            {
+                'exam': {'title': entry['exam_title']} if entry.get('exam_title') else None,
+                'score': entry['score'],
+                'submitted_at': datetime.fromisoformat(entry['submitted_at'])
+            }
+            for entry in (self.recent or [])
+        ]
+
 class ChatMessage(db.Model):
     """Live class chat message model"""
     __tablename__ = 'chat_messages'
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    live_class_id = db.Column(db.Integer, db.ForeignKey('live_classes.id'))
+    live_class_id = db.Column(db.Integer, db.ForeignKey('live_classes.id'), index=True)
     message = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    @classmethod
+    def query_with_author(cls):
+        """Query that loads each message's author in the same SELECT"""
+        return cls.query.options(db.joinedload(cls.user))
+    
     def to_dict(self):
+        user = self.user
         return {
             'id': self.id,
-            'user': self.user.name if self.user else 'Unknown',
-            'role': self.user.role if self.user else 'student',
+            'user': user.name if user else 'Unknown',
+            'role': user.role if user else 'student',
             'message': self.message,
             'timestamp': self.created_at.strftime('%H:%M') if self.created_at else ''
         }
@@ -195,7 +324,7 @@ class LiveClass(db.Model):
     
     # Relationships
     chat_messages = db.relationship('ChatMessage', backref='live_class', lazy='dynamic', cascade='all, delete-orphan')
-    instructor = db.relationship('User', foreign_keys=[instructor_id])
+    instructor = db.relationship('User', foreign_keys=[instructor_id], lazy='joined')  # Read by to_dict
     
     def to_dict(self):
         return {
@@ -207,3 +336,41 @@ class LiveClass(db.Model):
             'scheduled_start': self.scheduled_start.isoformat() if self.scheduled_start else None,
             'is_live': self.is_live
         }
+
+class Conversation(db.Model):
+    """AI tutor conversation - older turns are folded into a rolling summary"""
+    __tablename__ = 'conversations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    summary = db.Column(db.Text, default='')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    turns = db.relationship('ConversationTurn', backref='conversation', lazy='dynamic',
+                            cascade='all, delete-orphan', order_by='ConversationTurn.id')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'summary': self.summary,
+            'turns': [turn.to_dict() for turn in self.turns],
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class ConversationTurn(db.Model):
+    """Single message in an AI tutor conversation"""
+    __tablename__ = 'conversation_turns'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False, index=True)
+    role = db.Column(db.String(10), nullable=False)  # student, tutor
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'role': self.role,
+            'content': self.content
+        }
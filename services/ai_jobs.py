@@ -0,0 +1,107 @@
+"""
+AI Job Queue
+Runs slow tutor calls on a bounded background worker pool so web workers
+return immediately with a job id instead of waiting on the model.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Raised when the pool already holds its maximum number of jobs"""
+
+
+class AIJob:
+    def __init__(self, owner_id):
+        self.id = uuid.uuid4().hex
+        self.owner_id = owner_id
+        self.status = 'queued'  # queued, running, done, failed
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+    
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class AIJobQueue:
+    def __init__(self, workers=4, max_depth=32, result_ttl=600):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.result_ttl = result_ttl
+        self.executor = None
+        self.jobs = {}
+        self.active = 0  # queued + running
+        self.lock = threading.Lock()
+    
+    def init_app(self, app):
+        self.workers = app.config.get('AI_JOB_WORKERS', self.workers)
+        self.max_depth = app.config.get('AI_JOB_QUEUE_DEPTH', self.max_depth)
+        self.result_ttl = app.config.get('AI_JOB_RESULT_TTL', self.result_ttl)
+    
+    def _executor(self):
+        # Created on first use so CLI commands don't spawn idle threads
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ai-job')
+        return self.executor
+    
+    def submit(self, owner_id, func, *args, **kwargs):
+        """
+        Queue func(*args, **kwargs) for background execution
+        Returns:
+            The new AIJob
+        Raises:
+            QueueFullError when max_depth jobs are already pending
+        """
+        with self.lock:
+            self._purge()
+            if self.active >= self.max_depth:
+                raise QueueFullError(f'{self.active} AI jobs already pending')
+            job = AIJob(owner_id)
+            self.jobs[job.id] = job
+            self.active += 1
+            executor = self._executor()
+        
+        executor.submit(self._run, job, func, args, kwargs)
+        return job
+    
+    def _run(self, job, func, args, kwargs):
+        job.status = 'running'
+        try:
+            job.result = func(*args, **kwargs)
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            with self.lock:
+                self.active -= 1
+    
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+    
+    def _purge(self):
+        """Forget finished jobs older than result_ttl (caller holds the lock)"""
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+    
+    def stats(self):
+        with self.lock:
+            return {'active': self.active, 'max_depth': self.max_depth, 'workers': self.workers}
+
+
+# Global instance
+ai_jobs = AIJobQueue()
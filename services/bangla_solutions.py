@@ -0,0 +1,87 @@
+"""
+Bangla Solution Pre-generation
+Offline job that fills Question.solution_bangla through the AI tutor so the
+questions page can serve stored explanations instead of live model calls.
+"""
+
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from models import Question, db
+
+
+class BanglaSolutionJob:
+    def __init__(self, tutor, checkpoint_path, workers=4, retries=3, backoff=2.0, batch_size=20):
+        self.tutor = tutor
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.batch_size = batch_size
+    
+    def load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return {'last_id': 0, 'failed': []}
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            return json.load(f)
+    
+    def save_checkpoint(self, checkpoint):
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+    
+    def explain(self, item):
+        """Generate one explanation, retrying with exponential backoff and jitter"""
+        question_id, problem_statement, solution = item
+        for attempt in range(self.retries + 1):
+            try:
+                return question_id, self.tutor.explain_solution(problem_statement, solution, raise_errors=True)
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"❌ Question {question_id} failed after {attempt + 1} attempts: {e}")
+                    return question_id, None
+                time.sleep(self.backoff * (2 ** attempt) + random.uniform(0, self.backoff))
+    
+    def run(self, limit=None, restart=False):
+        """
+        Walk questions with no Bangla solution in id order
+        Args:
+            limit: Stop after this many questions
+            restart: Ignore the checkpoint and revisit earlier failures
+        Returns:
+            Dict with generated/failed counts
+        """
+        checkpoint = {'last_id': 0, 'failed': []} if restart else self.load_checkpoint()
+        generated = failed = 0
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while limit is None or generated + failed < limit:
+                size = self.batch_size if limit is None else min(self.batch_size, limit - generated - failed)
+                batch = db.session.query(Question.id, Question.problem_statement, Question.solution).filter(
+                    Question.solution_bangla.is_(None),
+                    Question.id > checkpoint['last_id']
+                ).order_by(Question.id).limit(size).all()
+                if not batch:
+                    break
+                
+                # Workers only call the model; results are written from this thread
+                results = list(pool.map(self.explain, [tuple(row) for row in batch]))
+                done = [{'id': qid, 'solution_bangla': text} for qid, text in results if text]
+                if done:
+                    db.session.execute(db.update(Question), done)
+                    db.session.commit()
+                
+                failed_ids = [qid for qid, text in results if not text]
+                checkpoint['failed'].extend(failed_ids)
+                checkpoint['last_id'] = batch[-1].id
+                self.save_checkpoint(checkpoint)
+                
+                generated += len(done)
+                failed += len(failed_ids)
+                print(f"   ... {generated} generated, {failed} failed (last id {checkpoint['last_id']})")
+        
+        return {'generated': generated, 'failed': failed}
@@ -0,0 +1,323 @@
+"""
+Live Class Chat Buffer
+Keeps the most recent messages of each live class in memory and persists
+new messages to the database in small batched transactions (write-behind).
+The buffer is filled from chat hub dispatch, so with the Redis backend every
+worker also holds messages posted through the others. Only live classes are
+buffered; ended ones are evicted. Message ids come from a Redis counter shared
+by all workers when the Redis backend is configured, and from this process
+otherwise (single worker, enforced with a lock file).
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from models import db, ChatMessage, LiveClass, User
+from services.chat_hub import chat_hub, RedisBackend
+
+
+class LocalIdSource:
+    """
+    Ids from max(id) + 1 - only safe while one process writes chat.
+    The first id claims a lock file, so a second worker on the local backend
+    fails instead of handing out ids the first one already used.
+    """
+    
+    def __init__(self, lock_path=None):
+        self.lock_path = lock_path
+        self.claim = None  # Open lock file, held for the life of the process
+        self.next_id = None
+        self.lock = threading.Lock()
+    
+    def _claim(self):
+        if self.lock_path is None:
+            return
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        handle = open(self.lock_path, 'w')
+        try:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            handle.close()
+            raise RuntimeError('Another process is already writing chat with local message ids; '
+                               'set CHAT_HUB_BACKEND=redis to run several workers')
+        self.claim = handle
+    
+    def next(self):
+        with self.lock:
+            if self.next_id is None:
+                self._claim()
+                self.next_id = (db.session.query(db.func.max(ChatMessage.id)).scalar() or 0) + 1
+            msg_id = self.next_id
+            self.next_id += 1
+            return msg_id
+
+
+class RedisIdSource:
+    """Ids from an INCR counter shared by every worker, seeded from the table"""
+    
+    KEY = 'olympus:chat:next_id'
+    
+    def __init__(self, client):
+        self.client = client
+        self.seeded = False
+    
+    def next(self):
+        if not self.seeded:
+            # Only the first worker to get here sets the counter; INCR is atomic afterwards
+            self.client.set(self.KEY, db.session.query(db.func.max(ChatMessage.id)).scalar() or 0, nx=True)
+            self.seeded = True
+        return int(self.client.incr(self.KEY))
+
+
+class ChatBuffer:
+    def __init__(self, capacity=200, flush_interval=0.5, max_retries=5, sweep_interval=60):
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.sweep_interval = sweep_interval
+        self.app = None
+        self.lock = threading.Lock()
+        self.recent = {}  # class_id -> deque of serialized messages, oldest first
+        self.warmed = set()  # class ids whose stored history has been merged into the buffer
+        self.complete = set()  # class ids whose whole history fits in the buffer
+        self.pending = []  # rows waiting to be written
+        self.failures = {}  # message id -> failed write attempts
+        self.ids = LocalIdSource()
+        self.dead_letter_path = None
+        self.swept_at = time.time()
+        self.stopped = threading.Event()
+        self.flusher = None
+    
+    def init_app(self, app):
+        self.app = app
+        self.capacity = app.config.get('CHAT_BUFFER_SIZE', self.capacity)
+        self.flush_interval = app.config.get('CHAT_FLUSH_INTERVAL', self.flush_interval)
+        self.max_retries = app.config.get('CHAT_FLUSH_MAX_RETRIES', self.max_retries)
+        self.sweep_interval = app.config.get('CHAT_BUFFER_SWEEP_INTERVAL', self.sweep_interval)
+        self.dead_letter_path = os.path.join(app.instance_path, 'chat_dead_letter.jsonl')
+        if isinstance(chat_hub.backend, RedisBackend):
+            self.ids = RedisIdSource(chat_hub.backend.client)
+        else:
+            self.ids = LocalIdSource(os.path.join(app.instance_path, 'chat_ids.lock'))
+        chat_hub.add_listener(self.remember)
+        # Started by the first request, so CLI commands, migrations and imports never spawn a writer
+        app.before_request(self.start)
+    
+    def start(self):
+        """Start the background flusher once"""
+        if self.flusher is not None:
+            return
+        with self.lock:
+            if self.flusher is not None:
+                return
+            self.flusher = threading.Thread(target=self._run, daemon=True)
+            self.flusher.start()
+        atexit.register(self.stop)
+    
+    def _run(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+            if time.time() - self.swept_at >= self.sweep_interval:
+                self.evict_ended()
+    
+    def stop(self):
+        """Stop the background flusher and write out anything still pending"""
+        self.stopped.set()
+        if self.flusher and self.flusher is not threading.current_thread():
+            self.flusher.join()
+        self.flush()
+    
+    def _insert(self, buffered, message):
+        """Add a message in id order, ignoring one already held (caller holds the lock)"""
+        if buffered and message['id'] <= buffered[-1]['id']:
+            # Messages relayed from other workers can arrive slightly out of order
+            if any(held['id'] == message['id'] for held in buffered):
+                return
+            ordered = sorted(list(buffered) + [message], key=lambda held: held['id'])
+            buffered.clear()
+            buffered.extend(ordered[-self.capacity:])
+            return
+        buffered.append(message)
+    
+    def _warm(self, class_id):
+        """
+        Merge the latest stored messages of a live class into the buffer
+        Returns:
+            False if the class is not live, so it is not buffered
+        """
+        if not db.session.query(LiveClass.is_live).filter_by(id=class_id).scalar():
+            return False
+        
+        # Read outside the lock; messages that arrive meanwhile are merged in id order below
+        rows = db.session.query(ChatMessage, User.name, User.role).outerjoin(
+            User, ChatMessage.user_id == User.id
+        ).filter(
+            ChatMessage.live_class_id == class_id
+        ).order_by(ChatMessage.id.desc()).limit(self.capacity).all()
+        stored = [self._serialize(msg.id, name, role, msg.message, msg.created_at) for msg, name, role in reversed(rows)]
+        
+        with self.lock:
+            if class_id not in self.warmed:
+                buffered = self.recent.setdefault(class_id, deque(maxlen=self.capacity))
+                for message in stored:
+                    self._insert(buffered, message)
+                if len(stored) < self.capacity and len(buffered) < self.capacity:
+                    self.complete.add(class_id)
+                self.warmed.add(class_id)
+        return True
+    
+    def forget(self, class_id):
+        """Drop a class from the buffer"""
+        with self.lock:
+            self.recent.pop(class_id, None)
+            self.warmed.discard(class_id)
+            self.complete.discard(class_id)
+    
+    def evict_ended(self):
+        """Drop buffered classes that are no longer live"""
+        self.swept_at = time.time()
+        with self.lock:
+            class_ids = list(self.recent)
+        if not class_ids:
+            return
+        with self.app.app_context():
+            live = {class_id for class_id, in db.session.query(LiveClass.id).filter(
+                LiveClass.id.in_(class_ids), LiveClass.is_live.is_(True)
+            )}
+        for class_id in class_ids:
+            if class_id not in live:
+                self.forget(class_id)
+    
+    @staticmethod
+    def _serialize(msg_id, name, role, message, created_at):
+        """Same shape as ChatMessage.to_dict"""
+        return {
+            'id': msg_id,
+            'user': name or 'Unknown',
+            'role': role or 'student',
+            'message': message,
+            'timestamp': created_at.strftime('%H:%M') if created_at else ''
+        }
+    
+    def remember(self, class_id, message):
+        """Hub listener: keep every message dispatched to this process, whichever worker posted it"""
+        with self.lock:
+            buffered = self.recent.setdefault(class_id, deque(maxlen=self.capacity))
+            if len(buffered) == self.capacity:
+                self.complete.discard(class_id)
+            self._insert(buffered, message)
+    
+    def append(self, user, class_id, message):
+        """
+        Record a new chat message; publish the result through the chat hub to buffer and deliver it
+        Args:
+            user: Session user dict of the author (id, name, role)
+            class_id: Live class id, or None
+            message: Message text
+        Returns:
+            The serialized message, ready to send to clients
+        """
+        created_at = datetime.utcnow()
+        msg_id = self.ids.next()
+        serialized = self._serialize(msg_id, user.get('name'), user.get('role'), message, created_at)
+        with self.lock:
+            self.pending.append({
+                'id': msg_id,
+                'user_id': user['id'],
+                'live_class_id': class_id,
+                'message': message,
+                'created_at': created_at
+            })
+        return serialized
+    
+    def messages(self, class_id, since_id=None, limit=None):
+        """
+        Serve a chat page from memory
+        Returns:
+            List of serialized messages, or None when the class is not live or
+            the cursor is older than what the buffer holds, so the database must be read
+        """
+        limit = limit or self.capacity
+        if class_id not in self.warmed and not self._warm(class_id):
+            return None
+        with self.lock:
+            buffered = self.recent.get(class_id)
+            if buffered is None:
+                return None  # Evicted since it was warmed
+            
+            if not since_id:
+                return list(buffered)[-limit:]
+            
+            if buffered and since_id < buffered[0]['id'] - 1 and class_id not in self.complete:
+                return None
+            
+            page = [msg for msg in buffered if msg['id'] > since_id]
+            return page[:limit]
+    
+    def _dead_letter(self, row, error):
+        """Give up on a row that keeps failing: log it and keep a copy for manual recovery"""
+        print(f"❌ Dropping chat message {row['id']} after {self.max_retries} failed writes: {error}")
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path), exist_ok=True)
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(dict(row, created_at=row['created_at'].isoformat(), error=str(error)),
+                                   ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"❌ Could not write chat dead letter: {e}")
+    
+    def flush(self):
+        """Write pending messages to the database in one transaction"""
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return 0
+        
+        with self.app.app_context():
+            try:
+                db.session.execute(db.insert(ChatMessage), batch)
+                db.session.commit()
+                for row in batch:
+                    self.failures.pop(row['id'], None)
+                return len(batch)
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error flushing chat messages, retrying one by one: {e}")
+            
+            # Row by row, so one bad message cannot hold back the rest
+            saved, retry = 0, []
+            for row in batch:
+                try:
+                    db.session.execute(db.insert(ChatMessage), [row])
+                    db.session.commit()
+                    self.failures.pop(row['id'], None)
+                    saved += 1
+                except Exception as e:
+                    db.session.rollback()
+                    attempts = self.failures[row['id']] = self.failures.get(row['id'], 0) + 1
+                    if attempts >= self.max_retries:
+                        self.failures.pop(row['id'], None)
+                        self._dead_letter(row, e)
+                    else:
+                        retry.append(row)
+        if retry:
+            with self.lock:
+                self.pending[:0] = retry
+        return saved
+
+
+# Global instance
+chat_buffer = ChatBuffer()
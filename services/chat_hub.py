@@ -0,0 +1,128 @@
+"""
+Live Class Chat Hub
+In-process publish/subscribe fan-out for live class chat messages.
+Each connected viewer holds one subscription; a new message is pushed to
+every subscriber of its live class instead of being polled for.
+"""
+
+import json
+import queue
+import threading
+
+
+class LocalBackend:
+    """Single-process backend - delivers published messages straight to the hub"""
+    
+    def attach(self, hub):
+        self.hub = hub
+    
+    def publish(self, class_id, message):
+        self.hub.dispatch(class_id, message)
+
+
+class RedisBackend:
+    """
+    Redis pub/sub backend so several worker processes share one chat stream.
+    Every process publishes to Redis and relays what it receives to its own
+    local subscribers.
+    """
+    
+    CHANNEL_PREFIX = 'olympus:chat:'
+    
+    def __init__(self, url):
+        # Lazy import - redis is only needed when this backend is configured
+        import redis
+        self.client = redis.Redis.from_url(url)
+    
+    def attach(self, hub):
+        self.hub = hub
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self.CHANNEL_PREFIX + '*')
+        thread = threading.Thread(target=self._listen, args=(pubsub,), daemon=True)
+        thread.start()
+    
+    def _listen(self, pubsub):
+        for item in pubsub.listen():
+            channel = item['channel'].decode('utf-8')
+            class_id = int(channel[len(self.CHANNEL_PREFIX):])
+            self.hub.dispatch(class_id, json.loads(item['data']))
+    
+    def publish(self, class_id, message):
+        self.client.publish(f'{self.CHANNEL_PREFIX}{class_id}', json.dumps(message))
+
+
+class Subscription:
+    """A single viewer's queue of pending messages"""
+    
+    def __init__(self, class_id, max_pending):
+        self.class_id = class_id
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.closed = False
+    
+    def get(self, timeout):
+        """Wait for the next message, returns None on timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChatHub:
+    def __init__(self, backend=None, max_pending=500):
+        self.max_pending = max_pending
+        self.subscribers = {}  # class_id -> set of Subscription
+        self.listeners = []  # callables(class_id, message) run for every dispatched message
+        self.lock = threading.Lock()
+        self.backend = None
+        self.set_backend(backend or LocalBackend())
+    
+    def set_backend(self, backend):
+        """Swap the transport used to share messages between processes"""
+        backend.attach(self)
+        self.backend = backend
+    
+    def add_listener(self, listener):
+        """Also hand every message dispatched in this process to listener(class_id, message)"""
+        self.listeners.append(listener)
+    
+    def subscribe(self, class_id):
+        sub = Subscription(class_id, self.max_pending)
+        with self.lock:
+            self.subscribers.setdefault(class_id, set()).add(sub)
+        return sub
+    
+    def unsubscribe(self, sub):
+        with self.lock:
+            subs = self.subscribers.get(sub.class_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self.subscribers[sub.class_id]
+    
+    def publish(self, class_id, message):
+        """Publish a serialized chat message to all viewers of a live class"""
+        self.backend.publish(class_id, message)
+    
+    def dispatch(self, class_id, message):
+        """Fan a message out to the subscribers held by this process"""
+        for listener in self.listeners:
+            listener(class_id, message)
+        
+        with self.lock:
+            subs = list(self.subscribers.get(class_id, ()))
+        
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(message)
+            except queue.Full:
+                # Slow consumer - drop it, the client reconnects with its cursor
+                sub.closed = True
+                self.unsubscribe(sub)
+    
+    def subscriber_count(self, class_id):
+        with self.lock:
+            return len(self.subscribers.get(class_id, ()))
+
+
+# Global instance
+chat_hub = ChatHub()
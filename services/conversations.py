@@ -0,0 +1,78 @@
+"""
+AI Tutor Conversation Memory
+Stores tutor conversations server-side so clients only send the new message.
+Only the most recent turns are kept verbatim; older ones are compacted into
+a short rolling summary that is sent to the model instead.
+"""
+
+from models import db, Conversation, ConversationTurn
+
+
+class ConversationStore:
+    def __init__(self, keep_turns=8, summary_chars=1500, summary_line_chars=150):
+        self.keep_turns = keep_turns
+        self.summary_chars = summary_chars
+        self.summary_line_chars = summary_line_chars
+        self.app = None
+    
+    def init_app(self, app):
+        self.app = app
+        self.keep_turns = app.config.get('AI_CONVERSATION_KEEP_TURNS', self.keep_turns)
+        self.summary_chars = app.config.get('AI_CONVERSATION_SUMMARY_CHARS', self.summary_chars)
+    
+    def get(self, user_id, conversation_id):
+        """A user's conversation, or None if it doesn't exist or belongs to someone else"""
+        return Conversation.query.filter_by(id=conversation_id, user_id=user_id).first()
+    
+    def get_or_create(self, user_id, conversation_id=None):
+        conversation = self.get(user_id, conversation_id) if conversation_id else None
+        if conversation is None:
+            conversation = Conversation(user_id=user_id, summary='')
+            db.session.add(conversation)
+            db.session.flush()
+        return conversation
+    
+    def history(self, conversation):
+        """(summary, recent turns as {'role', 'content'} dicts) for prompt building"""
+        turns = conversation.turns.all()
+        return conversation.summary or '', [turn.to_dict() for turn in turns]
+    
+    def add_question(self, conversation, question):
+        db.session.add(ConversationTurn(conversation_id=conversation.id, role='student', content=question))
+        db.session.commit()
+    
+    def record_answer(self, conversation_id, answer):
+        """Store the tutor's answer and compact old turns; safe to call from worker threads"""
+        with self.app.app_context():
+            conversation = db.session.get(Conversation, conversation_id)
+            db.session.add(ConversationTurn(conversation_id=conversation_id, role='tutor', content=answer))
+            db.session.flush()
+            self.compact(conversation)
+            db.session.commit()
+    
+    def compact(self, conversation):
+        """Fold turns beyond keep_turns into the summary and delete them"""
+        turns = conversation.turns.all()
+        old = turns[:-self.keep_turns] if len(turns) > self.keep_turns else []
+        if not old:
+            return
+        
+        lines = []
+        for turn in old:
+            content = ' '.join(turn.content.split())
+            if len(content) > self.summary_line_chars:
+                content = content[:self.summary_line_chars] + '…'
+            lines.append(f"{turn.role}: {content}")
+        
+        summary = '\n'.join(filter(None, [conversation.summary] + lines))
+        if len(summary) > self.summary_chars:
+            # Oldest summary lines go first
+            summary = summary[-self.summary_chars:]
+            summary = summary[summary.find('\n') + 1:] if '\n' in summary else summary
+        conversation.summary = summary
+        
+        ConversationTurn.query.filter(ConversationTurn.id.in_([turn.id for turn in old])).delete(synchronize_session=False)
+
+
+# Global instance
+conversations = ConversationStore()
@@ -0,0 +1,157 @@
+"""
+Question Crawler
+Fetches many pages concurrently over one pooled keep-alive session, with a
+per-host rate limit and an on-disk HTTP cache that revalidates with
+ETag/Last-Modified so re-runs only download pages that changed.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HTTPCache:
+    """URL -> (validators, body) store in a SQLite file"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = None
+    
+    def _db(self):
+        """Open the cache file on first use (caller holds the lock)"""
+        if self.conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    body BLOB NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+            self.conn.commit()
+        return self.conn
+    
+    def get(self, url):
+        with self.lock:
+            row = self._db().execute('SELECT etag, last_modified, body FROM pages WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'body': row[2]}
+    
+    def set(self, url, etag, last_modified, body):
+        with self.lock:
+            conn = self._db()
+            conn.execute('INSERT OR REPLACE INTO pages (url, etag, last_modified, body, fetched_at) VALUES (?, ?, ?, ?, ?)',
+                         (url, etag, last_modified, body, time.time()))
+            conn.commit()
+    
+    def touch(self, url):
+        with self.lock:
+            conn = self._db()
+            conn.execute('UPDATE pages SET fetched_at = ? WHERE url = ?', (time.time(), url))
+            conn.commit()
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host by at least min_interval seconds"""
+    
+    def __init__(self, min_interval=1.0):
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.next_slot = {}  # host -> earliest start time of its next request
+    
+    def wait(self, host):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class FetchResult:
+    def __init__(self, url, body=None, status=None, changed=False, from_cache=False, error=None):
+        self.url = url
+        self.body = body
+        self.status = status
+        self.changed = changed  # False when the page is the same as the cached copy
+        self.from_cache = from_cache
+        self.error = error
+
+
+class Crawler:
+    def __init__(self, cache_path, workers=4, host_interval=1.0, timeout=10, headers=None):
+        self.cache = HTTPCache(cache_path)
+        self.limiter = HostRateLimiter(host_interval)
+        self.workers = workers
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+        self.stats_lock = threading.Lock()
+        self.counters = {'fetched': 0, 'not_modified': 0, 'errors': 0}
+    
+    def _count(self, name):
+        with self.stats_lock:
+            self.counters[name] += 1
+    
+    def fetch(self, url):
+        """
+        Fetch one URL, revalidating against the cached copy
+        Returns:
+            FetchResult; on errors the cached body is returned if there is one
+        """
+        cached = self.cache.get(url)
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        
+        self.limiter.wait(urlsplit(url).netloc)
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and cached:
+                self.cache.touch(url)
+                self._count('not_modified')
+                return FetchResult(url, cached['body'], 304, changed=False, from_cache=True)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self._count('errors')
+            print(f"⚠️ Fetch failed for {url}: {e}")
+            if cached:
+                return FetchResult(url, cached['body'], changed=False, from_cache=True, error=str(e))
+            return FetchResult(url, error=str(e))
+        
+        body = response.content
+        changed = cached is None or cached['body'] != body
+        self.cache.set(url, response.headers.get('ETag'), response.headers.get('Last-Modified'), body)
+        self._count('fetched')
+        return FetchResult(url, body, response.status_code, changed=changed)
+    
+    def fetch_all(self, urls):
+        """Fetch URLs on a bounded thread pool, yielding results in input order"""
+        urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='crawler') as pool:
+            yield from pool.map(self.fetch, urls)
+    
+    def stats(self):
+        with self.stats_lock:
+            return dict(self.counters)
@@ -0,0 +1,272 @@
+"""
+Pre-rendered Exam Papers
+Renders each exam's paper (questions and marks, never the answer key) once
+into immutable JSON and HTML artifacts identified by a content hash. The
+artifacts are kept in memory and under instance/exam_papers/ so every
+worker serves the same bytes, and a background thread renders exams shortly
+before they are scheduled. At the start time each candidate's request is a
+dictionary lookup and a check against the exam row: no question queries.
+Exam.paper_revision is bumped by ORM events whenever an exam, its question
+list or one of its questions changes, and a paper rendered for an older
+revision is discarded, in every worker and on disk.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from sqlalchemy import event
+
+from models import db, Exam, ExamQuestion, Question
+from services.question_changes import question_changes
+
+# Exam fields shown on the paper
+PAPER_EXAM_FIELDS = ('title', 'description', 'duration_minutes', 'total_questions', 'course_id', 'scheduled_date')
+PAPER_QUESTION_FIELDS = ('title', 'problem_statement')
+
+
+class ExamPaper:
+    """An immutable rendered paper plus the exam fields needed to release it"""
+    
+    def __init__(self, exam_id, etag, body_json, body_html, scheduled_date, revision=0):
+        self.exam_id = exam_id
+        self.revision = revision
+        self.etag = etag
+        self.body_json = body_json
+        self.body_html = body_html
+        self.scheduled_date = scheduled_date
+    
+    def to_file(self):
+        return {
+            'exam_id': self.exam_id,
+            'etag': self.etag,
+            'revision': self.revision,
+            'json': self.body_json.decode('utf-8'),
+            'html': self.body_html.decode('utf-8'),
+            'scheduled_date': self.scheduled_date.isoformat() if self.scheduled_date else None
+        }
+    
+    @classmethod
+    def from_file(cls, data):
+        return cls(
+            data['exam_id'],
+            data['etag'],
+            data['json'].encode('utf-8'),
+            data['html'].encode('utf-8'),
+            datetime.fromisoformat(data['scheduled_date']) if data['scheduled_date'] else None,
+            data.get('revision', -1)
+        )
+
+
+class ExamPaperService:
+    def __init__(self, prerender_minutes=30, check_interval=60):
+        """
+        Args:
+            prerender_minutes: Render papers of exams starting within this many minutes
+            check_interval: Seconds between checks for exams that are about to start
+        """
+        self.prerender_minutes = prerender_minutes
+        self.check_interval = check_interval
+        self.app = None
+        self.directory = None
+        self.lock = threading.Lock()
+        self.papers = {}  # exam id -> ExamPaper
+        self.rendering = {}  # exam id -> Lock, so concurrent misses render once
+        self.stopped = threading.Event()
+        self.worker = None
+    
+    def init_app(self, app):
+        self.app = app
+        self.prerender_minutes = app.config.get('EXAM_PAPER_PRERENDER_MINUTES', self.prerender_minutes)
+        self.directory = os.path.join(app.instance_path, 'exam_papers')
+        event.listen(Exam, 'before_update', self._exam_changed)
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(ExamQuestion, name, self._exam_question_changed)
+        event.listen(Question, 'after_update', self._question_changed)
+        question_changes.subscribe(before_commit=self._questions_written)
+        # Started by the first request, so CLI commands, migrations and imports never spawn a renderer
+        app.before_request(self.start)
+    
+    def start(self):
+        """Start the background pre-renderer once"""
+        if self.worker is not None:
+            return
+        with self.lock:
+            if self.worker is not None:
+                return
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+        atexit.register(self.stopped.set)
+    
+    def _run(self):
+        while not self.stopped.wait(self.check_interval):
+            try:
+                with self.app.app_context():
+                    self.prerender_due()
+            except Exception as e:
+                print(f"❌ Error pre-rendering exam papers: {e}")
+    
+    def _path(self, exam_id):
+        return os.path.join(self.directory, f'{exam_id}.json')
+    
+    # ------------------------------------------------------------------
+    # Revisions: every change that alters a paper bumps its exam's revision
+    # ------------------------------------------------------------------
+    
+    def _exam_changed(self, mapper, connection, exam):
+        state = db.inspect(exam)
+        if any(state.attrs[field].history.has_changes() for field in PAPER_EXAM_FIELDS):
+            exam.paper_revision = (exam.paper_revision or 0) + 1
+    
+    def _exam_question_changed(self, mapper, connection, item):
+        exam_ids = {item.exam_id} | set(db.inspect(item).attrs.exam_id.history.deleted or ())
+        self.bump(exam_ids, connection)
+    
+    def _question_changed(self, mapper, connection, question):
+        state = db.inspect(question)
+        if any(state.attrs[field].history.has_changes() for field in PAPER_QUESTION_FIELDS):
+            self.questions_changed([question.id], connection)
+    
+    def _questions_written(self, inserted, updated):
+        # Bulk upserts may retitle questions already on exam papers
+        self.questions_changed([row['id'] for row in updated])
+    
+    def bump(self, exam_ids, connection=None):
+        """Mark the papers of these exams stale (committed by the caller)"""
+        exam_ids = [exam_id for exam_id in exam_ids if exam_id is not None]
+        if not exam_ids:
+            return
+        statement = db.update(Exam.__table__).where(Exam.__table__.c.id.in_(exam_ids)).values(
+            paper_revision=Exam.__table__.c.paper_revision + 1
+        )
+        # Part of the caller's transaction: the new revision is seen once it commits
+        (connection or db.session).execute(statement)
+        for exam_id in exam_ids:
+            self.invalidate(exam_id)
+    
+    def questions_changed(self, question_ids, connection=None):
+        """Mark stale the papers of every exam using these questions (for bulk updates that skip ORM events)"""
+        if not question_ids:
+            return
+        select = db.select(ExamQuestion.exam_id).where(ExamQuestion.question_id.in_(list(question_ids))).distinct()
+        exam_ids = (connection or db.session).execute(select).scalars().all()
+        self.bump(exam_ids, connection)
+    
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+    
+    def render(self, exam_id):
+        """
+        Build an exam's paper from the database and store it
+        Returns:
+            The ExamPaper, or None if the exam does not exist or is not published
+        """
+        exam = db.session.get(Exam, exam_id)
+        if exam is None or not exam.is_published:
+            return None
+        items = ExamQuestion.query.options(db.joinedload(ExamQuestion.question)).filter_by(
+            exam_id=exam_id
+        ).order_by(ExamQuestion.position, ExamQuestion.id).all()
+        questions = [{
+            'id': item.question.id,
+            'title': item.question.title,
+            'problem_statement': item.question.problem_statement,
+            'points': item.points
+        } for item in items]
+        
+        body_json = json.dumps({'exam': exam.to_dict(), 'questions': questions},
+                               ensure_ascii=False, sort_keys=True).encode('utf-8')
+        # Rendered without context processors: the fragment is shared by every candidate
+        template = current_app.jinja_env.get_template('exam_paper.html')
+        body_html = template.render(exam=exam, questions=questions).encode('utf-8')
+        etag = hashlib.sha256(body_json + b'\0' + body_html).hexdigest()[:32]
+        paper = ExamPaper(exam_id, etag, body_json, body_html, exam.scheduled_date, exam.paper_revision or 0)
+        
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f'{self._path(exam_id)}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(paper.to_file(), f, ensure_ascii=False)
+        os.replace(temp_path, self._path(exam_id))
+        
+        with self.lock:
+            self.papers[exam_id] = paper
+        return paper
+    
+    def _load(self, exam_id):
+        try:
+            with open(self._path(exam_id), encoding='utf-8') as f:
+                return ExamPaper.from_file(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def get_cached(self, exam_id):
+        """An exam's paper from memory or disk, without rendering"""
+        paper = self.papers.get(exam_id)
+        if paper is None:
+            paper = self._load(exam_id)
+            if paper is not None:
+                with self.lock:
+                    self.papers[exam_id] = paper
+        return paper
+    
+    def get(self, exam_id, revision=None):
+        """
+        An exam's paper from memory, then disk, rendering it only if neither has it
+        Args:
+            revision: The exam's current paper_revision; a paper rendered for another one is discarded
+        Returns:
+            The ExamPaper, or None if the exam does not exist or is not published
+        """
+        paper = self.papers.get(exam_id)
+        if paper is not None and (revision is None or paper.revision == revision):
+            return paper
+        
+        with self.lock:
+            render_lock = self.rendering.setdefault(exam_id, threading.Lock())
+        with render_lock:
+            paper = self.get_cached(exam_id)
+            if paper is not None and (revision is None or paper.revision == revision):
+                return paper
+            return self.render(exam_id)
+    
+    def invalidate(self, exam_id):
+        """Drop an exam's paper so the next request renders it again"""
+        with self.lock:
+            self.papers.pop(exam_id, None)
+        try:
+            os.remove(self._path(exam_id))
+        except OSError:
+            pass
+    
+    def prerender_due(self, minutes=None, force=False):
+        """
+        Render papers of published exams scheduled to start soon
+        Args:
+            minutes: Look-ahead window (default prerender_minutes)
+            force: Re-render papers that already exist
+        Returns:
+            Number of papers rendered
+        """
+        now = datetime.utcnow()
+        exam_ids = [row[0] for row in db.session.query(Exam.id).filter(
+            Exam.is_published == True,
+            Exam.scheduled_date > now - timedelta(days=1),
+            Exam.scheduled_date <= now + timedelta(minutes=minutes or self.prerender_minutes)
+        )]
+        rendered = 0
+        for exam_id in exam_ids:
+            if not force and self.get_cached(exam_id):
+                continue
+            self.render(exam_id)
+            rendered += 1
+        return rendered
+
+
+# Global instance
+exam_papers = ExamPaperService()
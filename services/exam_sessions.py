@@ -0,0 +1,394 @@
+"""
+Exam Sessions
+Runs timed exams: start opens one ExamAttempt per student, autosave accepts
+only the answers that changed and buffers them as a per-attempt delta, and a
+background flusher merges every buffered delta into its stored attempt in
+one batched transaction (write-behind, like the chat buffer). Deltas are
+merged into the row rather than overwriting it, so autosaves handled by
+different workers never clobber each other. Submit flushes, then grades the
+stored answers and creates the Submission exactly once.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ExamAttempt, Submission
+from services.grading import grader
+
+
+class ExamSessionError(Exception):
+    """Raised for requests the exam's state does not allow; carries the HTTP status"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ExamSessionService:
+    def __init__(self, flush_interval=5, grace_seconds=30, key_ttl=60, max_answer_length=1000, max_retries=5):
+        """
+        Args:
+            flush_interval: Seconds between batched writes of autosaved answers
+            max_retries: Failed writes before an attempt's buffered answers are moved to the dead-letter file
+            grace_seconds: Slack after the deadline for in-flight autosaves and submits
+            key_ttl: Seconds an exam's question list and answer key are cached
+            max_answer_length: Longest answer accepted per question
+        """
+        self.flush_interval = flush_interval
+        self.grace = timedelta(seconds=grace_seconds)
+        self.key_ttl = key_ttl
+        self.max_answer_length = max_answer_length
+        self.max_retries = max_retries
+        self.app = None
+        self.lock = threading.Lock()
+        self.attempts = {}  # (exam id, user id) -> attempt state dict
+        self.pending = set()  # keys of attempts with a buffered delta
+        self.failures = {}  # attempt id -> failed write attempts
+        self.dead_letter_path = None
+        self.keys = {}  # exam id -> (loaded_at, AnswerKey)
+        self.stopped = threading.Event()
+        self.flusher = None
+    
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config.get('EXAM_AUTOSAVE_FLUSH_INTERVAL', self.flush_interval)
+        self.grace = timedelta(seconds=app.config.get('EXAM_SUBMIT_GRACE_SECONDS', self.grace.total_seconds()))
+        self.max_retries = app.config.get('EXAM_AUTOSAVE_MAX_RETRIES', self.max_retries)
+        self.dead_letter_path = os.path.join(app.instance_path, 'exam_autosave_dead_letter.jsonl')
+        # Started by the first request, so CLI commands, migrations and imports never spawn a writer
+        app.before_request(self.start_flusher)
+    
+    def start_flusher(self):
+        """Start the background flusher once"""
+        if self.flusher is not None:
+            return
+        with self.lock:
+            if self.flusher is not None:
+                return
+            self.flusher = threading.Thread(target=self._run, daemon=True)
+            self.flusher.start()
+        atexit.register(self.stop)
+    
+    def _run(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+    
+    def stop(self):
+        """Stop the background flusher and write out anything still pending"""
+        self.stopped.set()
+        if self.flusher and self.flusher is not threading.current_thread():
+            self.flusher.join()
+        self.flush()
+    
+    # ------------------------------------------------------------------
+    # Answer keys
+    # ------------------------------------------------------------------
+    
+    def answer_key(self, exam_id):
+        """Compiled AnswerKey of an exam, cached for key_ttl seconds"""
+        cached = self.keys.get(exam_id)
+        if cached and time.time() - cached[0] < self.key_ttl:
+            return cached[1]
+        key = grader.answer_key(exam_id)
+        self.keys[exam_id] = (time.time(), key)
+        return key
+    
+    def invalidate(self, exam_id):
+        """Forget a cached answer key, e.g. after it was corrected"""
+        self.keys.pop(exam_id, None)
+    
+    def grade(self, exam_id, answers):
+        """
+        Score answers against the exam's key (same rules as bulk regrading)
+        Returns:
+            Percentage score (0-100) of the points earned
+        """
+        return int(self.answer_key(exam_id).score([answers])[0])
+    
+    # ------------------------------------------------------------------
+    # Attempt state
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _state(attempt):
+        return {
+            'id': attempt.id,
+            'exam_id': attempt.exam_id,
+            'started_at': attempt.started_at,
+            'deadline': attempt.deadline,
+            'seq': 0,
+            'delta': {},  # question id (str) -> answer, or None to clear; not yet written
+            'submission_id': attempt.submission_id,
+            'lock': threading.Lock()
+        }
+    
+    def _get(self, exam_id, user_id):
+        """In-memory state of a student's attempt, loaded on first use (caller holds the lock)"""
+        state = self.attempts.get((exam_id, user_id))
+        if state is None:
+            attempt = ExamAttempt.query.filter_by(exam_id=exam_id, user_id=user_id).first()
+            if attempt is None:
+                return None
+            state = self.attempts[(exam_id, user_id)] = self._state(attempt)
+        return state
+    
+    @staticmethod
+    def _merge(answers, delta):
+        merged = dict(answers or {})
+        for question_id, answer in delta.items():
+            if answer is None:
+                merged.pop(question_id, None)
+            else:
+                merged[question_id] = answer
+        return merged
+    
+    def _view(self, state):
+        """Attempt dict with the stored answers plus this worker's unwritten changes"""
+        stored, submission_id = db.session.execute(
+            db.select(ExamAttempt.answers, ExamAttempt.submission_id).where(ExamAttempt.id == state['id'])
+        ).one()
+        state['submission_id'] = state['submission_id'] or submission_id
+        with self.lock:
+            answers = self._merge(stored, state['delta'])
+        return {
+            'attempt_id': state['id'],
+            'exam_id': state['exam_id'],
+            'answers': answers,
+            'started_at': state['started_at'].isoformat(),
+            'deadline': state['deadline'].isoformat(),
+            'submission_id': state['submission_id']
+        }
+    
+    def start(self, exam, user_id):
+        """
+        Open (or resume) a student's attempt
+        Args:
+            exam: Published Exam
+            user_id: Student's user id
+        Returns:
+            Attempt dict with the answers saved so far and the deadline
+        """
+        now = datetime.utcnow()
+        if exam.scheduled_date and now < exam.scheduled_date:
+            raise ExamSessionError('পরীক্ষা এখনও শুরু হয়নি', 403)
+        
+        with self.lock:
+            state = self._get(exam.id, user_id)
+        if state is None:
+            deadline = now + timedelta(minutes=exam.duration_minutes or 0)
+            if exam.scheduled_date:
+                # Everyone in a scheduled exam stops at the same time
+                deadline = min(deadline, exam.scheduled_date + timedelta(minutes=exam.duration_minutes or 0))
+            if deadline <= now:
+                raise ExamSessionError('পরীক্ষার সময় শেষ', 403)
+            
+            try:
+                db.session.add(ExamAttempt(exam_id=exam.id, user_id=user_id, answers={},
+                                           started_at=now, deadline=deadline))
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()  # A concurrent start won; resume its attempt
+            with self.lock:
+                state = self._get(exam.id, user_id)
+        return self._view(state)
+    
+    def autosave(self, exam_id, user_id, changes, seq=None):
+        """
+        Buffer changed answers of a student's attempt; merged into the stored row by the next flush
+        Args:
+            exam_id: Exam id
+            user_id: Student's user id
+            changes: {question id: answer}; a None answer clears the question
+            seq: Client's autosave counter (int); saves older than the last one applied here are ignored
+        Returns:
+            Dict with the number of answers applied and the last applied seq
+        """
+        if seq is not None and (not isinstance(seq, int) or isinstance(seq, bool)):
+            raise ExamSessionError('seq must be an integer')
+        key = self.answer_key(exam_id)
+        unknown = [question_id for question_id in changes if str(question_id) not in key.known]
+        if unknown:
+            raise ExamSessionError(f'Unknown questions: {unknown}')
+        if any(answer is not None and len(str(answer)) > self.max_answer_length for answer in changes.values()):
+            raise ExamSessionError('উত্তর অনেক বড়', 413)
+        
+        with self.lock:
+            state = self._get(exam_id, user_id)
+            if state is None:
+                raise ExamSessionError('পরীক্ষা শুরু করা হয়নি', 404)
+            if state['submission_id']:
+                raise ExamSessionError('পরীক্ষা ইতিমধ্যে জমা দেওয়া হয়েছে', 409)
+            if datetime.utcnow() > state['deadline'] + self.grace:
+                raise ExamSessionError('পরীক্ষার সময় শেষ', 409)
+            if seq is not None:
+                if seq <= state['seq']:
+                    return {'saved': 0, 'seq': state['seq']}
+                state['seq'] = seq
+            
+            for question_id, answer in changes.items():
+                state['delta'][str(question_id)] = None if answer is None else str(answer)
+            self.pending.add((exam_id, user_id))
+            return {'saved': len(changes), 'seq': state['seq']}
+    
+    def _dead_letter(self, attempt_id, delta, error):
+        """Give up on answers that keep failing to save: log them and keep a copy for manual recovery"""
+        print(f"❌ Dropping autosaved answers of attempt {attempt_id} after {self.max_retries} failed writes: {error}")
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path), exist_ok=True)
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'attempt_id': attempt_id, 'answers': delta, 'error': str(error),
+                                    'at': datetime.utcnow().isoformat()}, ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"❌ Could not write exam autosave dead letter: {e}")
+    
+    def _write(self, deltas, now):
+        """Merge {attempt id: delta} into the stored answers in one transaction (needs an app context)"""
+        rows = db.session.execute(
+            db.select(ExamAttempt.id, ExamAttempt.answers, ExamAttempt.submission_id)
+            .where(ExamAttempt.id.in_(list(deltas))).with_for_update()
+        ).all()
+        batch = [
+            {'id': row.id, 'answers': self._merge(row.answers, deltas[row.id]), 'saved_at': now}
+            for row in rows if row.submission_id is None  # Answers arriving after submit are moot
+        ]
+        if batch:
+            db.session.execute(db.update(ExamAttempt), batch)
+        db.session.commit()
+        return len(batch)
+    
+    def flush(self, keys=None):
+        """
+        Merge buffered deltas into their stored attempts in one batched transaction
+        Args:
+            keys: Only flush these (exam id, user id) attempts (default: all pending)
+        Returns:
+            Number of attempts written
+        """
+        now = datetime.utcnow()
+        full = keys is None
+        with self.lock:
+            keys = self.pending if full else self.pending & set(keys)
+            self.pending = self.pending - keys
+            deltas = {}
+            for key in keys:
+                state = self.attempts.get(key)
+                if state and state['delta']:
+                    deltas[state['id']] = (key, state['delta'])
+                    state['delta'] = {}
+            if full:
+                # Drop attempts nobody can write to any more
+                for key, state in list(self.attempts.items()):
+                    if key not in keys and not state['delta'] and now > state['deadline'] + self.grace * 2:
+                        del self.attempts[key]
+        if not deltas:
+            return 0
+        
+        with self.app.app_context():
+            try:
+                written = self._write({attempt_id: delta for attempt_id, (_, delta) in deltas.items()}, now)
+                for attempt_id in deltas:
+                    self.failures.pop(attempt_id, None)
+                return written
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error flushing exam answers, retrying one by one: {e}")
+            
+            # Attempt by attempt, so one bad row cannot hold back the rest
+            written, retry = 0, {}
+            for attempt_id, (key, delta) in deltas.items():
+                try:
+                    written += self._write({attempt_id: delta}, now)
+                    self.failures.pop(attempt_id, None)
+                except Exception as e:
+                    db.session.rollback()
+                    attempts = self.failures[attempt_id] = self.failures.get(attempt_id, 0) + 1
+                    if attempts >= self.max_retries:
+                        self.failures.pop(attempt_id, None)
+                        self._dead_letter(attempt_id, delta, e)
+                    else:
+                        retry[key] = delta
+        if retry:
+            with self.lock:
+                for key, delta in retry.items():
+                    state = self.attempts.get(key)
+                    if state is not None:
+                        # Changes made since this flush began win over the failed ones
+                        state['delta'] = dict(delta, **state['delta'])
+                        self.pending.add(key)
+        return written
+    
+    def submit(self, exam_id, user_id, changes=None):
+        """
+        Grade and record a student's attempt; repeated calls return the same submission
+        Args:
+            exam_id: Exam id
+            user_id: Student's user id
+            changes: Last answers not yet autosaved, merged when within the deadline
+        Returns:
+            The Submission
+        """
+        with self.lock:
+            state = self._get(exam_id, user_id)
+        if state is None:
+            raise ExamSessionError('পরীক্ষা শুরু করা হয়নি', 404)
+        
+        with state['lock']:
+            if state['submission_id']:
+                return db.session.get(Submission, state['submission_id'])
+            
+            now = datetime.utcnow()
+            if changes and now <= state['deadline'] + self.grace:
+                self.autosave(exam_id, user_id, changes)
+            # Grade what is stored, which includes answers autosaved through other workers
+            self.flush([(exam_id, user_id)])
+            with self.lock:
+                if state['delta']:
+                    raise ExamSessionError('উত্তর সংরক্ষণ করা যায়নি, আবার জমা দিন', 503)
+            
+            stored, submission_id = db.session.execute(
+                db.select(ExamAttempt.answers, ExamAttempt.submission_id)
+                .where(ExamAttempt.id == state['id']).with_for_update()
+            ).one()
+            if submission_id:
+                db.session.rollback()
+                state['submission_id'] = submission_id
+                return db.session.get(Submission, submission_id)
+            answers = dict(stored or {})
+            
+            submission = Submission(
+                user_id=user_id,
+                exam_id=exam_id,
+                score=self.grade(exam_id, answers),
+                total_score=100,
+                answers=answers,
+                submitted_at=now,
+                time_taken_minutes=max(0, round((min(now, state['deadline']) - state['started_at']).total_seconds() / 60))
+            )
+            db.session.add(submission)
+            db.session.flush()
+            
+            # The guard on submission_id makes a second process's submit a no-op
+            claimed = db.session.execute(
+                db.update(ExamAttempt.__table__).where(
+                    ExamAttempt.__table__.c.id == state['id'],
+                    ExamAttempt.__table__.c.submission_id.is_(None)
+                ).values(submission_id=submission.id, saved_at=now)
+            ).rowcount
+            if not claimed:
+                db.session.rollback()
+                state['submission_id'] = db.session.query(ExamAttempt.submission_id).filter_by(id=state['id']).scalar()
+                return db.session.get(Submission, state['submission_id'])
+            db.session.commit()
+            
+            state['submission_id'] = submission.id
+            return submission
+
+
+# Global instance
+exam_sessions = ExamSessionService()
@@ -3,29 +3,50 @@ Gemini AI Tutor Service for Olympiad Math Questions in Bangla
 Provides informal, friendly explanations in Bangla style
 """
 
-import google.generativeai as genai
 from config import Config
+from services.llm_backends import create_backend
+from services.response_cache import ResponseCache, make_key
+from services.prompt_builder import PromptBuilder
+from services.resilience import ResilientCaller, ModelUnavailableError
 import os
 
 class GeminiTutor:
     def __init__(self):
         self.api_key = Config.GEMINI_API_KEY
-        self.model = None
+        self.backend = None
+        self.cache = ResponseCache(
+            Config.AI_CACHE_PATH,
+            ttl_seconds=Config.AI_CACHE_TTL,
+            max_entries=Config.AI_CACHE_MAX_ENTRIES,
+            memory_entries=Config.AI_CACHE_MEMORY_ENTRIES
+        )
+        self.prompts = PromptBuilder(
+            self.get_system_prompt(),
+            max_chars=Config.AI_PROMPT_MAX_CHARS,
+            max_turn_chars=Config.AI_PROMPT_TURN_MAX_CHARS
+        )
+        self.caller = ResilientCaller(
+            max_in_flight=Config.AI_MAX_IN_FLIGHT,
+            timeout=Config.AI_CALL_TIMEOUT,
+            failure_threshold=Config.AI_BREAKER_THRESHOLD,
+            reset_timeout=Config.AI_BREAKER_RESET
+        )
+        # Callables question -> answer or None, tried when the model is unavailable
+        self.fallbacks = []
         self.initialize()
     
     def initialize(self):
-        """Initialize Gemini API"""
-        if not self.api_key:
+        """Initialize the configured LLM backend (Gemini API or the local stub)"""
+        if Config.AI_BACKEND == 'gemini' and not self.api_key:
             print("⚠️  Warning: GEMINI_API_KEY not found in environment variables")
             return False
         
         try:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
-            print("✅ Gemini AI initialized successfully")
+            self.backend = create_backend(Config)
+            print(f"✅ AI backend '{self.backend.name}' initialized successfully")
             return True
         except Exception as e:
-            print(f"❌ Gemini AI initialization failed: {e}")
+            print(f"❌ AI backend initialization failed: {e}")
             return False
     
     def get_system_prompt(self):
@@ -56,49 +77,131 @@ class GeminiTutor:
 মনে রাখবে: তোমার লক্ষ্য শুধু সমস্যা সমাধান করা নয়, ছাত্রের চিন্তার দক্ষতা বৃদ্ধি করা।
 """
     
-    def ask(self, question, context=None):
+    def build_prompt(self, question, context=None, summary=None):
+        """Assemble the full prompt, trimming old history to the configured budget"""
+        prompt, stats = self.prompts.build(question, context, summary)
+        # Running totals are in status(); only prompts that lost history are worth a line each
+        if stats['turns_dropped']:
+            print(f"📝 Prompt trimmed: {stats['chars']} chars (~{stats['est_tokens']} tokens), "
+                  f"{stats['turns_kept']} turns kept, {stats['turns_dropped']} dropped")
+        return prompt
+    
+    def fallback_answer(self, question, cache_key):
+        """Expired cached answer or a precomputed one, for when the model is unavailable"""
+        stale = self.cache.get(cache_key, allow_stale=True)
+        if stale is not None:
+            return stale
+        for fallback in self.fallbacks:
+            answer = fallback(question)
+            if answer:
+                return answer
+        return None
+    
+    def status(self):
+        """Breaker state, latency and cache/prompt statistics"""
+        return {
+            'backend': self.backend.name if self.backend else None,
+            'breaker': self.caller.stats(),
+            'cache': self.cache.stats(),
+            'prompts': self.prompts.stats()
+        }
+    
+    def ask(self, question, context=None, summary=None, raise_errors=False):
         """
         Ask Gemini a question about olympiad math
         Args:
             question: The math question or user query
             context: Optional previous conversation context
+            summary: Optional summary of earlier, compacted turns
+            raise_errors: Raise on failure instead of returning an error message
         Returns:
             Bangla response from Gemini
         """
-        if not self.model:
+        if not self.backend and raise_errors:
+            raise RuntimeError('Gemini API key not configured')
+        if not self.backend:
             return "দুঃখিত! AI টিউটর এই মুহূর্তে উপলব্ধ নেই। অনুগ্রহ করে পরে চেষ্টা করো। (Gemini API key not configured)"
         
+        cache_key = make_key('ask', self.prompts.prefix, question, context or [], summary or '')
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            # Build conversation history if context provided
-            prompt = self.get_system_prompt() + "\n\n"
-            
-            if context:
-                prompt += "আগের কথোপকথন:\n"
-                for msg in context:
-                    prompt += f"{msg['role']}: {msg['content']}\n"
-                prompt += "\n"
-            
-            prompt += f"ছাত্র/ছাত্রীর প্রশ্ন: {question}\n\nউত্তর:"
-            
-            response = self.model.generate_content(prompt)
-            return response.text
+            answer = self.caller.call(self.backend.generate, self.build_prompt(question, context, summary))
+            self.cache.set(cache_key, answer)
+            return answer
+        
+        except ModelUnavailableError as e:
+            print(f"Gemini unavailable: {e}")
+            answer = self.fallback_answer(question, cache_key)
+            if answer is not None:
+                return answer
+            if raise_errors:
+                raise
+            return f"দুঃখিত! AI টিউটর এখন ব্যস্ত। একটু পরে আবার চেষ্টা করো। ({str(e)})"
         
         except Exception as e:
             print(f"Error in Gemini API call: {e}")
+            if raise_errors:
+                raise
             return f"দুঃখিত! একটা সমস্যা হয়েছে। আবার চেষ্টা করো। (Error: {str(e)})"
     
-    def explain_solution(self, problem_statement, solution_english):
+    def ask_stream(self, question, context=None, summary=None):
+        """
+        Streaming variant of ask
+        Args:
+            question: The math question or user query
+            context: Optional previous conversation context
+            summary: Optional summary of earlier, compacted turns
+        Yields:
+            Chunks of the Bangla response as the model produces them
+        Raises:
+            Any model error, so the caller can report it mid-stream
+        """
+        if not self.backend:
+            raise RuntimeError('Gemini API key not configured')
+        
+        cache_key = make_key('ask', self.prompts.prefix, question, context or [], summary or '')
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        chunks = []
+        try:
+            for chunk in self.caller.stream(self.backend.stream, self.build_prompt(question, context, summary)):
+                chunks.append(chunk)
+                yield chunk
+        except ModelUnavailableError:
+            answer = self.fallback_answer(question, cache_key)
+            if answer is None:
+                raise
+            yield answer
+            return
+        
+        # Only complete answers are cached
+        self.cache.set(cache_key, ''.join(chunks))
+    
+    def explain_solution(self, problem_statement, solution_english, raise_errors=False):
         """
         Translate and explain a solution in informal Bangla
         Args:
             problem_statement: The math problem
             solution_english: English solution to translate
+            raise_errors: Raise on failure instead of returning an error message
         Returns:
             Bangla explanation
         """
-        prompt = f"""{self.get_system_prompt()}
+        if not self.backend and raise_errors:
+            raise RuntimeError('Gemini API key not configured')
+        
+        cache_key = make_key('explain_solution', self.prompts.prefix, problem_statement, solution_english)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
         
-প্রশ্ন: {problem_statement}
+        prompt = f"""{self.prompts.prefix}প্রশ্ন: {problem_statement}
 
 ইংরেজি সমাধান: {solution_english}
 
@@ -106,9 +209,12 @@ class GeminiTutor:
 """
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            answer = self.caller.call(self.backend.generate, prompt)
+            self.cache.set(cache_key, answer)
+            return answer
         except Exception as e:
+            if raise_errors:
+                raise
             return f"সমাধান অনুবাদ করতে সমস্যা হয়েছে: {str(e)}"
 
 # Global instance
@@ -0,0 +1,243 @@
+"""
+Exam Grading
+Scores submissions against an exam's answer key in one vectorized NumPy
+pass. Every answer part is reduced to an integer code (its position in the
+key's vocabulary, -1 if the key never accepts it), so grading a whole exam
+is an array comparison, a per-question sum and a dot product with the marks.
+
+Answers are compared case-insensitively with runs of whitespace collapsed,
+and numbers by value, so "0.5", ".5" and "1/2" are the same answer.
+Questions with partial_credit set may have several key parts separated by
+';' (each worth an equal share of the question's marks), each listing
+accepted alternatives separated by '|'. Other keys are one literal answer.
+"""
+
+import re
+import time
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+
+from models import db, ExamQuestion, Submission
+from services.leaderboards import leaderboards
+from services.user_stats import user_stats
+
+PART_SEPARATOR = ';'
+ALTERNATIVE_SEPARATOR = '|'
+SPACING = re.compile(r'\s+')
+NUMBER = re.compile(r'^[-+]?(\d+(\.\d*)?|\.\d+)(/\d+)?$')
+
+
+@lru_cache(maxsize=200000)
+def normalize_part(part):
+    """Canonical form of one answer part: numbers by value, text casefolded with spacing collapsed"""
+    part = SPACING.sub(' ', str(part)).strip().casefold()
+    if NUMBER.match(part):
+        try:
+            return str(Fraction(part))
+        except (ValueError, ZeroDivisionError):
+            pass
+    return part
+
+
+@lru_cache(maxsize=200000)
+def split_answer(answer, partial_credit=True):
+    if not partial_credit:
+        return (normalize_part(answer),)
+    return tuple(normalize_part(part) for part in str(answer).split(PART_SEPARATOR))
+
+
+class AnswerKey:
+    """An exam's key compiled to arrays: one column per answer part"""
+    
+    def __init__(self, rows):
+        """
+        Args:
+            rows: (question_id, points, answer_key, partial_credit) per exam question
+        """
+        self.question_ids = [str(row[0]) for row in rows]
+        self.known = set(self.question_ids)
+        self.partial = [bool(row[3]) for row in rows]
+        self.points = np.array([row[1] or 0 for row in rows], dtype=np.float64)
+        self.vocabulary = {}
+        self.columns = []  # (question index, part index)
+        alternatives = []
+        for index, (_, _, answer_key, partial_credit) in enumerate(rows):
+            # A question without a key is worth nothing until it gets one
+            if answer_key in (None, ''):
+                parts = []
+                self.points[index] = 0
+            else:
+                parts = str(answer_key).split(PART_SEPARATOR) if partial_credit else [str(answer_key)]
+            for part_index, part in enumerate(parts or ['']):
+                accepted = part.split(ALTERNATIVE_SEPARATOR) if partial_credit else [part]
+                codes = {self.vocabulary.setdefault(normalize_part(alt), len(self.vocabulary))
+                         for alt in accepted} if parts else set()
+                self.columns.append((index, part_index))
+                alternatives.append(sorted(codes))
+        
+        width = max([len(codes) for codes in alternatives] + [1])
+        self.accepted = np.full((len(self.columns), width), -2, dtype=np.int32)
+        for column, codes in enumerate(alternatives):
+            self.accepted[column, :len(codes)] = codes
+        column_questions = np.array([index for index, _ in self.columns], dtype=np.int64)
+        self.starts = np.flatnonzero(np.r_[True, column_questions[1:] != column_questions[:-1]]) \
+            if self.columns else np.zeros(0, dtype=np.int64)
+        self.parts = np.diff(np.r_[self.starts, len(self.columns)])
+        self.total = self.points.sum()
+    
+    def encode(self, answers_list):
+        """
+        Answer codes for many submissions
+        Args:
+            answers_list: Sequence of {question id (str): answer} dicts
+        Returns:
+            int32 array (submissions x columns); -1 for missing or unknown answers
+        """
+        layout = [(question_id, int(parts), (-1,) * int(parts), partial)
+                  for question_id, parts, partial in zip(self.question_ids, self.parts, self.partial)]
+        encoded = {}  # (answer, partial) -> codes of its parts; answers repeat heavily across submissions
+        vocabulary = self.vocabulary
+        rows = []
+        for answers in answers_list:
+            row = []
+            answers = answers or {}
+            for question_id, parts, missing, partial in layout:
+                answer = answers.get(question_id)
+                if answer is None:
+                    row.extend(missing)
+                    continue
+                given = encoded.get((answer, partial))
+                if given is None:
+                    given = encoded[(answer, partial)] = tuple(
+                        vocabulary.get(part, -1) for part in split_answer(answer, partial)
+                    )
+                row.extend((given + missing)[:parts])
+            rows.append(row)
+        return np.array(rows, dtype=np.int32).reshape(len(rows), len(self.columns))
+    
+    def score_codes(self, codes):
+        """Percentage scores (0-100, rounded) for encoded submissions"""
+        if not len(codes) or not self.total:
+            return np.zeros(len(codes), dtype=np.int64)
+        correct = (codes[:, :, None] == self.accepted[None, :, :]).any(axis=2)
+        credit = np.add.reduceat(correct, self.starts, axis=1) / self.parts
+        return np.rint(100 * (credit @ self.points) / self.total).astype(np.int64)
+    
+    def score(self, answers_list):
+        return self.score_codes(self.encode(answers_list))
+
+
+class GradingEngine:
+    def __init__(self, batch_size=5000):
+        """
+        Args:
+            batch_size: Score updates per executemany
+        """
+        self.batch_size = batch_size
+    
+    def answer_key(self, exam_id, corrections=None):
+        """
+        Compiled key of an exam
+        Args:
+            corrections: {question id (int): answer key} overriding the stored keys, from validate_corrections
+        """
+        rows = db.session.query(
+            ExamQuestion.question_id, ExamQuestion.points, ExamQuestion.answer_key, ExamQuestion.partial_credit
+        ).filter(ExamQuestion.exam_id == exam_id).order_by(ExamQuestion.position, ExamQuestion.id).all()
+        corrections = corrections or {}
+        return AnswerKey([(row.question_id, row.points, corrections.get(row.question_id, row.answer_key),
+                           row.partial_credit) for row in rows])
+    
+    def validate_corrections(self, exam_id, corrections):
+        """
+        Check answer key corrections against an exam's questions
+        Args:
+            corrections: {question id: new answer key} as sent by the client
+        Returns:
+            {question id (int): answer key (str or None)}
+        Raises:
+            ValueError: A question id is not an integer or not on the exam, or a key is not text
+        """
+        parsed = {}
+        for question_id, answer_key in corrections.items():
+            try:
+                parsed[int(question_id)] = answer_key
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid question id: {question_id!r}')
+            if answer_key is not None and not isinstance(answer_key, str):
+                raise ValueError(f'Answer key of question {question_id} must be text')
+        known = {question_id for (question_id,) in db.session.query(ExamQuestion.question_id).filter(
+            ExamQuestion.exam_id == exam_id
+        )}
+        unknown = sorted(set(parsed) - known)
+        if unknown:
+            raise ValueError(f'Questions not on this exam: {unknown}')
+        return parsed
+    
+    def regrade(self, exam_id, dry_run=False, corrections=None):
+        """
+        Rescore every submission of an exam and write back the scores that changed
+        Args:
+            exam_id: Exam id
+            dry_run: Compute the new scores without saving them (or the corrections)
+            corrections: Validated answer key corrections, saved together with the new scores
+        Returns:
+            Dict with submissions/changed/students counts and timings
+        """
+        from services.exam_sessions import exam_sessions
+        
+        started = time.time()
+        key = self.answer_key(exam_id, corrections)
+        rows = db.session.execute(
+            db.select(Submission.id, Submission.user_id, Submission.score, Submission.answers)
+            .where(Submission.exam_id == exam_id).order_by(Submission.id)
+        ).all()
+        loaded = time.time()
+        
+        ids = np.array([row.id for row in rows], dtype=np.int64)
+        user_ids = np.array([row.user_id for row in rows], dtype=np.int64)
+        old_scores = np.array([row.score or 0 for row in rows], dtype=np.int64)
+        new_scores = key.score([row.answers for row in rows])
+        changed = np.flatnonzero(new_scores != old_scores)
+        scored = time.time()
+        
+        students = sorted(set(user_ids[changed].tolist()))
+        if not dry_run and (changed.size or corrections):
+            db.session.rollback()  # End the read transaction before writing on another connection
+            with db.engine.begin() as connection:
+                questions = ExamQuestion.__table__
+                for question_id, answer_key in (corrections or {}).items():
+                    connection.execute(questions.update().where(
+                        questions.c.exam_id == exam_id, questions.c.question_id == question_id
+                    ).values(answer_key=answer_key))
+                
+                table = Submission.__table__
+                statement = table.update().where(table.c.id == db.bindparam('submission_id')).values(
+                    score=db.bindparam('new_score')
+                )
+                updates = [{'submission_id': submission_id, 'new_score': score}
+                           for submission_id, score in zip(ids[changed].tolist(), new_scores[changed].tolist())]
+                for start in range(0, len(updates), self.batch_size):
+                    connection.execute(statement, updates[start:start + self.batch_size])
+                # The bulk UPDATE bypasses the ORM events that keep these current
+                user_stats.rebuild(students, connection=connection)
+            leaderboards.invalidate(exam_id)
+            exam_sessions.invalidate(exam_id)
+        
+        return {
+            'exam_id': exam_id,
+            'submissions': len(rows),
+            'changed': int(changed.size),
+            'students': len(students),
+            'saved': not dry_run,
+            'keys_corrected': 0 if dry_run else len(corrections or {}),
+            'load_seconds': round(loaded - started, 3),
+            'score_seconds': round(scored - loaded, 3),
+            'total_seconds': round(time.time() - started, 3)
+        }
+
+
+# Global instance
+grader = GradingEngine()
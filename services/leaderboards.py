@@ -0,0 +1,260 @@
+"""
+Exam Leaderboards
+One in-memory score index per exam: a Fenwick tree of score counts gives a
+student's rank and percentile in O(log S) and per-score buckets give the
+top-N without sorting every submission. Indexes are loaded from the
+database on first use, kept current from committed Submission writes, and
+the public top-N is served from a short-lived snapshot.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event
+
+from models import db, Submission, User
+
+
+class FenwickTree:
+    """Counts per integer score with O(log n) updates and prefix sums"""
+    
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+    
+    def add(self, index, delta):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+    
+    def prefix(self, index):
+        """Sum of counts for scores 0..index"""
+        index = min(index, self.size - 1) + 1
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+
+class ExamLeaderboard:
+    """Best score per student for one exam"""
+    
+    def __init__(self, max_score=100):
+        self.counts = FenwickTree(max_score + 1)
+        self.entries = {}  # user id -> (score, submitted_at, submission id)
+        self.buckets = {}  # score -> {user id: submitted_at}
+        self.version = 0
+        self.loaded_at = time.time()
+    
+    def _clamp(self, score):
+        return max(0, min(score or 0, self.counts.size - 1))
+    
+    def _grow(self, score):
+        """Resize the tree when a score exceeds its range (rare: exams are out of a fixed total)"""
+        if score < self.counts.size:
+            return
+        tree = FenwickTree(max(score + 1, self.counts.size * 2))
+        for bucket_score, users in self.buckets.items():
+            tree.add(bucket_score, len(users))
+        self.counts = tree
+    
+    def put(self, user_id, score, submitted_at, submission_id):
+        """Set a student's leaderboard entry"""
+        self.remove(user_id)
+        score = max(score or 0, 0)
+        self._grow(score)
+        self.entries[user_id] = (score, submitted_at, submission_id)
+        self.buckets.setdefault(score, {})[user_id] = submitted_at
+        self.counts.add(score, 1)
+        self.version += 1
+    
+    def offer(self, user_id, score, submitted_at, submission_id):
+        """Keep the better of the current entry and this submission"""
+        current = self.entries.get(user_id)
+        if current is None or current[2] == submission_id or (score or 0) > current[0]:
+            self.put(user_id, score, submitted_at, submission_id)
+    
+    def remove(self, user_id):
+        entry = self.entries.pop(user_id, None)
+        if entry is None:
+            return
+        bucket = self.buckets[entry[0]]
+        del bucket[user_id]
+        if not bucket:
+            del self.buckets[entry[0]]
+        self.counts.add(self._clamp(entry[0]), -1)
+        self.version += 1
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def rank(self, user_id):
+        """
+        Competition rank (ties share a rank) and percentile of a student
+        Returns:
+            Dict with score/rank/percentile/participants, or None if the student has no entry
+        """
+        entry = self.entries.get(user_id)
+        if entry is None:
+            return None
+        score = entry[0]
+        total = len(self.entries)
+        below = self.counts.prefix(score - 1) if score > 0 else 0
+        above = total - self.counts.prefix(score)
+        return {
+            'score': score,
+            'rank': above + 1,
+            'percentile': round(100 * below / total, 1),
+            'participants': total
+        }
+    
+    def top(self, n):
+        """[(user id, score, submitted_at)] best first; earlier submissions win ties"""
+        result = []
+        for score in sorted(self.buckets, reverse=True):
+            for user_id, submitted_at in sorted(self.buckets[score].items(), key=lambda item: (item[1], item[0])):
+                result.append((user_id, score, submitted_at))
+                if len(result) >= n:
+                    return result
+        return result
+
+
+class LeaderboardService:
+    def __init__(self, snapshot_size=100, snapshot_ttl=5, reload_interval=60):
+        """
+        Args:
+            snapshot_size: Entries in the cached top-N snapshot
+            snapshot_ttl: Seconds a snapshot is served before it is rebuilt from a changed index
+            reload_interval: Seconds before an index is reloaded to pick up other processes' writes
+        """
+        self.snapshot_size = snapshot_size
+        self.snapshot_ttl = snapshot_ttl
+        self.reload_interval = reload_interval
+        self.lock = threading.RLock()
+        self.boards = {}  # exam id -> ExamLeaderboard
+        self.snapshots = {}  # exam id -> (built_at, version, snapshot dict)
+    
+    def init_app(self, app):
+        self.snapshot_size = app.config.get('LEADERBOARD_SNAPSHOT_SIZE', self.snapshot_size)
+        self.snapshot_ttl = app.config.get('LEADERBOARD_SNAPSHOT_TTL', self.snapshot_ttl)
+        self.reload_interval = app.config.get('LEADERBOARD_RELOAD_INTERVAL', self.reload_interval)
+        event.listen(db.session, 'after_flush', self._after_flush)
+        event.listen(db.session, 'after_commit', self._after_commit)
+        event.listen(db.session, 'after_soft_rollback', self._after_rollback)
+    
+    # ------------------------------------------------------------------
+    # Keeping loaded indexes current from committed writes
+    # ------------------------------------------------------------------
+    
+    def _after_flush(self, session, flush_context):
+        changes = session.info.setdefault('leaderboard_changes', [])
+        for submission in session.new | session.dirty:
+            if isinstance(submission, Submission):
+                changes.append(('put', submission.exam_id, submission.user_id, submission.score,
+                                submission.submitted_at, submission.id))
+                exam_history = db.inspect(submission).attrs.exam_id.history
+                user_history = db.inspect(submission).attrs.user_id.history
+                for old_exam in exam_history.deleted or ():
+                    changes.append(('reload', old_exam, None, None, None, None))
+                for old_user in user_history.deleted or ():
+                    changes.append(('reload', submission.exam_id, old_user, None, None, None))
+        for submission in session.deleted:
+            if isinstance(submission, Submission):
+                changes.append(('reload', submission.exam_id, submission.user_id, None, None, submission.id))
+    
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop('leaderboard_changes', None)
+    
+    def _after_commit(self, session):
+        changes = session.info.pop('leaderboard_changes', None)
+        if not changes:
+            return
+        with self.lock:
+            for action, exam_id, user_id, score, submitted_at, submission_id in changes:
+                board = self.boards.get(exam_id)
+                if board is None:
+                    continue  # Not loaded yet; the first lookup reads the committed rows
+                current = board.entries.get(user_id)
+                if action == 'put' and not (current and current[2] == submission_id and (score or 0) < current[0]):
+                    board.offer(user_id, score, submitted_at, submission_id)
+                else:
+                    # The student's best may have dropped or gone: reload this exam on next use
+                    self.boards.pop(exam_id, None)
+    
+    def invalidate(self, exam_id):
+        """Forget an exam's index, e.g. after bulk regrading that bypassed the ORM"""
+        with self.lock:
+            self.boards.pop(exam_id, None)
+            self.snapshots.pop(exam_id, None)
+    
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    
+    def load(self, exam_id):
+        """Build an exam's index from each student's best submission"""
+        ranked = db.select(
+            Submission.id, Submission.user_id, Submission.score, Submission.submitted_at, Submission.total_score,
+            db.func.row_number().over(
+                partition_by=Submission.user_id,
+                order_by=(Submission.score.desc(), Submission.submitted_at, Submission.id)
+            ).label('position')
+        ).where(Submission.exam_id == exam_id).subquery()
+        rows = db.session.execute(db.select(ranked).where(ranked.c.position == 1)).all()
+        
+        board = ExamLeaderboard(max([row.total_score or 0 for row in rows] + [100]))
+        for row in rows:
+            board.put(row.user_id, row.score, row.submitted_at, row.id)
+        return board
+    
+    def board(self, exam_id):
+        with self.lock:
+            board = self.boards.get(exam_id)
+            if board is not None and time.time() - board.loaded_at < self.reload_interval:
+                return board
+        board = self.load(exam_id)
+        with self.lock:
+            self.boards[exam_id] = board
+        return board
+    
+    def rank(self, exam_id, user_id):
+        board = self.board(exam_id)
+        with self.lock:
+            return board.rank(user_id)
+    
+    def snapshot(self, exam_id):
+        """
+        Cached top-N for the post-exam rush; rebuilt at most every snapshot_ttl seconds
+        Returns:
+            Dict with exam_id, participants, generated_at and the ranked entries
+        """
+        board = self.board(exam_id)
+        with self.lock:
+            cached = self.snapshots.get(exam_id)
+            if cached and (cached[1] == (id(board), board.version) or time.time() - cached[0] < self.snapshot_ttl):
+                return cached[2]
+            version = (id(board), board.version)
+            top = board.top(self.snapshot_size)
+            participants = len(board)
+        
+        names = dict(db.session.query(User.id, User.name).filter(User.id.in_([user_id for user_id, _, _ in top])))
+        entries, rank = [], 0
+        for position, (user_id, score, submitted_at) in enumerate(top, start=1):
+            if not entries or entries[-1]['score'] != score:
+                rank = position
+            entries.append({'rank': rank, 'user_id': user_id, 'name': names.get(user_id), 'score': score})
+        snapshot = {
+            'exam_id': exam_id,
+            'participants': participants,
+            'generated_at': time.time(),
+            'entries': entries
+        }
+        with self.lock:
+            self.snapshots[exam_id] = (time.time(), version, snapshot)
+        return snapshot
+
+
+# Global instance
+leaderboards = LeaderboardService()
@@ -0,0 +1,112 @@
+"""
+LLM Backends
+Interchangeable text-generation backends behind GeminiTutor: the real
+Gemini API and a local stub that simulates latency, errors and streaming
+so the AI paths can be load-tested offline.
+"""
+
+import hashlib
+import random
+import time
+
+
+class GeminiBackend:
+    name = 'gemini'
+    
+    def __init__(self, api_key, model_name='gemini-pro'):
+        # Lazy import to avoid Python 3.14 compatibility issues at startup
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+    
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+    
+    def stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+class StubBackendError(Exception):
+    """Simulated provider failure"""
+
+
+class StubBackend:
+    """
+    Deterministic offline backend.
+    Latency is drawn per call from a fixed, uniform or lognormal distribution
+    around latency_ms; error_rate is the fraction of calls that fail.
+    """
+    name = 'stub'
+    
+    SENTENCES = [
+        'চলো ধাপে ধাপে সমস্যাটা দেখি।',
+        'প্রথমে দেখো প্রশ্নটা আসলে কী জানতে চাইছে।',
+        'এখানে মূল কৌশল হলো সমীকরণটাকে সাজিয়ে লেখা।',
+        'এবার প্রতিটি ক্ষেত্র আলাদা করে যাচাই করি।',
+        'তাহলে উত্তরটা আমরা পেয়ে গেলাম।',
+        'মনে রাখবে, এই ধরনের প্রশ্নে প্যাটার্ন খোঁজাটা খুব কাজের।'
+    ]
+    
+    def __init__(self, latency_ms=800, distribution='lognormal', error_rate=0.0,
+                 chunk_chars=40, chunk_delay_ms=30, answer_sentences=6, seed=None):
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.chunk_chars = chunk_chars
+        self.chunk_delay_ms = chunk_delay_ms
+        self.answer_sentences = answer_sentences
+        self.random = random.Random(seed)
+    
+    def _latency(self):
+        if self.distribution == 'fixed':
+            return self.latency_ms / 1000
+        if self.distribution == 'uniform':
+            return self.random.uniform(0, 2 * self.latency_ms) / 1000
+        # Lognormal with the configured median - long tail like a real provider
+        return self.latency_ms * self.random.lognormvariate(0, 0.5) / 1000
+    
+    def _maybe_fail(self):
+        if self.random.random() < self.error_rate:
+            raise StubBackendError('simulated provider error')
+    
+    def _answer(self, prompt):
+        """Same prompt always gives the same Bangla text"""
+        digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+        sentences = [self.SENTENCES[b % len(self.SENTENCES)] for b in digest[:self.answer_sentences]]
+        return f"(stub {digest.hex()[:8]}) " + ' '.join(sentences)
+    
+    def generate(self, prompt):
+        time.sleep(self._latency())
+        self._maybe_fail()
+        return self._answer(prompt)
+    
+    def stream(self, prompt):
+        time.sleep(self._latency())
+        self._maybe_fail()
+        answer = self._answer(prompt)
+        for start in range(0, len(answer), self.chunk_chars):
+            if start:
+                time.sleep(self.chunk_delay_ms / 1000)
+            yield answer[start:start + self.chunk_chars]
+
+
+def create_backend(config):
+    """
+    Backend selected by config.AI_BACKEND
+    Returns:
+        A backend, or None when Gemini is selected but no API key is set
+    """
+    if config.AI_BACKEND == 'stub':
+        return StubBackend(
+            latency_ms=config.AI_STUB_LATENCY_MS,
+            distribution=config.AI_STUB_DISTRIBUTION,
+            error_rate=config.AI_STUB_ERROR_RATE,
+            chunk_chars=config.AI_STUB_CHUNK_CHARS,
+            seed=config.AI_STUB_SEED
+        )
+    
+    if not config.GEMINI_API_KEY:
+        return None
+    return GeminiBackend(config.GEMINI_API_KEY)
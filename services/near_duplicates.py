@@ -0,0 +1,270 @@
+"""
+Near-Duplicate Question Detection
+MinHash signatures over character shingles of each statement, banded into
+an LSH table (question_lsh_buckets) so candidates are found by bucket
+lookups instead of comparing every pair of questions.
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+
+from models import db, Question, QuestionBucket
+from services.question_changes import question_changes
+
+MAX_HASH = (1 << 32) - 1
+SHINGLE_PRIME = np.uint64(0x100000001B3)
+BLOCK_SHINGLES = 20000  # Shingles permuted at once (~10MB of uint32 at 120 permutations)
+NON_WORD = re.compile(r'[^\w\u0980-\u09FF]+|_')  # Bengali block kept so vowel signs survive
+
+
+def clean(text):
+    """Statement with case, spacing and punctuation removed"""
+    text = text or ''
+    if not unicodedata.is_normalized('NFKC', text):
+        text = unicodedata.normalize('NFKC', text)
+    # Dropping whitespace first leaves the regex far fewer matches to replace
+    return NON_WORD.sub('', ''.join(text.casefold().split()))
+
+
+def shingle_hashes(texts, size=5):
+    """
+    64-bit polynomial hashes of every character shingle of many statements,
+    with case, spacing and punctuation removed, in one pass over all their characters
+    Returns:
+        (uint64 hashes of every statement in turn, number of hashes of each statement)
+    """
+    cleaned = [clean(text) for text in texts]
+    lengths = np.array([len(text) for text in cleaned], dtype=np.int64)
+    codes = np.frombuffer(''.join(cleaned).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    windows = np.zeros(max(len(codes) - size + 1, 0), dtype=np.uint64)
+    for offset in range(size):
+        windows = windows * SHINGLE_PRIME + codes[offset:offset + len(windows)]
+    
+    # Keep the windows that start and end inside one statement; a shorter statement is one shingle
+    counts = np.where(lengths >= size, lengths - size + 1, np.minimum(lengths, 1))
+    starts = np.cumsum(lengths) - lengths
+    out_starts = np.cumsum(counts) - counts
+    hashes = np.empty(int(counts.sum()), dtype=np.uint64)
+    full = lengths >= size
+    full_counts = counts[full]
+    within = np.arange(int(full_counts.sum())) - np.repeat(np.cumsum(full_counts) - full_counts, full_counts)
+    hashes[np.repeat(out_starts[full], full_counts) + within] = windows[np.repeat(starts[full], full_counts) + within]
+    for index in np.flatnonzero(~full & (lengths > 0)):
+        short = np.zeros(1, dtype=np.uint64)
+        for code in codes[starts[index]:starts[index] + lengths[index]]:
+            short = short * SHINGLE_PRIME + code
+        hashes[out_starts[index]] = short[0]
+    return hashes, counts
+
+
+class NearDuplicateIndex:
+    def __init__(self, num_perm=120, bands=20, shingle_size=5, threshold=0.6, seed=1):
+        """
+        Args:
+            num_perm: Signature length
+            bands: LSH bands; more bands catch lower similarities but return more candidates
+            threshold: Estimated Jaccard similarity at which two questions count as duplicates
+        """
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        # Permutations h(x) = a * x + b in wrapping 32-bit arithmetic, a odd; half the memory traffic of 64-bit
+        rng = np.random.RandomState(seed)
+        self.a = (rng.randint(0, 1 << 31, size=num_perm, dtype=np.uint64) * 2 + 1).astype(np.uint32)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64).astype(np.uint32)
+    
+    def init_app(self, app):
+        question_changes.subscribe(before_commit=self._questions_written)
+    
+    def _questions_written(self, inserted, updated):
+        """Index bulk-written questions in the same transaction"""
+        if inserted:
+            self.add([row['id'] for row in inserted], self.stack([row['minhash'] for row in inserted]))
+        # Questions stored before signatures existed (or with a stale one) get their LSH rows now
+        stale = [row for row in updated if row['minhash'] != row['previous_minhash']]
+        if stale:
+            self.replace([row['id'] for row in stale], self.stack([row['minhash'] for row in stale]))
+    
+    def signatures(self, texts):
+        """MinHash signatures of many statements as an (n, num_perm) uint32 array"""
+        hashes, counts = shingle_hashes(texts, self.shingle_size)
+        hashes = ((hashes >> np.uint64(32)) ^ hashes).astype(np.uint32)
+        ends = np.cumsum(counts)
+        starts = ends - counts
+        result = np.full((len(counts), self.num_perm), MAX_HASH, dtype=np.uint32)
+        # Permutation-major, so the per-statement minimums reduce along contiguous memory
+        permuted = np.empty((self.num_perm, BLOCK_SHINGLES), dtype=np.uint32)
+        a, b = self.a[:, None], self.b[:, None]
+        start = 0
+        while start < len(counts):
+            # Permute a block of statements at once and take per-statement minimums with reduceat
+            stop = max(start + 1, int(np.searchsorted(ends, starts[start] + BLOCK_SHINGLES, 'right')))
+            group = start + np.flatnonzero(counts[start:stop])
+            if len(group):
+                block = hashes[starts[start]:ends[stop - 1]]
+                if len(block) > permuted.shape[1]:
+                    permuted = np.empty((self.num_perm, len(block)), dtype=np.uint32)
+                view = permuted[:, :len(block)]
+                np.multiply(a, block, out=view)
+                view += b
+                result[group] = np.minimum.reduceat(view, starts[group] - starts[start], axis=1).T
+            start = stop
+        return result
+    
+    def signature(self, text):
+        """MinHash signature (uint32 array) of a problem statement"""
+        return self.signatures([text])[0]
+    
+    def from_bytes(self, blob):
+        return np.frombuffer(blob, dtype=np.uint32)
+    
+    def stack(self, blobs):
+        """(n, num_perm) array of stored signatures"""
+        return np.frombuffer(b''.join(blobs), dtype=np.uint32).reshape(len(blobs), self.num_perm)
+    
+    def band_keys(self, signatures):
+        """(n, bands) int64 bucket of each band of each signature"""
+        rows = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        keys = np.zeros(rows.shape[:2], dtype=np.uint64)
+        for column in range(self.rows):
+            keys = keys * SHINGLE_PRIME + rows[:, :, column]
+        return keys.view(np.int64)
+    
+    def band_buckets(self, signature):
+        """[(band, bucket)] keys of a signature in the LSH table"""
+        return list(enumerate(self.band_keys(signature.reshape(1, -1))[0].tolist()))
+    
+    def similarity(self, sig_a, sig_b):
+        """Estimated Jaccard similarity of the two shingle sets"""
+        return float(np.mean(sig_a == sig_b))
+    
+    def bucket_members(self, keys):
+        """{(band, bucket): [question_id]} for the stored questions in any of keys, one query per band"""
+        by_band = {}
+        for band, bucket in keys:
+            by_band.setdefault(band, set()).add(bucket)
+        return self._members(by_band)
+    
+    def batch_members(self, keys):
+        """bucket_members for the (n, bands) band keys of a batch of signatures"""
+        return self._members({band: np.unique(keys[:, band]).tolist() for band in range(keys.shape[1])})
+    
+    def _members(self, by_band):
+        table = QuestionBucket.__table__
+        statement = db.select(table.c.question_id, table.c.bucket).where(
+            table.c.band == db.bindparam('band'), table.c.bucket.in_(db.bindparam('buckets', expanding=True))
+        )
+        members = {}
+        for band, buckets in by_band.items():
+            buckets = list(buckets)
+            if db.engine.dialect.name == 'sqlite':
+                # An import probes twenty buckets per question; rendering the IN list costs more than the lookups
+                rows = db.session.connection().exec_driver_sql(
+                    'SELECT question_id, bucket FROM question_lsh_buckets WHERE band = ? AND bucket IN ({})'.format(
+                        ', '.join('?' * len(buckets))
+                    ), (band, *buckets)
+                )
+            else:
+                rows = db.session.execute(statement, {'band': band, 'buckets': buckets})
+            for question_id, bucket in rows:
+                members.setdefault((band, bucket), []).append(question_id)
+        return members
+    
+    def signatures_for(self, question_ids):
+        rows = db.session.query(Question.id, Question.minhash).filter(
+            Question.id.in_(question_ids), Question.minhash.isnot(None)
+        )
+        return {question_id: self.from_bytes(blob) for question_id, blob in rows}
+    
+    def find(self, text, exclude_id=None, threshold=None):
+        """
+        Stored questions that look like text
+        Returns:
+            [(question_id, similarity)], most similar first
+        """
+        threshold = self.threshold if threshold is None else threshold
+        signature = self.signature(text)
+        candidates = {qid for ids in self.bucket_members(self.band_buckets(signature)).values() for qid in ids}
+        candidates.discard(exclude_id)
+        matches = [(question_id, self.similarity(signature, other))
+                   for question_id, other in self.signatures_for(candidates).items()]
+        return sorted([m for m in matches if m[1] >= threshold], key=lambda m: -m[1])
+    
+    def add(self, question_ids, signatures):
+        """Stage LSH rows for freshly inserted questions (caller commits)"""
+        if not len(question_ids):
+            return
+        keys = self.band_keys(np.asarray(signatures)).ravel()
+        question_ids = np.repeat(np.asarray(question_ids, dtype=np.int64), self.bands)
+        bands = np.tile(np.arange(self.bands), len(keys) // self.bands)
+        # In primary key order, so consecutive inserts land on the same B-tree pages
+        order = np.lexsort((question_ids, keys, bands))
+        rows = list(zip(question_ids[order].tolist(), bands[order].tolist(), keys[order].tolist()))
+        if db.engine.dialect.name == 'sqlite':
+            # Twenty rows per question: skip the per-row parameter dicts of a Core insert
+            db.session.connection().exec_driver_sql(
+                'INSERT INTO question_lsh_buckets (question_id, band, bucket) VALUES (?, ?, ?)', rows
+            )
+        else:
+            db.session.execute(QuestionBucket.__table__.insert(), [
+                {'question_id': question_id, 'band': band, 'bucket': bucket} for question_id, band, bucket in rows
+            ])
+    
+    def replace(self, question_ids, signatures):
+        """Store new signatures and LSH rows for existing questions (caller commits)"""
+        db.session.query(QuestionBucket).filter(QuestionBucket.question_id.in_(question_ids)).delete()
+        db.session.execute(db.update(Question), [
+            {'id': question_id, 'minhash': signature.tobytes()} for question_id, signature in zip(question_ids, signatures)
+        ])
+        self.add(question_ids, signatures)
+    
+    def rebuild(self, batch_size=500, missing_only=False):
+        """Recompute signatures and LSH rows for every question (or those without a signature)"""
+        if not missing_only:
+            db.session.query(QuestionBucket).delete()
+            db.session.query(Question).update({Question.minhash: None})
+            db.session.commit()
+        
+        indexed = 0
+        while True:
+            rows = db.session.query(Question.id, Question.problem_statement).filter(
+                Question.minhash.is_(None)
+            ).limit(batch_size).all()
+            if not rows:
+                return indexed
+            self.replace([row.id for row in rows], self.signatures([row.problem_statement for row in rows]))
+            db.session.commit()
+            indexed += len(rows)
+    
+    def pairs(self, threshold=None, limit=200):
+        """
+        Possible duplicate pairs across the whole bank, found from shared buckets
+        Returns:
+            [(question_id_a, question_id_b, similarity)], most similar first
+        """
+        threshold = self.threshold if threshold is None else threshold
+        a = db.aliased(QuestionBucket)
+        b = db.aliased(QuestionBucket)
+        candidate_pairs = db.session.query(a.question_id, b.question_id).join(
+            b, db.and_(a.band == b.band, a.bucket == b.bucket, a.question_id < b.question_id)
+        ).distinct().all()
+        
+        signatures = self.signatures_for({qid for pair in candidate_pairs for qid in pair})
+        results = []
+        for id_a, id_b in candidate_pairs:
+            if id_a in signatures and id_b in signatures:
+                score = self.similarity(signatures[id_a], signatures[id_b])
+                if score >= threshold:
+                    results.append((id_a, id_b, score))
+        results.sort(key=lambda r: -r[2])
+        return results[:limit]
+
+
+# Global instance
+near_duplicates = NearDuplicateIndex()
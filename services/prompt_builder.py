@@ -0,0 +1,85 @@
+"""
+Tutor Prompt Builder
+Assembles model prompts from a precomputed system prefix, a bounded slice
+of conversation history and the student's question, and records prompt
+sizes so savings from trimming are visible.
+"""
+
+import threading
+
+
+class PromptBuilder:
+    # Rough characters-per-token ratio, only used for reporting
+    CHARS_PER_TOKEN = 4
+    HISTORY_HEADER = "আগের কথোপকথন:\n"
+    DROPPED_NOTE = "(আগের {}টি বার্তা বাদ দেওয়া হয়েছে)\n"
+    
+    def __init__(self, system_prompt, max_chars=12000, max_turn_chars=2000):
+        self.prefix = system_prompt + "\n\n"
+        self.max_chars = max_chars
+        self.max_turn_chars = max_turn_chars
+        self.lock = threading.Lock()
+        self.totals = {'prompts': 0, 'chars': 0, 'chars_dropped': 0, 'turns_dropped': 0}
+    
+    def _turn(self, msg):
+        content = str(msg.get('content', ''))
+        if len(content) > self.max_turn_chars:
+            content = content[:self.max_turn_chars] + ' …'
+        return f"{msg.get('role', 'student')}: {content}\n"
+    
+    def build(self, question, context=None, summary=None):
+        """
+        Build the prompt for a question
+        Args:
+            question: The student's question
+            context: Previous turns, oldest first, as {'role', 'content'} dicts
+            summary: Optional rolling summary of turns older than context
+        Returns:
+            (prompt, stats) where stats reports size and what was dropped
+        """
+        tail = f"ছাত্র/ছাত্রীর প্রশ্ন: {question}\n\nউত্তর:"
+        summary_section = f"আগের আলোচনার সারসংক্ষেপ:\n{summary}\n\n" if summary else ''
+        turns = [self._turn(msg) for msg in (context or [])]
+        budget = self.max_chars - len(self.prefix) - len(summary_section) - len(tail)
+        if turns:
+            # Room for the history header and the widest possible dropped-turns note
+            budget -= len(self.HISTORY_HEADER) + len(self.DROPPED_NOTE.format(len(turns))) + 1
+        
+        # Keep the newest turns that fit; older ones are dropped first
+        kept = []
+        used = 0
+        for turn in reversed(turns):
+            if used + len(turn) > budget:
+                break
+            kept.append(turn)
+            used += len(turn)
+        kept.reverse()
+        dropped = len(turns) - len(kept)
+        
+        history = ''
+        if kept or dropped:
+            history = self.HISTORY_HEADER
+            if dropped:
+                history += self.DROPPED_NOTE.format(dropped)
+            history += ''.join(kept) + "\n"
+        
+        prompt = self.prefix + summary_section + history + tail
+        stats = {
+            'chars': len(prompt),
+            'est_tokens': len(prompt) // self.CHARS_PER_TOKEN,
+            'turns_kept': len(kept),
+            'turns_dropped': dropped,
+            'chars_dropped': sum(len(t) for t in turns) - used
+        }
+        with self.lock:
+            self.totals['prompts'] += 1
+            self.totals['chars'] += stats['chars']
+            self.totals['chars_dropped'] += stats['chars_dropped']
+            self.totals['turns_dropped'] += dropped
+        return prompt, stats
+    
+    def stats(self):
+        with self.lock:
+            totals = dict(self.totals)
+        totals['avg_chars'] = totals['chars'] // totals['prompts'] if totals['prompts'] else 0
+        return totals
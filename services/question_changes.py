@@ -0,0 +1,66 @@
+"""
+Question Change Notifications
+Bulk writes such as the ingestion pipeline bypass ORM flush events, so they
+record the questions they inserted or updated on the session instead. When
+the transaction commits, subscribed services are called with those rows:
+before_commit callbacks write derived rows in the same transaction, and
+after_commit callbacks refresh in-memory caches. A rollback drops the record.
+"""
+
+from sqlalchemy import event
+
+from models import db
+
+INFO_KEY = 'question_changes'
+
+
+class QuestionChanges:
+    def __init__(self):
+        self.before_commit = []  # callback(inserted, updated), runs inside the transaction
+        self.after_commit = []  # callback(inserted, updated), runs once the rows are committed
+        self.registered = False
+    
+    def init_app(self, app):
+        if self.registered:
+            return
+        event.listen(db.session, 'before_commit', self._before_commit)
+        event.listen(db.session, 'after_commit', self._after_commit)
+        event.listen(db.session, 'after_rollback', self._after_rollback)
+        self.registered = True
+    
+    def subscribe(self, before_commit=None, after_commit=None):
+        for callbacks, callback in ((self.before_commit, before_commit), (self.after_commit, after_commit)):
+            if callback is not None and callback not in callbacks:
+                callbacks.append(callback)
+    
+    def record(self, inserted=(), updated=()):
+        """
+        Note questions written in the current transaction
+        Args:
+            inserted, updated: Row dicts with id, title, problem_statement, topic, difficulty and minhash;
+                               updated rows also carry previous_minhash
+        """
+        if not inserted and not updated:
+            return
+        changes = db.session.info.setdefault(INFO_KEY, {'inserted': [], 'updated': []})
+        changes['inserted'].extend(inserted)
+        changes['updated'].extend(updated)
+    
+    def _before_commit(self, session):
+        changes = session.info.get(INFO_KEY)
+        if changes:
+            for callback in self.before_commit:
+                callback(changes['inserted'], changes['updated'])
+    
+    def _after_commit(self, session):
+        changes = session.info.pop(INFO_KEY, None)
+        if changes:
+            for callback in self.after_commit:
+                callback(changes['inserted'], changes['updated'])
+    
+    def _after_rollback(self, session):
+        session.info.pop(INFO_KEY, None)
+
+
+# Global instance
+question_changes = QuestionChanges()
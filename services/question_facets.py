@@ -0,0 +1,70 @@
+"""
+Question Facet Cache
+Per-topic, per-difficulty and per-source question counts for the filter
+widgets, computed in one grouped query and held in memory until the
+question bank changes.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event
+
+from models import db, Question
+from services.question_changes import question_changes
+
+
+class QuestionFacets:
+    def __init__(self, ttl_seconds=300):
+        # The TTL only bounds staleness from writes made by other processes
+        self.ttl = ttl_seconds
+        self.lock = threading.Lock()
+        self.facets = None
+        self.computed_at = 0
+    
+    def init_app(self, app):
+        self.ttl = app.config.get('QUESTION_FACETS_TTL', self.ttl)
+        event.listen(db.session, 'before_flush', self._before_flush)
+        event.listen(db.session, 'after_commit', self._after_commit)
+        question_changes.subscribe(after_commit=lambda inserted, updated: self.invalidate())
+    
+    def _before_flush(self, session, flush_context, instances):
+        if any(isinstance(obj, Question) for obj in (*session.new, *session.dirty, *session.deleted)):
+            session.info['questions_changed'] = True
+    
+    def _after_commit(self, session):
+        if session.info.pop('questions_changed', False):
+            self.invalidate()
+    
+    def invalidate(self):
+        with self.lock:
+            self.facets = None
+    
+    def compute(self):
+        rows = db.session.query(
+            Question.topic, Question.difficulty, Question.source, db.func.count(Question.id)
+        ).group_by(Question.topic, Question.difficulty, Question.source).all()
+        
+        facets = {'topic': {}, 'difficulty': {}, 'source': {}, 'total': 0}
+        for topic, difficulty, source, count in rows:
+            for name, value in (('topic', topic), ('difficulty', difficulty), ('source', source)):
+                if value:
+                    facets[name][value] = facets[name].get(value, 0) + count
+            facets['total'] += count
+        return facets
+    
+    def get(self):
+        """Cached facet counts: {'topic': {...}, 'difficulty': {...}, 'source': {...}, 'total': n}"""
+        with self.lock:
+            if self.facets is not None and time.time() - self.computed_at < self.ttl:
+                return self.facets
+        
+        facets = self.compute()
+        with self.lock:
+            self.facets = facets
+            self.computed_at = time.time()
+        return facets
+
+
+# Global instance
+question_facets = QuestionFacets()
@@ -0,0 +1,260 @@
+"""
+Question Ingestion Pipeline
+Streams scraped or archived questions into the bank: normalizes each
+statement, deduplicates by content hash with batched set-based lookups,
+and writes new rows with bulk inserts in chunked transactions.
+"""
+
+import hashlib
+import json
+import re
+import unicodedata
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+
+from models import db, Question
+from services.near_duplicates import near_duplicates
+from services.question_changes import question_changes
+
+# Columns carried by exports and imports; ids, signatures and hashes are recomputed on import
+EXPORT_COLUMNS = ('title', 'problem_statement', 'solution', 'solution_bangla', 'difficulty', 'topic',
+                  'source', 'year', 'problem_number', 'created_at')
+# Columns an upsert refreshes on an existing question with the same statement
+UPSERT_COLUMNS = ('title', 'solution', 'solution_bangla', 'difficulty', 'topic', 'source', 'year', 'problem_number')
+
+# Characters that carry meaning in a statement besides letters and digits
+MATH_SYMBOLS = re.escape('+-*/=<>^²³√∠≤≥≠()[]{}|!%')
+# Whitespace is left to str.split(), so a plain space between words is not a match to replace
+NOISE = re.compile(r'[^\w\s\u0980-\u09FF' + MATH_SYMBOLS + r']+|_+')  # Bengali block kept for vowel signs
+SYMBOL_SPACING = re.compile(r' ?([' + MATH_SYMBOLS + r']) ?')  # Spacing is single spaces by then
+
+
+def normalize_statement(text):
+    """Case-, width- and whitespace-insensitive form of a problem statement"""
+    text = text or ''
+    if not unicodedata.is_normalized('NFKC', text):
+        text = unicodedata.normalize('NFKC', text)
+    text = NOISE.sub(' ', text.casefold())
+    return SYMBOL_SPACING.sub(r'\1', ' '.join(text.split()))
+
+
+def content_hash(text):
+    return hashlib.sha256(normalize_statement(text).encode('utf-8')).hexdigest()
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class QuestionIngestor:
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+    
+    def to_row(self, q_data):
+        """Column values for a scraped question dict, or None if it has no statement or a malformed created_at"""
+        statement = (q_data.get('problem_statement') or '').strip()
+        if not statement:
+            return None
+        source = q_data.get('source') or 'Unknown'
+        try:
+            created_at = datetime.fromisoformat(q_data['created_at']) if q_data.get('created_at') else datetime.utcnow()
+        except (TypeError, ValueError):
+            return None
+        return {
+            'title': q_data.get('title') or f"{source} Problem",
+            'problem_statement': statement,
+            'solution': q_data.get('solution', ''),
+            'solution_bangla': q_data.get('solution_bangla'),
+            'difficulty': q_data.get('difficulty', 'medium'),
+            'topic': q_data.get('topic', 'general'),
+            'source': source,
+            'year': q_data.get('year'),
+            'problem_number': q_data.get('problem_number', ''),
+            'content_hash': content_hash(statement),
+            'created_at': created_at
+        }
+    
+    def prepare(self, chunk):
+        """
+        Rows of a chunk with the MinHash signatures and LSH band keys of those with a statement,
+        computed for the whole chunk at once
+        Returns:
+            (rows, signatures, keys) - rows holds None for invalid questions
+        """
+        rows = [self.to_row(q_data) for q_data in chunk]
+        signatures = near_duplicates.signatures([row['problem_statement'] for row in rows if row is not None])
+        return rows, signatures, near_duplicates.band_keys(signatures)
+    
+    def ingest(self, questions_data, skip_near_duplicates=False, upsert=False):
+        """
+        Insert new questions from any iterable of dicts, batch by batch
+        Args:
+            questions_data: Iterable of question dicts
+            skip_near_duplicates: Drop reworded copies instead of inserting and counting them
+            upsert: Overwrite solutions and metadata of stored questions with the same statement
+        Returns:
+            Report dict with received/inserted/updated/invalid/duplicate counts
+        """
+        report = {'received': 0, 'inserted': 0, 'updated': 0, 'invalid': 0, 'duplicates_in_input': 0,
+                  'duplicates_existing': 0, 'near_duplicates': 0}
+        seen = set()
+        
+        for chunk in chunked(questions_data, self.batch_size):
+            self.write(self.prepare(chunk), report, seen, skip_near_duplicates, upsert)
+        return report
+    
+    def write(self, prepared, report, seen, skip_near_duplicates, upsert):
+        """
+        Store one prepared chunk in one transaction, updating the report
+        Services that derive data from questions (LSH buckets, facets, related questions,
+        rendered exam papers) pick up the written rows through question_changes on commit.
+        """
+        rows, signatures, keys = prepared
+        report['received'] += len(rows)
+        valid = [row for row in rows if row is not None]
+        report['invalid'] += len(rows) - len(valid)
+        
+        unique = []
+        for index, row in enumerate(valid):
+            if row['content_hash'] in seen:
+                report['duplicates_in_input'] += 1
+            else:
+                seen.add(row['content_hash'])
+                unique.append(index)
+        rows = [valid[index] for index in unique]
+        
+        # One set-based lookup per batch instead of one SELECT per question
+        hashes = [row['content_hash'] for row in rows]
+        existing = {content_hash: (question_id, minhash) for content_hash, question_id, minhash in db.session.query(
+            Question.content_hash, Question.id, Question.minhash
+        ).filter(Question.content_hash.in_(hashes))}
+        new = [index for index, row in enumerate(rows) if row['content_hash'] not in existing]
+        report['duplicates_existing'] += len(rows) - len(new)
+        signatures, keys = signatures[unique], keys[unique]
+        
+        updated = []
+        if upsert and len(new) < len(rows):
+            updated = self.update_existing(rows, signatures, existing)
+            report['updated'] += len(rows) - len(new)
+        
+        new_rows, signatures, near = self.check_near_duplicates(
+            [rows[index] for index in new], signatures[new], keys[new], skip_near_duplicates
+        )
+        report['near_duplicates'] += near
+        
+        inserted = []
+        if new_rows:
+            for row, signature in zip(new_rows, signatures):
+                row['minhash'] = signature.tobytes()
+            # Multi-row INSERT ... RETURNING: one statement per thousand rows, so SQLite's FTS
+            # trigger flushes once per statement instead of once per row
+            id_of = dict(db.session.execute(
+                db.insert(Question).returning(Question.content_hash, Question.id), new_rows
+            ).all())
+            inserted = [dict(row, id=id_of[row['content_hash']]) for row in new_rows]
+        question_changes.record(inserted=inserted, updated=updated)
+        db.session.commit()
+        report['inserted'] += len(new_rows)
+    
+    def update_existing(self, rows, signatures, existing):
+        """
+        Overwrite the UPSERT_COLUMNS of stored questions
+        Args:
+            existing: {content hash: (question id, stored minhash)} of the stored questions
+        Returns:
+            The updated rows with their ids, fresh signature and previously stored signature
+        """
+        stored = [(index, existing[row['content_hash']]) for index, row in enumerate(rows)
+                  if row['content_hash'] in existing]
+        db.session.execute(db.update(Question), [
+            dict({column: rows[index][column] for column in UPSERT_COLUMNS}, id=question_id)
+            for index, (question_id, _) in stored
+        ])
+        return [dict(rows[index], id=question_id, minhash=signatures[index].tobytes(), previous_minhash=minhash)
+                for index, (question_id, minhash) in stored]
+    
+    def check_near_duplicates(self, rows, signatures, keys, skip):
+        """
+        Look for look-alikes of signed rows in the bank and earlier in the batch
+        Args:
+            signatures, keys: MinHash signatures and LSH band keys of the rows, from prepare
+        Returns:
+            (rows, signatures, near_duplicate_count) - rows minus the near-duplicates when skip is set
+        """
+        if not rows:
+            return rows, signatures, 0
+        bands = range(keys.shape[1])
+        stored = near_duplicates.batch_members(keys)
+        stored_by_band = {}
+        for band, bucket in stored:
+            stored_by_band.setdefault(band, []).append(bucket)
+        
+        # Only rows sharing a bucket with the bank or with another row can be near-duplicates
+        candidates = np.zeros(len(rows), dtype=bool)
+        for band in bands:
+            column = keys[:, band]
+            _, inverse, counts = np.unique(column, return_inverse=True, return_counts=True)
+            candidates |= (counts[inverse] > 1) | np.isin(column, stored_by_band.get(band, []))
+        if not candidates.any():
+            return rows, signatures, 0
+        
+        stored_signatures = near_duplicates.signatures_for({qid for ids in stored.values() for qid in ids})
+        batch_buckets = {}  # (band, bucket) -> indexes of kept candidate rows in this batch
+        kept, near = np.ones(len(rows), dtype=bool), 0
+        for index in np.flatnonzero(candidates).tolist():
+            row_keys = list(enumerate(keys[index].tolist()))
+            others = [stored_signatures[qid] for key in row_keys for qid in stored.get(key, ()) if qid in stored_signatures]
+            others += [signatures[i] for key in row_keys for i in batch_buckets.get(key, ())]
+            if any(near_duplicates.similarity(signatures[index], other) >= near_duplicates.threshold for other in others):
+                near += 1
+                if skip:
+                    kept[index] = False
+                    continue
+            for key in row_keys:
+                batch_buckets.setdefault(key, []).append(index)
+        return [row for row, keep in zip(rows, kept) if keep], signatures[kept], near
+    
+    def export(self, fileobj, batch_size=2000):
+        """
+        Stream the question bank as JSON Lines, oldest first, one keyset batch in memory at a time
+        Returns:
+            Number of questions written
+        """
+        columns = [getattr(Question, name) for name in EXPORT_COLUMNS]
+        written, last_id = 0, 0
+        while True:
+            rows = db.session.query(Question.id, *columns).filter(Question.id > last_id).order_by(Question.id).limit(batch_size).all()
+            if not rows:
+                return written
+            for row in rows:
+                record = dict(zip(EXPORT_COLUMNS, row[1:]))
+                record['created_at'] = record['created_at'].isoformat() if record['created_at'] else None
+                fileobj.write(json.dumps(record, ensure_ascii=False) + '\n')
+            written += len(rows)
+            last_id = rows[-1].id
+    
+    def backfill_hashes(self):
+        """Compute content_hash for questions stored before it existed"""
+        updated = 0
+        while True:
+            rows = db.session.query(Question.id, Question.problem_statement).filter(
+                Question.content_hash.is_(None)
+            ).limit(self.batch_size).all()
+            if not rows:
+                return updated
+            db.session.execute(db.update(Question), [
+                {'id': row.id, 'content_hash': content_hash(row.problem_statement)} for row in rows
+            ])
+            db.session.commit()
+            updated += len(rows)
+
+
+# Global instance
+ingestor = QuestionIngestor()
@@ -3,41 +3,112 @@ Olympiad Question Scraper
 Scrapes math olympiad questions from various online sources
 """
 
-import requests
 from bs4 import BeautifulSoup
 import re
-from models import Question, db
+from urllib.parse import urljoin
+from config import Config
+from models import db
+from services.crawler import Crawler
+from services.question_ingest import ingestor
 
 class QuestionScraper:
     def __init__(self):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
+        self.crawler = None
+    
+    def get_crawler(self, workers=None):
+        """
+        Shared crawler, so every scrape reuses one pooled session and HTTP cache
+        Args:
+            workers: Concurrent fetches (default SCRAPER_WORKERS); the connection pool is sized
+                     for them, so a crawler built for another count is replaced
+        """
+        workers = workers or Config.SCRAPER_WORKERS
+        if self.crawler is None or self.crawler.workers != workers:
+            self.crawler = Crawler(
+                Config.SCRAPER_CACHE_PATH,
+                workers=workers,
+                host_interval=Config.SCRAPER_HOST_INTERVAL,
+                timeout=Config.SCRAPER_TIMEOUT,
+                headers=self.headers
+            )
+        return self.crawler
+    
+    def parse_aops(self, html, limit=10):
+        """Extract problems from an Art of Problem Solving community page"""
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # AoPS structure parsing (simplified - would need refinement for production)
+        problem_divs = soup.find_all('div', class_='cmty-post-body')
+        
+        questions = []
+        for div in problem_divs[:limit]:
+            text = div.get_text(strip=True)
+            if len(text) > 50:  # Basic filter
+                questions.append({
+                    'problem_statement': text,
+                    'source': 'AoPS',
+                    'difficulty': 'medium'
+                })
+        return questions
     
     def scrape_aops_community(self, url):
         """Scrape problems from Art of Problem Solving community"""
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # AoPS structure parsing (simplified - would need refinement for production)
-            problem_divs = soup.find_all('div', class_='cmty-post-body')
-            
-            questions = []
-            for div in problem_divs[:10]:  # Limit to 10
-                text = div.get_text(strip=True)
-                if len(text) > 50:  # Basic filter
-                    questions.append({
-                        'problem_statement': text,
-                        'source': 'AoPS',
-                        'difficulty': 'medium'
-                    })
-            
-            return questions
+            result = self.get_crawler().fetch(url)
+            if result.body is None:
+                return []
+            return self.parse_aops(result.body)
         except Exception as e:
             print(f"Error scraping AoPS: {e}")
             return []
     
+    def index_links(self, html, base_url, pattern=None):
+        """Absolute URLs linked from a topic index page, optionally filtered by a regex"""
+        soup = BeautifulSoup(html, 'html.parser')
+        regex = re.compile(pattern) if pattern else None
+        links = []
+        for a in soup.find_all('a', href=True):
+            url = urljoin(base_url, a['href']).split('#')[0]
+            if url.startswith(('http://', 'https://')) and (regex is None or regex.search(url)):
+                links.append(url)
+        return list(dict.fromkeys(links))
+    
+    def crawl(self, urls=(), index_url=None, link_pattern=None, only_changed=True, workers=None):
+        """
+        Fetch and parse many pages concurrently
+        Args:
+            urls: Pages to scrape
+            index_url: Topic index page whose links are scraped as well
+            link_pattern: Regex the index links must match
+            only_changed: Skip parsing pages identical to the cached copy
+            workers: Concurrent fetches (default SCRAPER_WORKERS)
+        Returns:
+            (questions, stats)
+        """
+        crawler = self.get_crawler(workers)
+        urls = list(urls)
+        if index_url:
+            index = crawler.fetch(index_url)
+            if index.body is not None:
+                urls.extend(self.index_links(index.body, index_url, link_pattern))
+        
+        questions = []
+        stats = {'pages': 0, 'parsed': 0, 'unchanged': 0, 'failed': 0}
+        for result in crawler.fetch_all(urls):
+            stats['pages'] += 1
+            if result.body is None:
+                stats['failed'] += 1
+            elif only_changed and not result.changed:
+                stats['unchanged'] += 1
+            else:
+                questions.extend(self.parse_aops(result.body, limit=None))
+                stats['parsed'] += 1
+        stats.update(crawler.stats())
+        return questions, stats
+    
     def get_sample_bdmo_questions(self):
         """Get sample BdMO (Bangladesh Math Olympiad) questions"""
         # These are real BdMO-style problems
@@ -96,33 +167,13 @@ class QuestionScraper:
         return questions
     
     def save_questions_to_db(self, questions_data):
-        """Save scraped questions to database"""
-        saved_count = 0
-        for q_data in questions_data:
-            # Check if question already exists
-            existing = Question.query.filter_by(
-                title=q_data.get('title', ''),
-                source=q_data.get('source', '')
-            ).first()
-            
-            if not existing:
-                question = Question(
-                    title=q_data.get('title', f"{q_data['source']} Problem"),
-                    problem_statement=q_data['problem_statement'],
-                    solution=q_data.get('solution', ''),
-                    difficulty=q_data.get('difficulty', 'medium'),
-                    topic=q_data.get('topic', 'general'),
-                    source=q_data.get('source', 'Unknown'),
-                    year=q_data.get('year'),
-                    problem_number=q_data.get('problem_number', '')
-                )
-                db.session.add(question)
-                saved_count += 1
-        
+        """Save scraped questions to database, skipping ones already in the bank"""
         try:
-            db.session.commit()
-            print(f"✅ Saved {saved_count} new questions to database")
-            return saved_count
+            report = ingestor.ingest(questions_data)
+            print(f"✅ Saved {report['inserted']} new questions to database "
+                  f"({report['duplicates_existing']} already stored, {report['duplicates_in_input']} repeated, "
+                  f"{report['invalid']} invalid, {report['near_duplicates']} possible near-duplicates)")
+            return report['inserted']
         except Exception as e:
             db.session.rollback()
             print(f"❌ Error saving questions: {e}")
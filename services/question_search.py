@@ -0,0 +1,173 @@
+"""
+Question Full-Text Search
+SQLite FTS5 index over question titles, statements and both solutions,
+kept in sync with the questions table by triggers.
+"""
+
+import html
+import time
+import unicodedata
+
+from sqlalchemy import event, text
+
+from models import db, Question
+
+# unicode61 splits words at Bangla vowel signs and hasanta unless the
+# Bengali combining marks are declared as token characters
+BANGLA_MARKS = ''.join(chr(c) for c in range(0x0980, 0x0A00) if unicodedata.category(chr(c)).startswith('M'))
+TOKENCHARS = BANGLA_MARKS + '²³'
+
+COLUMNS = 'title, problem_statement, solution, solution_bangla'
+
+DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+        {COLUMNS},
+        content='questions', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 0 tokenchars '{TOKENCHARS}'"
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS questions_fts_ai AFTER INSERT ON questions BEGIN
+        INSERT INTO questions_fts(rowid, {COLUMNS})
+        VALUES (new.id, new.title, new.problem_statement, new.solution, new.solution_bangla);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS questions_fts_ad AFTER DELETE ON questions BEGIN
+        INSERT INTO questions_fts(questions_fts, rowid, {COLUMNS})
+        VALUES ('delete', old.id, old.title, old.problem_statement, old.solution, old.solution_bangla);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS questions_fts_au AFTER UPDATE ON questions BEGIN
+        INSERT INTO questions_fts(questions_fts, rowid, {COLUMNS})
+        VALUES ('delete', old.id, old.title, old.problem_statement, old.solution, old.solution_bangla);
+        INSERT INTO questions_fts(rowid, {COLUMNS})
+        VALUES (new.id, new.title, new.problem_statement, new.solution, new.solution_bangla);
+    END""",
+]
+
+# Column weights for bm25: title, statement, solution, Bangla solution
+WEIGHTS = '10.0, 5.0, 1.0, 1.0'
+
+# Snippet markers, replaced with <mark> after HTML-escaping the text
+MARK_OPEN, MARK_CLOSE = '\x02', '\x03'
+
+
+class QuestionSearch:
+    def __init__(self):
+        self.ready = False
+    
+    def init_app(self, app):
+        # db.create_all() also builds the index for new SQLite databases, and db.drop_all() removes it
+        event.listen(Question.__table__, 'after_create', self._after_create)
+        event.listen(Question.__table__, 'after_drop', self._after_drop)
+    
+    def _after_create(self, target, connection, **kw):
+        if connection.dialect.name == 'sqlite':
+            self.create_index(connection)
+    
+    def _after_drop(self, target, connection, **kw):
+        if connection.dialect.name == 'sqlite':
+            # The triggers went with the questions table; the index would otherwise outlive it
+            connection.execute(text('DROP TABLE IF EXISTS questions_fts'))
+            self.ready = False
+    
+    def create_index(self, connection):
+        for statement in DDL:
+            connection.execute(text(statement))
+    
+    def rebuild(self):
+        """Create the index if needed and re-index every question"""
+        with db.engine.begin() as connection:
+            self.create_index(connection)
+            connection.execute(text("INSERT INTO questions_fts(questions_fts) VALUES ('rebuild')"))
+        self.ready = True
+    
+    def _ensure(self):
+        """Build the index on first use for databases created before it existed"""
+        if self.ready:
+            return
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'")
+        ).first()
+        if not exists:
+            self.rebuild()
+        self.ready = True
+    
+    @staticmethod
+    def build_query(query_text):
+        """Quote each word as an FTS5 phrase; the last one also matches as a prefix"""
+        words = [w for w in query_text.split() if any(ch.isalnum() for ch in w)]
+        phrases = ['"' + w.replace('"', '""') + '"' for w in words]
+        if phrases:
+            phrases[-1] += '*'
+        return ' '.join(phrases)
+    
+    @staticmethod
+    def highlight(snippet):
+        escaped = html.escape(snippet or '')
+        return escaped.replace(MARK_OPEN, '<mark>').replace(MARK_CLOSE, '</mark>')
+    
+    def search(self, query_text, limit=20, topic=None, difficulty=None):
+        """
+        Ranked keyword search
+        Returns:
+            (results, took_ms) - results are dicts with a highlighted HTML snippet
+        """
+        match = self.build_query(query_text)
+        if not match:
+            return [], 0
+        
+        start = time.perf_counter()
+        if db.engine.dialect.name != 'sqlite':
+            return self._search_like(query_text, limit, topic, difficulty), 0
+        self._ensure()
+        
+        filters = ''
+        params = {'match': match, 'limit': limit}
+        if topic:
+            filters += ' AND q.topic = :topic'
+            params['topic'] = topic
+        if difficulty:
+            filters += ' AND q.difficulty = :difficulty'
+            params['difficulty'] = difficulty
+        
+        rows = db.session.execute(text(f"""
+            SELECT q.id, q.title, q.topic, q.difficulty, q.source, q.year,
+                   snippet(questions_fts, -1, '{MARK_OPEN}', '{MARK_CLOSE}', '…', 16) AS snippet,
+                   bm25(questions_fts, {WEIGHTS}) AS score
+            FROM questions_fts
+            JOIN questions q ON q.id = questions_fts.rowid
+            WHERE questions_fts MATCH :match{filters}
+            ORDER BY score
+            LIMIT :limit
+        """), params).mappings().all()
+        took_ms = round((time.perf_counter() - start) * 1000, 2)
+        
+        results = []
+        for row in rows:
+            result = dict(row)
+            result['snippet'] = self.highlight(row['snippet'])
+            result['score'] = round(-row['score'], 3)
+            results.append(result)
+        return results, took_ms
+    
+    def _search_like(self, query_text, limit, topic, difficulty):
+        """Unranked fallback for databases without FTS5"""
+        query = Question.query
+        for word in query_text.split():
+            pattern = f'%{word}%'
+            query = query.filter(db.or_(
+                Question.title.ilike(pattern),
+                Question.problem_statement.ilike(pattern),
+                Question.solution.ilike(pattern),
+                Question.solution_bangla.ilike(pattern)
+            ))
+        if topic:
+            query = query.filter_by(topic=topic)
+        if difficulty:
+            query = query.filter_by(difficulty=difficulty)
+        
+        return [{
+            'id': q.id, 'title': q.title, 'topic': q.topic, 'difficulty': q.difficulty,
+            'source': q.source, 'year': q.year, 'snippet': html.escape(q.problem_statement[:200]), 'score': None
+        } for q in query.limit(limit).all()]
+
+
+# Global instance
+question_search = QuestionSearch()
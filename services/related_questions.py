@@ -0,0 +1,389 @@
+"""
+Related Question Index
+TF-IDF vectors of every question (title, statement and topic) in a SciPy
+sparse matrix, with the top-k most similar questions precomputed per
+question and held in memory. New and updated questions are folded in
+incrementally; the whole index is rebuilt once enough of the bank is new
+that the IDF weights have drifted. Builds and incremental syncs run in
+background threads, and lookups return no related questions until the
+first build is done.
+"""
+
+import math
+import re
+import threading
+import time
+import unicodedata
+
+import numpy as np
+from scipy import sparse
+
+from models import db, Question
+from services.question_changes import question_changes
+
+CHUNK_CELLS = 4_000_000  # Dense similarity cells computed at once (~16MB of float32)
+WORD = re.compile(r'[\w\u0980-\u09FF]+')  # Bengali block included so vowel signs stay inside words
+
+
+def tokenize(text):
+    """Lowercase words of a statement"""
+    return WORD.findall(unicodedata.normalize('NFKC', text or '').casefold())
+
+
+class RelatedQuestions:
+    def __init__(self, k=5, topic_boost=0.1, min_score=0.05, refresh_interval=60, rebuild_growth=0.2):
+        """
+        Args:
+            k: Neighbours kept per question
+            topic_boost: Added to the cosine similarity of questions sharing a topic
+            refresh_interval: Seconds between checks for questions added or edited by other processes
+            rebuild_growth: Fraction of new questions since the last full build that triggers a rebuild
+        """
+        self.k = k
+        self.topic_boost = topic_boost
+        self.min_score = min_score
+        self.refresh_interval = refresh_interval
+        self.rebuild_growth = rebuild_growth
+        self.lock = threading.RLock()
+        self.app = None
+        self.built = False
+        self.rebuilding = False
+        self.syncing = False
+        self.sync_again = False  # Questions were written while a sync was running
+        self.syncer = None
+        self._reset()
+    
+    def init_app(self, app):
+        self.app = app
+        self.k = app.config.get('RELATED_QUESTIONS_K', self.k)
+        self.refresh_interval = app.config.get('RELATED_QUESTIONS_REFRESH', self.refresh_interval)
+        question_changes.subscribe(after_commit=self._questions_written)
+    
+    def _questions_written(self, inserted, updated):
+        # The background sync reads the committed rows, as it does for other processes' writes
+        with self.lock:
+            if self.built:
+                self._sync_in_background()
+    
+    def _reset(self):
+        self.ids = []
+        self.row_of = {}  # question id -> matrix row
+        self.meta = {}  # question id -> fields shown in the related list
+        self.hashes = {}  # question id -> content hash of the indexed statement
+        self.vocab = {}  # term -> column
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.topic_codes = {}  # topic -> small int
+        self.row_topics = np.zeros(0, dtype=np.int32)
+        self.topic_rows = np.zeros((1, 0), dtype=np.float32)
+        self.matrix = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.matrix_t = self.matrix
+        self.neighbours = {}  # question id -> [(score, question id)], best first
+        self.built_size = 0
+        self.checked_at = time.time()
+    
+    def _load(self, query):
+        return [
+            {'id': q.id, 'title': q.title, 'problem_statement': q.problem_statement,
+             'topic': q.topic, 'difficulty': q.difficulty, 'content_hash': q.content_hash}
+            for q in query.with_entities(Question.id, Question.title, Question.problem_statement, Question.topic,
+                                         Question.difficulty, Question.content_hash).order_by(Question.id)
+        ]
+    
+    def _terms(self, doc):
+        terms = tokenize(f"{doc['title']} {doc['problem_statement']}")
+        if doc.get('topic'):
+            terms.append(f"topic:{doc['topic']}")
+        return terms
+    
+    def _vectorize(self, term_lists):
+        """Sublinear TF x IDF rows, L2-normalized; unseen terms get the IDF of a term seen once"""
+        indptr, indices, data = [0], [], []
+        new_terms = 0
+        for terms in term_lists:
+            counts = {}
+            for term in terms:
+                column = self.vocab.get(term)
+                if column is None:
+                    column = self.vocab[term] = len(self.vocab)
+                    new_terms += 1
+                counts[column] = counts.get(column, 0) + 1
+            indices.extend(counts)
+            data.extend(1 + math.log(c) for c in counts.values())
+            indptr.append(len(indices))
+        
+        if new_terms:
+            rare = math.log((1 + max(len(self.ids), 1)) / 2) + 1
+            self.idf = np.concatenate([self.idf, np.full(new_terms, rare, dtype=np.float32)])
+        rows = sparse.csr_matrix((np.array(data, dtype=np.float32), indices, indptr), shape=(len(term_lists), len(self.vocab)))
+        rows = sparse.csr_matrix(rows.multiply(self.idf.reshape(1, -1)))
+        norms = np.sqrt(np.asarray(rows.multiply(rows).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.csr_matrix(rows.multiply((1 / norms).reshape(-1, 1)), dtype=np.float32)
+    
+    def _topic_code(self, topic):
+        if not topic:
+            return -1
+        return self.topic_codes.setdefault(topic, len(self.topic_codes))
+    
+    def _similarities(self, rows, row_topics):
+        """Dense (len(rows) x all questions) scores: cosine plus the same-topic boost"""
+        scores = (rows @ self.matrix_t).toarray()
+        scores += self.topic_rows[row_topics]  # Topic -1 picks the trailing all-zero row
+        return scores
+    
+    def _set_row_topics(self, row_topics):
+        """Store per-row topic codes and the boost each topic adds against every row"""
+        self.row_topics = row_topics
+        self.topic_rows = np.zeros((len(self.topic_codes) + 1, len(row_topics)), dtype=np.float32)
+        for code in range(len(self.topic_codes)):
+            self.topic_rows[code, row_topics == code] = self.topic_boost
+    
+    def _top_k(self, scores, exclude_rows):
+        """[(score, question id)] best first for each row of scores"""
+        scores[np.arange(len(scores)), exclude_rows] = -1
+        k = min(self.k, scores.shape[1] - 1)
+        if k <= 0:
+            return [[] for _ in range(len(scores))]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, columns in zip(scores, top):
+            ranked = sorted(((float(row[c]), self.ids[c]) for c in columns if row[c] >= self.min_score), reverse=True)
+            results.append(ranked)
+        return results
+    
+    def _index_all(self):
+        """Compute the whole index into this (fresh) instance"""
+        docs = self._load(Question.query)
+        self.ids = [doc['id'] for doc in docs]
+        self.row_of = {qid: row for row, qid in enumerate(self.ids)}
+        self.meta = {doc['id']: self._meta(doc) for doc in docs}
+        self.hashes = {doc['id']: doc['content_hash'] for doc in docs}
+        
+        # Document frequencies first so every row is weighted with the final IDF
+        term_lists = [self._terms(doc) for doc in docs]
+        term_docs = {}
+        for terms in term_lists:
+            for term in set(terms):
+                term_docs[term] = term_docs.get(term, 0) + 1
+        self.vocab = {term: column for column, term in enumerate(term_docs)}
+        df = np.fromiter(term_docs.values(), dtype=np.float32, count=len(term_docs))
+        self.idf = (np.log((1 + len(docs)) / (1 + df)) + 1).astype(np.float32)
+        
+        self.matrix = self._vectorize(term_lists) if docs else sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.matrix_t = self.matrix.T.tocsr()
+        self._set_row_topics(np.array([self._topic_code(doc['topic']) for doc in docs], dtype=np.int32))
+        
+        self._rank(np.arange(len(docs)))
+        self.built_size = len(docs)
+    
+    def _rank(self, rows):
+        """Recompute the neighbour lists of these matrix rows, a chunk of rows at a time"""
+        chunk = max(1, CHUNK_CELLS // max(len(self.ids), 1))
+        for start in range(0, len(rows), chunk):
+            part = rows[start:start + chunk]
+            scores = self._similarities(self.matrix[part], self.row_topics[part])
+            for row, ranked in zip(part, self._top_k(scores, part)):
+                self.neighbours[self.ids[row]] = ranked
+    
+    def build(self):
+        """Index the whole question bank, then swap it in; lookups keep using the old index meanwhile"""
+        started = time.time()
+        fresh = RelatedQuestions(self.k, self.topic_boost, self.min_score, self.refresh_interval, self.rebuild_growth)
+        fresh._index_all()
+        with self.lock:
+            for name, value in vars(fresh).items():
+                if name not in ('lock', 'app', 'rebuilding', 'syncing', 'sync_again', 'syncer'):
+                    setattr(self, name, value)
+            self.built = True
+            self.rebuilding = False
+            self.checked_at = 0  # Catch up on questions inserted while building
+        print(f"✅ Related-question index built for {fresh.built_size} questions in {time.time() - started:.1f}s")
+    
+    def _rebuild_in_background(self):
+        """Caller holds the lock"""
+        if self.rebuilding or self.app is None:
+            return
+        self.rebuilding = True
+        
+        def run():
+            with self.app.app_context():
+                try:
+                    self.build()
+                except Exception as e:
+                    self.rebuilding = False
+                    print(f"❌ Related-question rebuild failed: {e}")
+        
+        threading.Thread(target=run, name='related-questions-rebuild', daemon=True).start()
+    
+    def _sync_in_background(self):
+        """Caller holds the lock"""
+        if self.app is None:
+            return
+        if self.syncing:
+            self.sync_again = True
+            return
+        self.syncing = True
+        
+        def run():
+            with self.app.app_context():
+                try:
+                    while True:
+                        with self.lock:
+                            self.sync_again = False
+                        self.sync()
+                        with self.lock:
+                            if not self.sync_again:
+                                self.syncing = False
+                                return
+                except Exception as e:
+                    with self.lock:
+                        self.syncing = False
+                    print(f"❌ Related-question refresh failed: {e}")
+        
+        self.syncer = threading.Thread(target=run, name='related-questions-sync', daemon=True)
+        self.syncer.start()
+    
+    def sync(self):
+        """Fold in questions inserted or edited since they were indexed, by this or any other process"""
+        # Only the narrow columns for every question; statements are loaded for the rows that changed
+        stored = db.session.query(Question.id, Question.title, Question.topic, Question.difficulty,
+                                  Question.content_hash).all()
+        with self.lock:
+            if not self.built or self.rebuilding:
+                return
+            new_ids = {row.id for row in stored if row.id not in self.row_of}
+            changed_ids = {row.id for row in stored if row.id in self.row_of and (
+                self.hashes.get(row.id) != row.content_hash
+                or self._meta(row._asdict()) != self.meta[row.id]
+            )}
+        if changed_ids:
+            self.update(self._load(Question.query.filter(Question.id.in_(changed_ids))))
+        if new_ids:
+            docs = self._load(Question.query.filter(Question.id >= min(new_ids)))
+            self.add([doc for doc in docs if doc['id'] in new_ids])
+    
+    def _meta(self, doc):
+        return {'id': doc['id'], 'title': doc['title'], 'topic': doc['topic'], 'difficulty': doc['difficulty']}
+    
+    def add(self, docs):
+        """
+        Fold newly inserted questions into a built index
+        Args:
+            docs: Dicts with id, title, problem_statement, topic, difficulty and content_hash
+        """
+        with self.lock:
+            if not self.built or self.rebuilding:
+                return
+            docs = [doc for doc in docs if doc['id'] not in self.row_of]
+            if not docs:
+                return
+            if len(self.ids) + len(docs) > self.built_size * (1 + self.rebuild_growth):
+                # IDF weights have drifted; the rebuild also picks these questions up
+                self._rebuild_in_background()
+                return
+            
+            first_row = len(self.ids)
+            rows = self._vectorize([self._terms(doc) for doc in docs])
+            self.matrix.resize((first_row, len(self.vocab)))
+            self.matrix = sparse.vstack([self.matrix, rows], format='csr')
+            self.matrix_t = self.matrix.T.tocsr()
+            for doc in docs:
+                self.row_of[doc['id']] = len(self.ids)
+                self.ids.append(doc['id'])
+                self.meta[doc['id']] = self._meta(doc)
+                self.hashes[doc['id']] = doc['content_hash']
+            row_topics = np.array([self._topic_code(doc['topic']) for doc in docs], dtype=np.int32)
+            self._set_row_topics(np.concatenate([self.row_topics, row_topics]))
+            
+            scores = self._similarities(rows, row_topics)
+            new_rows = np.arange(first_row, len(self.ids))
+            for doc, ranked in zip(docs, self._top_k(scores.copy(), new_rows)):
+                self.neighbours[doc['id']] = ranked
+            
+            # Similarity is symmetric: a new question may displace an old question's k-th neighbour
+            for i, doc in enumerate(docs):
+                for column in np.flatnonzero(scores[i, :first_row] >= self.min_score):
+                    qid = self.ids[column]
+                    current = self.neighbours.get(qid, [])
+                    score = float(scores[i, column])
+                    if len(current) < self.k or score > current[-1][0]:
+                        self.neighbours[qid] = sorted(current + [(score, doc['id'])], reverse=True)[:self.k]
+    
+    def update(self, docs):
+        """
+        Re-index stored questions whose title, statement, topic or difficulty changed
+        Args:
+            docs: Dicts with id, title, problem_statement, topic, difficulty and content_hash
+        """
+        with self.lock:
+            if not self.built or self.rebuilding:
+                return
+            docs = [doc for doc in docs if doc['id'] in self.row_of and (
+                self._meta(doc) != self.meta[doc['id']] or doc['content_hash'] != self.hashes.get(doc['id'])
+            )]
+            if not docs:
+                return
+            for doc in docs:
+                self.meta[doc['id']] = self._meta(doc)
+                self.hashes[doc['id']] = doc['content_hash']
+            changed = np.array([self.row_of[doc['id']] for doc in docs])
+            changed_ids = {doc['id'] for doc in docs}
+            # Lists holding a changed question carry its old score; they are ranked again below
+            holders = {self.row_of[qid] for qid, ranked in self.neighbours.items()
+                       if qid not in changed_ids and any(other in changed_ids for _, other in ranked)}
+            
+            # Swap the changed rows: keep every other row, then scatter the new ones in
+            rows = self._vectorize([self._terms(doc) for doc in docs])
+            size = len(self.ids)
+            self.matrix.resize((size, len(self.vocab)))
+            keep = np.ones(size, dtype=np.float32)
+            keep[changed] = 0
+            scatter = sparse.csr_matrix((np.ones(len(docs), dtype=np.float32), (changed, np.arange(len(docs)))),
+                                        shape=(size, len(docs)))
+            self.matrix = sparse.csr_matrix(sparse.diags(keep) @ self.matrix + scatter @ rows, dtype=np.float32)
+            self.matrix_t = self.matrix.T.tocsr()
+            row_topics = self.row_topics.copy()
+            row_topics[changed] = [self._topic_code(doc['topic']) for doc in docs]
+            self._set_row_topics(row_topics)
+            
+            self._rank(np.array(sorted(holders | set(changed.tolist())), dtype=np.int64))
+            
+            # Any other list may now have room for a changed question
+            scores = self._similarities(rows, row_topics[changed])
+            for i, doc in enumerate(docs):
+                for column in np.flatnonzero(scores[i] >= self.min_score):
+                    if column in holders:
+                        continue
+                    qid = self.ids[column]
+                    current = self.neighbours.get(qid, [])
+                    score = float(scores[i, column])
+                    if qid not in changed_ids and (len(current) < self.k or score > current[-1][0]):
+                        self.neighbours[qid] = sorted(current + [(score, doc['id'])], reverse=True)[:self.k]
+    
+    def refresh(self):
+        """Start a background sync with writes from other processes when one is due; never waits for it"""
+        if not self.built:
+            # The first build is O(n^2); requests get no related questions until it is swapped in
+            with self.lock:
+                if not self.built:
+                    self._rebuild_in_background()
+            return
+        if time.time() - self.checked_at < self.refresh_interval:
+            return
+        with self.lock:
+            if time.time() - self.checked_at < self.refresh_interval:
+                return
+            self.checked_at = time.time()
+            self._sync_in_background()
+    
+    def related(self, question_id):
+        """Up to k related questions as dicts with id, title, topic, difficulty and score (none until the index is built)"""
+        self.refresh()
+        return [dict(self.meta[qid], score=round(score, 3)) for score, qid in self.neighbours.get(question_id, [])]
+    
+    def for_questions(self, question_ids):
+        return {qid: self.related(qid) for qid in question_ids}
+
+
+# Global instance
+related_questions = RelatedQuestions()
@@ -0,0 +1,143 @@
+"""
+Model Call Resilience
+Wraps calls to the AI backend with a global in-flight cap, per-call
+timeouts and a circuit breaker, so a slow or failing provider makes
+requests fail fast instead of piling up behind it.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class ModelUnavailableError(Exception):
+    """Raised instead of waiting on the model when it is overloaded, timed out or the breaker is open"""
+
+
+class ResilientCaller:
+    def __init__(self, max_in_flight=8, timeout=30, failure_threshold=5, reset_timeout=30, slot_wait=0.5):
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slot_wait = slot_wait
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        # One thread per slot, so submitted calls never queue behind each other
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='model-call')
+        self.lock = threading.Lock()
+        self.state = 'closed'  # closed, open, half_open
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.latencies = deque(maxlen=500)
+        self.counters = {'calls': 0, 'successes': 0, 'failures': 0, 'timeouts': 0, 'rejected': 0, 'short_circuited': 0}
+    
+    def _allow(self):
+        """Whether the breaker lets a call through; half-open admits a single trial call"""
+        with self.lock:
+            if self.state == 'open':
+                if time.time() - self.opened_at < self.reset_timeout:
+                    self.counters['short_circuited'] += 1
+                    return False
+                self.state = 'half_open'
+                self.trial_running = False
+            
+            if self.state == 'half_open':
+                if self.trial_running:
+                    self.counters['short_circuited'] += 1
+                    return False
+                self.trial_running = True
+            
+            self.counters['calls'] += 1
+            return True
+    
+    def _record(self, ok, latency=None):
+        with self.lock:
+            self.trial_running = False
+            if latency is not None:
+                self.latencies.append(latency)
+            
+            if ok:
+                self.counters['successes'] += 1
+                self.failures = 0
+                self.state = 'closed'
+                return
+            
+            self.counters['failures'] += 1
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.time()
+    
+    def _acquire(self):
+        if not self._allow():
+            raise ModelUnavailableError('circuit breaker open')
+        if not self.slots.acquire(timeout=self.slot_wait):
+            with self.lock:
+                self.trial_running = False
+                self.counters['rejected'] += 1
+            raise ModelUnavailableError(f'{self.max_in_flight} model calls already in flight')
+    
+    def call(self, func, *args, **kwargs):
+        """
+        Run func under the in-flight cap, timeout and breaker
+        Raises:
+            ModelUnavailableError when rejected or timed out; func's own errors otherwise
+        """
+        self._acquire()
+        start = time.time()
+        future = self.executor.submit(func, *args, **kwargs)
+        # The slot is only freed once the call really ends, even after a timeout
+        future.add_done_callback(lambda f: self.slots.release())
+        
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self.lock:
+                self.counters['timeouts'] += 1
+            self._record(False, time.time() - start)
+            raise ModelUnavailableError(f'model call timed out after {self.timeout}s')
+        except Exception:
+            self._record(False, time.time() - start)
+            raise
+        
+        self._record(True, time.time() - start)
+        return result
+    
+    def stream(self, func, *args, **kwargs):
+        """
+        Iterate func(*args, **kwargs) under the in-flight cap and breaker.
+        The timeout is not applied per chunk; a stalled stream is bounded by
+        the backend's own network timeout.
+        """
+        self._acquire()
+        start = time.time()
+        ok = False
+        try:
+            yield from func(*args, **kwargs)
+            ok = True
+        except GeneratorExit:
+            # Client went away - neither a success nor a provider failure
+            with self.lock:
+                self.trial_running = False
+            raise
+        except Exception:
+            self._record(False, time.time() - start)
+            raise
+        finally:
+            self.slots.release()
+        self._record(ok, time.time() - start)
+    
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            stats = dict(self.counters, state=self.state, consecutive_failures=self.failures)
+        
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000)
+        
+        stats['latency_ms'] = {'p50': percentile(50), 'p95': percentile(95), 'p99': percentile(99)}
+        return stats
@@ -0,0 +1,141 @@
+"""
+AI Response Cache
+Two-tier cache for tutor answers: an in-memory LRU in front of a persistent
+SQLite table with TTL and size-based eviction. Keys are hashes of the
+normalized prompt inputs, so the same question from every student hits.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize(text):
+    """Collapse whitespace and case so trivially different prompts share a key"""
+    return re.sub(r'\s+', ' ', str(text or '')).strip().casefold()
+
+
+def _normalize_part(part):
+    if isinstance(part, str):
+        return normalize(part)
+    if isinstance(part, (list, tuple)):
+        return [_normalize_part(p) for p in part]
+    if isinstance(part, dict):
+        return {k: _normalize_part(v) for k, v in part.items()}
+    return part
+
+
+def make_key(kind, *parts):
+    """Stable hash of the normalized prompt parts"""
+    payload = json.dumps([kind, _normalize_part(list(parts))], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=10000, memory_entries=256):
+        self.path = path
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+        self.conn = None
+        self.writes = 0
+        self.stats_counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+    
+    def _db(self):
+        """Open the SQLite tier on first use (caller holds the lock)"""
+        if self.conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute('CREATE INDEX IF NOT EXISTS ix_responses_accessed ON responses (accessed_at)')
+            self.conn.commit()
+        return self.conn
+    
+    def _remember(self, key, expires_at, value):
+        self.memory[key] = (expires_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+    
+    def get(self, key, allow_stale=False):
+        """Cached value for key, or None; allow_stale also returns expired entries"""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and (entry[0] > now or allow_stale):
+                self.memory.move_to_end(key)
+                self.stats_counters['memory_hits'] += 1
+                return entry[1]
+            self.memory.pop(key, None)
+            
+            conn = self._db()
+            row = conn.execute('SELECT value, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row and (row[1] > now or allow_stale):
+                conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+                conn.commit()
+                self._remember(key, row[1], row[0])
+                self.stats_counters['disk_hits'] += 1
+                return row[0]
+            
+            self.stats_counters['misses'] += 1
+            return None
+    
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl
+        with self.lock:
+            self._remember(key, expires_at, value)
+            conn = self._db()
+            conn.execute('INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                         (key, value, expires_at, now))
+            conn.commit()
+            
+            self.writes += 1
+            if self.writes % 100 == 0:
+                self._evict(now)
+    
+    def _evict(self, now):
+        """Drop expired rows, then least recently used rows above max_entries"""
+        conn = self._db()
+        removed = conn.execute('DELETE FROM responses WHERE expires_at <= ?', (now,)).rowcount
+        excess = conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_entries
+        if excess > 0:
+            removed += conn.execute(
+                'DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)',
+                (excess,)
+            ).rowcount
+        conn.commit()
+        self.stats_counters['evictions'] += removed
+    
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            conn = self._db()
+            conn.execute('DELETE FROM responses')
+            conn.commit()
+    
+    def stats(self):
+        with self.lock:
+            counters = dict(self.stats_counters)
+            counters['memory_entries'] = len(self.memory)
+            counters['disk_entries'] = self._db().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+        counters['hit_rate'] = round((counters['memory_hits'] + counters['disk_hits']) / lookups, 3) if lookups else 0
+        return counters
@@ -0,0 +1,203 @@
+"""
+Per-Student Stats
+Keeps one user_stats row per student (attempts, score sum, best score, last
+activity and the latest few submissions) current from ORM events on
+Submission, so the dashboard reads a single row instead of aggregating a
+student's whole history. Writes that bypass the ORM (bulk UPDATEs) must
+call rebuild() for the users they touched.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+from models import db, Course, Exam, LiveClass, Submission, UserStats
+
+RECENT_LIMIT = 5
+
+
+class UserStatsService:
+    def __init__(self, recent_limit=RECENT_LIMIT):
+        self.recent_limit = recent_limit
+        self.table = UserStats.__table__
+    
+    def init_app(self, app):
+        # Load the old score when it is overwritten so updates can apply a delta
+        event.listen(Submission.score, 'set', lambda *args: None, active_history=True)
+        event.listen(Submission, 'after_insert', self._after_insert)
+        event.listen(Submission, 'after_update', self._after_update)
+        event.listen(Submission, 'after_delete', self._after_delete)
+    
+    def get(self, user_id):
+        return db.session.get(UserStats, user_id)
+    
+    # ------------------------------------------------------------------
+    # Incremental maintenance, inside the flush that writes the submission
+    # ------------------------------------------------------------------
+    
+    def _entry(self, connection, submission):
+        title = connection.execute(db.select(Exam.title).where(Exam.id == submission.exam_id)).scalar()
+        return {
+            'submission_id': submission.id,
+            'exam_title': title,
+            'score': submission.score or 0,
+            'submitted_at': (submission.submitted_at or datetime.utcnow()).isoformat()
+        }
+    
+    def _row(self, connection, user_id):
+        row = connection.execute(self.table.select().where(self.table.c.user_id == user_id)).mappings().first()
+        return dict(row) if row else None
+    
+    def _save(self, connection, user_id, values, exists):
+        if exists:
+            connection.execute(self.table.update().where(self.table.c.user_id == user_id).values(**values))
+        else:
+            connection.execute(self.table.insert().values(user_id=user_id, **values))
+    
+    def _after_insert(self, mapper, connection, submission):
+        existing = self._row(connection, submission.user_id)
+        row = existing or {'attempt_count': 0, 'score_sum': 0, 'best_score': None, 'last_activity_at': None, 'recent': []}
+        entry = self._entry(connection, submission)
+        submitted_at = datetime.fromisoformat(entry['submitted_at'])
+        
+        recent = sorted([entry] + (row['recent'] or []), key=lambda e: e['submitted_at'], reverse=True)
+        self._save(connection, submission.user_id, {
+            'attempt_count': row['attempt_count'] + 1,
+            'score_sum': row['score_sum'] + entry['score'],
+            'best_score': max(row['best_score'] or 0, entry['score']) if row['best_score'] is not None else entry['score'],
+            'last_activity_at': max(row['last_activity_at'] or submitted_at, submitted_at),
+            'recent': recent[:self.recent_limit]
+        }, exists=existing is not None)
+    
+    def _after_update(self, mapper, connection, submission):
+        history = db.inspect(submission).attrs
+        if not (history.score.history.has_changes() or history.submitted_at.history.has_changes()
+                or history.user_id.history.has_changes() or history.exam_id.history.has_changes()):
+            return
+        
+        score_history = history.score.history
+        old_score = (score_history.deleted or score_history.unchanged or [None])[0]
+        new_score = submission.score or 0
+        row = self._row(connection, submission.user_id)
+        simple = (row is not None and old_score is not None and not history.user_id.history.has_changes()
+                  and not history.submitted_at.history.has_changes() and not history.exam_id.history.has_changes()
+                  and (new_score >= (row['best_score'] or 0) or (old_score or 0) < (row['best_score'] or 0)))
+        if not simple:
+            # Best score lowered, moved between users or reordered: recompute from the submissions table
+            for user_id in {submission.user_id, *history.user_id.history.deleted}:
+                self.rebuild([user_id], connection=connection)
+            return
+        
+        recent = [dict(e, score=new_score) if e['submission_id'] == submission.id else e for e in (row['recent'] or [])]
+        self._save(connection, submission.user_id, {
+            'score_sum': row['score_sum'] - (old_score or 0) + new_score,
+            'best_score': max(row['best_score'] or 0, new_score),
+            'recent': recent
+        }, exists=True)
+    
+    def _after_delete(self, mapper, connection, submission):
+        self.rebuild([submission.user_id], connection=connection)
+    
+    # ------------------------------------------------------------------
+    # Backfill
+    # ------------------------------------------------------------------
+    
+    def rebuild(self, user_ids=None, connection=None, batch_size=1000):
+        """
+        Recompute stats rows from the submissions table with grouped queries
+        Args:
+            user_ids: Users to recompute (default: everyone with submissions)
+            connection: Run on this connection instead of a new transaction (used inside flushes)
+        Returns:
+            Number of users recomputed
+        """
+        if connection is None:
+            with db.engine.begin() as connection:
+                return self.rebuild(user_ids, connection=connection, batch_size=batch_size)
+        
+        if user_ids is None:
+            connection.execute(self.table.delete())
+            user_ids = connection.execute(db.select(Submission.user_id).distinct()).scalars().all()
+        user_ids = list(user_ids)
+        
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            totals = connection.execute(
+                db.select(
+                    Submission.user_id,
+                    db.func.count(Submission.id),
+                    db.func.coalesce(db.func.sum(Submission.score), 0),
+                    db.func.max(Submission.score),
+                    db.func.max(Submission.submitted_at)
+                ).where(Submission.user_id.in_(batch)).group_by(Submission.user_id)
+            ).all()
+            
+            # Latest submissions per user in one windowed query
+            ranked = db.select(
+                Submission.id, Submission.user_id, Submission.score, Submission.submitted_at, Exam.title,
+                db.func.row_number().over(
+                    partition_by=Submission.user_id,
+                    order_by=(Submission.submitted_at.desc(), Submission.id.desc())
+                ).label('position')
+            ).outerjoin(Exam, Exam.id == Submission.exam_id).where(Submission.user_id.in_(batch)).subquery()
+            recent = {}
+            for row in connection.execute(db.select(ranked).where(ranked.c.position <= self.recent_limit)
+                                          .order_by(ranked.c.user_id, ranked.c.position)):
+                recent.setdefault(row.user_id, []).append({
+                    'submission_id': row.id,
+                    'exam_title': row.title,
+                    'score': row.score or 0,
+                    'submitted_at': row.submitted_at.isoformat() if row.submitted_at else datetime.utcnow().isoformat()
+                })
+            
+            connection.execute(self.table.delete().where(self.table.c.user_id.in_(batch)))
+            rows = [
+                {'user_id': user_id, 'attempt_count': count, 'score_sum': score_sum, 'best_score': best,
+                 'last_activity_at': last, 'recent': recent.get(user_id, [])}
+                for user_id, count, score_sum, best, last in totals
+            ]
+            if rows:
+                connection.execute(self.table.insert(), rows)
+        return len(user_ids)
+
+
+class DashboardSummary:
+    """Site-wide dashboard parts (published course count, upcoming classes), shared by every student"""
+    
+    def __init__(self, ttl_seconds=60):
+        self.ttl = ttl_seconds
+        self.lock = threading.Lock()
+        self.summary = None
+        self.computed_at = 0
+    
+    def get(self):
+        with self.lock:
+            if self.summary is not None and time.time() - self.computed_at < self.ttl:
+                return self.summary
+        
+        now = datetime.utcnow()
+        summary = {
+            'enrolled_courses': Course.query.filter_by(is_published=True).count(),
+            # Plain dicts so the cached rows never touch a closed session
+            'upcoming_classes': [
+                {'title': c.title, 'scheduled_start': c.scheduled_start}
+                for c in LiveClass.query.filter(LiveClass.scheduled_start > now)
+                .order_by(LiveClass.scheduled_start).limit(5)
+            ]
+        }
+        with self.lock:
+            self.summary = summary
+            self.computed_at = time.time()
+        return summary
+    
+    def upcoming_classes(self):
+        """Cached classes minus any that started since the cache was filled"""
+        now = datetime.utcnow()
+        return [c for c in self.get()['upcoming_classes'] if c['scheduled_start'] > now]
+
+
+# Global instances
+user_stats = UserStatsService()
+dashboard_summary = DashboardSummary()
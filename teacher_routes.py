@@ -28,7 +28,7 @@ def teacher_panel():
     
     # Recent activity
     recent_students = User.query.filter_by(role='student').order_by(User.created_at.desc()).limit(5).all()
-    recent_messages = ChatMessage.query.order_by(ChatMessage.created_at.desc()).limit(10).all()
+    recent_messages = ChatMessage.query_with_author().order_by(ChatMessage.created_at.desc()).limit(10).all()
     
     return render_template('teacher_panel.html', 
                          stats=stats,
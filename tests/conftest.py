@@ -0,0 +1,113 @@
+"""
+Test fixtures
+The app runs against a throwaway SQLite database, recreated for every test.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+DATABASE_DIR = tempfile.mkdtemp(prefix='olympus-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DATABASE_DIR, 'test.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import app as flask_app  # noqa: E402
+from models import db, Exam, ExamQuestion, Question, User  # noqa: E402
+from services.llm_backends import StubBackend  # noqa: E402
+from services.resilience import ResilientCaller  # noqa: E402
+from services.response_cache import ResponseCache  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True, SQLALCHEMY_ECHO=False)
+    with flask_app.app_context():
+        db.engine.echo = False
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    counter = iter(range(1, 1_000_000))
+
+    def make(role='student'):
+        number = next(counter)
+        # Tests log in through the session, so the (slow) bcrypt hash is never checked
+        user = User(email=f'user{number}@example.com', name=f'User {number}', role=role, password_hash='-')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def tutor(monkeypatch, tmp_path):
+    """The app's AI tutor on an instant stub backend, with its own cache and breaker"""
+    from services.gemini_tutor import gemini_tutor
+    monkeypatch.setattr(gemini_tutor, 'backend', StubBackend(latency_ms=0, distribution='fixed', chunk_delay_ms=0))
+    monkeypatch.setattr(gemini_tutor, 'cache', ResponseCache(str(tmp_path / 'ai_cache.db')))
+    monkeypatch.setattr(gemini_tutor, 'caller', ResilientCaller(max_in_flight=2, timeout=5))
+    monkeypatch.setattr(gemini_tutor, 'fallbacks', [])
+    return gemini_tutor
+
+
+@pytest.fixture
+def exam_services(app, monkeypatch, tmp_path):
+    """Exam papers and sessions with empty state; both outlive the per-test database, whose ids start over"""
+    from services.exam_papers import exam_papers
+    from services.exam_sessions import exam_sessions
+    monkeypatch.setattr(exam_papers, 'directory', str(tmp_path / 'exam_papers'))
+    monkeypatch.setattr(exam_papers, 'papers', {})
+    for name, value in (('attempts', {}), ('pending', set()), ('failures', {}), ('keys', {})):
+        monkeypatch.setattr(exam_sessions, name, value)
+    monkeypatch.setattr(exam_sessions, 'dead_letter_path', str(tmp_path / 'dead_letter.jsonl'))
+    return exam_papers, exam_sessions
+
+
+def add_exam(answer_keys, partial_credit=False, **fields):
+    """A published exam with one question (worth one point) per answer key"""
+    exam = Exam(title='Mock', is_published=True, **fields)
+    exam.questions = [
+        ExamQuestion(question=Question(title=f'Question {number}', problem_statement=f'Problem {number}'),
+                     position=number, points=1, answer_key=answer_key, partial_credit=partial_credit)
+        for number, answer_key in enumerate(answer_keys)
+    ]
+    db.session.add(exam)
+    db.session.commit()
+    return exam
+
+
+def login(client, user):
+    with client.session_transaction() as session:
+        session['user'] = user.to_dict()
+
+
+@contextmanager
+def count_queries():
+    """Count the SQL statements this thread sends while the block runs (background workers are ignored)"""
+    statements = []
+    thread = threading.get_ident()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread:
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
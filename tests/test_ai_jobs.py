@@ -0,0 +1,72 @@
+"""
+Queued tutor questions on the background job pool
+"""
+
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from conftest import login
+from services.ai_jobs import AIJobQueue
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    queue = AIJobQueue(workers=1, max_depth=1)
+    monkeypatch.setattr(app_module, 'ai_jobs', queue)
+    yield queue
+    if queue.executor:
+        queue.executor.shutdown(wait=True)
+
+
+def wait_for(client, job_id):
+    for _ in range(200):
+        job = client.get(f'/api/ai/jobs/{job_id}').get_json()
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def test_job_is_accepted_at_once_and_polled_to_its_answer(client, make_user, tutor, jobs):
+    release = threading.Event()
+    generate = tutor.backend.generate
+    tutor.backend.generate = lambda prompt: release.wait(5) and generate(prompt)
+    login(client, make_user())
+
+    response = client.post('/api/ai/jobs', json={'message': 'What is a prime?'})
+    job_id = response.get_json()['job_id']
+    assert response.status_code == 202
+    assert client.get(f'/api/ai/jobs/{job_id}').get_json()['status'] in ('queued', 'running')
+
+    release.set()
+    job = wait_for(client, job_id)
+
+    assert job['status'] == 'done' and job['result'] == tutor.ask('What is a prime?')
+
+
+def test_full_queue_is_rejected_with_retry_after(client, make_user, tutor, jobs):
+    release = threading.Event()
+    tutor.backend.generate = lambda prompt: release.wait(5) and 'answer'
+    login(client, make_user())
+
+    first = client.post('/api/ai/jobs', json={'message': 'First'})
+    second = client.post('/api/ai/jobs', json={'message': 'Second'})
+    release.set()
+
+    assert first.status_code == 202
+    assert second.status_code == 503 and second.headers['Retry-After'] == '5'
+    assert wait_for(client, first.get_json()['job_id'])['result'] == 'answer'
+    assert client.post('/api/ai/jobs', json={'message': 'Third'}).status_code == 202
+
+
+def test_jobs_are_private_to_their_owner(client, make_user, tutor, jobs):
+    login(client, make_user())
+    job_id = client.post('/api/ai/jobs', json={'message': 'Mine'}).get_json()['job_id']
+    wait_for(client, job_id)
+
+    login(client, make_user())
+
+    assert client.get(f'/api/ai/jobs/{job_id}').status_code == 404
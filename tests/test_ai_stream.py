@@ -0,0 +1,45 @@
+"""
+Streaming tutor answers over Server-Sent Events
+"""
+
+import json
+
+from conftest import login
+from services.llm_backends import StubBackendError
+
+
+def parse_events(body):
+    """[(event name or None, data)] of an SSE body"""
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((fields.get('event'), json.loads(fields['data'])))
+    return events
+
+
+def test_answer_arrives_in_chunks_and_is_cached_whole(client, make_user, tutor):
+    tutor.backend.chunk_chars = 10
+    login(client, make_user())
+
+    response = client.post('/api/ai/ask/stream', json={'message': 'What is a prime?'})
+    events = parse_events(response.get_data(as_text=True))
+
+    chunks = [data['text'] for name, data in events if name is None]
+    assert response.mimetype == 'text/event-stream'
+    assert len(chunks) > 1 and events[-1][0] == 'done'
+    tutor.backend.generate = None  # A cached answer no longer needs the model
+    assert client.post('/api/ai/ask', json={'message': 'What is a prime?'}).get_json()['response'] == ''.join(chunks)
+
+
+def test_model_failure_mid_stream_sends_an_error_event(client, make_user, tutor):
+    def broken_stream(prompt):
+        yield 'partial answer'
+        raise StubBackendError('connection reset')
+    tutor.backend.stream = broken_stream
+    login(client, make_user())
+
+    events = parse_events(client.post('/api/ai/ask/stream', json={'message': 'Why?'}).get_data(as_text=True))
+
+    assert events[0] == (None, {'text': 'partial answer'})
+    assert events[-1][0] == 'error' and 'connection reset' in events[-1][1]['details']
+    assert tutor.cache.stats()['disk_entries'] == 0  # Incomplete answers are not cached
@@ -0,0 +1,68 @@
+"""
+Offline Bangla solution job: fills missing explanations, retries, and resumes from its checkpoint
+"""
+
+import threading
+
+import pytest
+
+from models import db, Question
+from services.bangla_solutions import BanglaSolutionJob
+
+
+class FakeTutor:
+    def __init__(self, failing=(), flaky=()):
+        self.failing = set(failing)  # statements that always fail
+        self.flaky = set(flaky)  # statements that fail once
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def explain_solution(self, problem_statement, solution, raise_errors=False):
+        with self.lock:
+            self.calls.append(problem_statement)
+            if problem_statement in self.failing:
+                raise RuntimeError('model error')
+            if problem_statement in self.flaky:
+                self.flaky.discard(problem_statement)
+                raise RuntimeError('transient error')
+        return f'বাংলা: {solution}'
+
+
+@pytest.fixture
+def questions(app):
+    db.session.add_all([Question(title=f'Q{number}', problem_statement=f'P{number}', solution=f'S{number}',
+                                 solution_bangla='আগেই আছে' if number == 2 else None)
+                        for number in range(1, 7)])
+    db.session.commit()
+
+
+def job(tutor, tmp_path, **options):
+    return BanglaSolutionJob(tutor, str(tmp_path / 'checkpoint.json'), workers=2, backoff=0, batch_size=2, **options)
+
+
+def solutions():
+    db.session.expire_all()
+    return {q.problem_statement: q.solution_bangla for q in Question.query.order_by(Question.id)}
+
+
+def test_fills_missing_solutions_and_retries_transient_errors(questions, tmp_path):
+    tutor = FakeTutor(flaky={'P3'})
+
+    assert job(tutor, tmp_path, retries=1).run() == {'generated': 5, 'failed': 0}
+
+    assert solutions() == {'P1': 'বাংলা: S1', 'P2': 'আগেই আছে', 'P3': 'বাংলা: S3', 'P4': 'বাংলা: S4',
+                           'P5': 'বাংলা: S5', 'P6': 'বাংলা: S6'}
+    assert tutor.calls.count('P3') == 2 and 'P2' not in tutor.calls
+
+
+def test_resumes_after_the_checkpoint_and_restart_retries_failures(questions, tmp_path):
+    assert job(FakeTutor(failing={'P4'}), tmp_path, retries=0).run(limit=3) == {'generated': 2, 'failed': 1}
+    assert job(FakeTutor(), tmp_path).load_checkpoint() == {'last_id': 4, 'failed': [4]}
+
+    resumed = FakeTutor()
+    assert job(resumed, tmp_path).run() == {'generated': 2, 'failed': 0}
+    assert sorted(resumed.calls) == ['P5', 'P6']
+    assert solutions()['P4'] is None
+
+    assert job(FakeTutor(), tmp_path).run(restart=True) == {'generated': 1, 'failed': 0}
+    assert solutions()['P4'] == 'বাংলা: S4'
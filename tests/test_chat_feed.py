@@ -0,0 +1,73 @@
+"""
+Chat feed paging, from the in-memory buffer and from the database
+"""
+
+import pytest
+
+from models import db, ChatMessage, LiveClass
+from services.chat_buffer import chat_buffer, LocalIdSource
+
+
+@pytest.fixture
+def live_class(app, make_user):
+    # The buffer outlives the per-test database, whose ids start over
+    chat_buffer.recent.clear()
+    chat_buffer.warmed.clear()
+    chat_buffer.complete.clear()
+    live_class = LiveClass(title='Class', channel_name='feed', is_live=True)
+    db.session.add(live_class)
+    db.session.commit()
+    author = make_user()
+    db.session.add_all([ChatMessage(user_id=author.id, live_class_id=live_class.id, message=f'message {index}')
+                        for index in range(300)])
+    db.session.commit()
+    return live_class.id
+
+
+def test_negative_limit_returns_one_message_from_the_buffer(client, live_class):
+    response = client.get(f'/api/chat/messages?class_id={live_class}&limit=-5')
+
+    assert [msg['message'] for msg in response.get_json()] == ['message 299']
+
+
+def test_negative_limit_returns_one_message_from_the_database(client, live_class):
+    # since_id=1 is older than the 200 buffered messages, so the page is read from the table
+    response = client.get(f'/api/chat/messages?class_id={live_class}&since_id=1&limit=-1')
+
+    assert [msg['id'] for msg in response.get_json()] == [2]
+
+
+def test_limit_is_capped_at_the_page_size(client, live_class):
+    response = client.get(f'/api/chat/messages?class_id={live_class}&since_id=1&limit=1000')
+
+    assert len(response.get_json()) == client.application.config['CHAT_PAGE_LIMIT']
+
+
+def test_unknown_class_is_not_buffered(client, live_class):
+    response = client.get('/api/chat/messages?class_id=9999')
+
+    assert response.get_json() == []
+    assert 9999 not in chat_buffer.recent and 9999 not in chat_buffer.warmed
+
+
+def test_ended_class_is_evicted_and_read_from_the_database(client, live_class):
+    client.get(f'/api/chat/messages?class_id={live_class}')
+    assert live_class in chat_buffer.recent
+
+    db.session.get(LiveClass, live_class).is_live = False
+    db.session.commit()
+    chat_buffer.evict_ended()
+
+    assert live_class not in chat_buffer.recent
+    response = client.get(f'/api/chat/messages?class_id={live_class}&limit=2')
+    assert [msg['message'] for msg in response.get_json()] == ['message 298', 'message 299']
+    assert live_class not in chat_buffer.recent
+
+
+def test_second_process_with_local_ids_fails(app, tmp_path):
+    lock_path = str(tmp_path / 'chat_ids.lock')
+    first, second = LocalIdSource(lock_path), LocalIdSource(lock_path)
+
+    assert first.next() == 1
+    with pytest.raises(RuntimeError):
+        second.next()
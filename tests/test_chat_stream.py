@@ -0,0 +1,73 @@
+"""
+Chat hub fan-out and the Server-Sent Events stream
+"""
+
+import json
+
+import pytest
+
+from models import db, ChatMessage, LiveClass
+from services.chat_buffer import chat_buffer
+from services.chat_hub import ChatHub, chat_hub
+
+
+def test_hub_delivers_to_the_class_subscribers_and_listeners():
+    hub = ChatHub()
+    heard = []
+    hub.add_listener(lambda class_id, message: heard.append((class_id, message['id'])))
+    first, second, other = hub.subscribe(1), hub.subscribe(1), hub.subscribe(2)
+
+    hub.publish(1, {'id': 7})
+
+    assert first.get(0) == second.get(0) == {'id': 7}
+    assert other.get(0) is None
+    assert heard == [(1, 7)]
+
+
+def test_slow_subscribers_are_dropped():
+    hub = ChatHub(max_pending=2)
+    slow = hub.subscribe(1)
+
+    for message_id in range(3):
+        hub.publish(1, {'id': message_id})
+
+    assert slow.closed and hub.subscriber_count(1) == 0
+
+
+@pytest.fixture
+def live_class(app, make_user):
+    chat_buffer.recent.clear()
+    chat_buffer.warmed.clear()
+    chat_buffer.complete.clear()
+    live_class = LiveClass(title='Class', channel_name='stream', is_live=True)
+    db.session.add(live_class)
+    db.session.commit()
+    author = make_user()
+    db.session.add_all([ChatMessage(user_id=author.id, live_class_id=live_class.id, message=f'message {index}')
+                        for index in range(5)])
+    db.session.commit()
+    return live_class.id
+
+
+def events(response):
+    """Parsed data of each event as the stream produces it (comments are yielded as None)"""
+    for chunk in response.response:
+        text = chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+        data = [line[len('data: '):] for line in text.splitlines() if line.startswith('data: ')]
+        yield json.loads(data[0]) if data else None
+
+
+def test_stream_replays_after_the_cursor_then_pushes_new_messages(client, live_class, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'CHAT_STREAM_HEARTBEAT', 0.05)
+    response = client.get(f'/api/chat/stream?class_id={live_class}', headers={'Last-Event-ID': '3'})
+    stream = events(response)
+
+    assert response.mimetype == 'text/event-stream'
+    assert [next(stream)['id'] for _ in range(2)] == [4, 5]
+    assert next(stream) is None  # Keep-alive while nothing is posted
+
+    chat_hub.publish(live_class, {'id': 6, 'user': 'User 1', 'role': 'student', 'message': 'hello', 'timestamp': ''})
+    assert next(stream)['message'] == 'hello'
+
+    response.close()
+    assert chat_hub.subscriber_count(live_class) == 0
@@ -0,0 +1,69 @@
+"""
+Server-side tutor conversation memory
+"""
+
+import pytest
+
+from conftest import login
+from services.conversations import conversations
+
+
+@pytest.fixture
+def prompts(tutor, monkeypatch):
+    """Prompts the model receives; each answer names its question"""
+    sent = []
+
+    def generate(prompt):
+        sent.append(prompt)
+        return f'answer {len(sent)}'
+    monkeypatch.setattr(tutor.backend, 'generate', generate)
+    monkeypatch.setattr(conversations, 'keep_turns', 4)
+    return sent
+
+
+def ask(client, message, conversation_id=None):
+    return client.post('/api/ai/ask', json={'message': message, 'conversation_id': conversation_id}).get_json()
+
+
+def test_turns_are_stored_and_old_ones_compacted_into_the_summary(client, make_user, prompts):
+    login(client, make_user())
+
+    conversation_id = ask(client, 'question 1')['conversation_id']
+    for number in range(2, 5):
+        assert ask(client, f'question {number}', conversation_id)['conversation_id'] == conversation_id
+    conversation = client.get(f'/api/ai/conversations/{conversation_id}').get_json()
+
+    assert [turn['content'] for turn in conversation['turns']] == ['question 3', 'answer 3', 'question 4', 'answer 4']
+    assert conversation['summary'].splitlines() == [
+        'student: question 1', 'tutor: answer 1', 'student: question 2', 'tutor: answer 2'
+    ]
+    # The last question was asked with the summary and the turns still kept verbatim
+    assert 'tutor: answer 1' in prompts[-1] and 'answer 3' in prompts[-1]
+    assert 'question 4' in prompts[-1]
+
+
+def test_summary_is_capped_dropping_its_oldest_lines(client, make_user, prompts, monkeypatch):
+    monkeypatch.setattr(conversations, 'keep_turns', 2)
+    monkeypatch.setattr(conversations, 'summary_chars', 60)
+    login(client, make_user())
+
+    conversation_id = ask(client, 'question 1')['conversation_id']
+    for number in range(2, 7):
+        ask(client, f'question {number}', conversation_id)
+    summary = client.get(f'/api/ai/conversations/{conversation_id}').get_json()['summary']
+
+    assert len(summary) <= 60
+    assert summary.splitlines()[-1] == 'tutor: answer 5'
+    assert 'question 1' not in summary
+
+
+def test_conversations_are_private_to_their_owner(client, make_user, prompts):
+    login(client, make_user())
+    conversation_id = ask(client, 'my secret question')['conversation_id']
+
+    login(client, make_user())
+
+    assert client.get(f'/api/ai/conversations/{conversation_id}').status_code == 404
+    # Someone else's id starts a fresh conversation instead of reading the owner's history
+    assert ask(client, 'question', conversation_id)['conversation_id'] != conversation_id
+    assert 'my secret question' not in prompts[-1]
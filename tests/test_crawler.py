@@ -0,0 +1,148 @@
+"""
+Crawler and scraper against a local fixture server
+"""
+
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config import Config
+from services.crawler import Crawler
+from services.question_scraper import QuestionScraper
+
+PAGE_DELAY = 0.2  # Seconds the server takes per page, so overlapping fetches show up in timings
+
+
+def topic_page(number):
+    return (f'<html><body><div class="cmty-post-body">Problem {number}: find every positive integer n '
+            f'such that n squared plus {number} n is a perfect square.</div></body></html>').encode('utf-8')
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FixtureHandler)
+        self.pages = {f'/topic/{number}': topic_page(number) for number in range(20)}
+        self.pages['/index'] = ''.join(
+            f'<a href="/topic/{number}">Topic {number}</a>' for number in range(5)
+        ).encode('utf-8')
+        self.lock = threading.Lock()
+        self.connections = set()  # client (host, port) pairs seen, one per TCP connection
+        self.statuses = []
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so connection reuse can be observed
+
+    def do_GET(self):
+        body = self.server.pages.get(self.path)
+        with self.server.lock:
+            self.server.connections.add(self.client_address)
+        if body is None:
+            self.reply(404, b'')
+            return
+        time.sleep(PAGE_DELAY)
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.reply(304, b'', etag)
+        else:
+            self.reply(200, body, etag)
+
+    def reply(self, status, body, etag=None):
+        with self.server.lock:
+            self.server.statuses.append(status)
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FixtureServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SCRAPER_CACHE_PATH', str(tmp_path / 'http_cache.db'))
+    monkeypatch.setattr(Config, 'SCRAPER_HOST_INTERVAL', 0)
+    return QuestionScraper()
+
+
+def test_fetch_all_overlaps_requests_and_keeps_input_order(server, tmp_path):
+    crawler = Crawler(str(tmp_path / 'cache.db'), workers=8, host_interval=0)
+    urls = [f'{server.base_url}/topic/{number}' for number in range(8)]
+
+    started = time.monotonic()
+    results = list(crawler.fetch_all(urls))
+    elapsed = time.monotonic() - started
+
+    assert [result.url for result in results] == urls
+    assert [result.body for result in results] == [topic_page(number) for number in range(8)]
+    assert elapsed < 8 * PAGE_DELAY / 2
+
+
+def test_unchanged_pages_are_revalidated_not_downloaded(server, tmp_path):
+    crawler = Crawler(str(tmp_path / 'cache.db'), workers=2, host_interval=0)
+    url = f'{server.base_url}/topic/1'
+
+    first = crawler.fetch(url)
+    second = crawler.fetch(url)
+
+    assert first.changed and first.status == 200
+    assert not second.changed and second.from_cache and second.status == 304
+    assert second.body == first.body
+    assert server.statuses == [200, 304]
+    assert crawler.stats() == {'fetched': 1, 'not_modified': 1, 'errors': 0}
+
+
+def test_missing_page_is_reported_and_does_not_stop_the_crawl(server, tmp_path):
+    crawler = Crawler(str(tmp_path / 'cache.db'), workers=2, host_interval=0)
+
+    missing, found = crawler.fetch_all([f'{server.base_url}/missing', f'{server.base_url}/topic/2'])
+
+    assert missing.body is None and missing.error
+    assert found.body == topic_page(2)
+
+
+def test_worker_count_sizes_the_connection_pool(server, scraper):
+    urls = [f'{server.base_url}/topic/{number}' for number in range(16)]
+
+    scraper.crawl(urls, only_changed=False, workers=8)
+    scraper.crawl(urls, only_changed=False, workers=8)
+
+    # Every connection goes back to the pool; a pool smaller than the workers would open new ones
+    assert len(server.connections) <= 8
+
+
+def test_crawl_follows_the_index_and_skips_unchanged_pages(server, scraper):
+    questions, stats = scraper.crawl(index_url=f'{server.base_url}/index', link_pattern=r'/topic/\d+$')
+
+    assert stats['pages'] == 5 and stats['parsed'] == 5
+    assert sorted(question['problem_statement'].split(':')[0] for question in questions) == [
+        f'Problem {number}' for number in range(5)
+    ]
+
+    questions, stats = scraper.crawl(index_url=f'{server.base_url}/index', link_pattern=r'/topic/\d+$')
+
+    assert questions == []
+    assert stats['unchanged'] == 5
@@ -0,0 +1,72 @@
+"""
+Pre-rendered exam papers: release at the start time, ETags and revisions
+"""
+
+from datetime import datetime, timedelta
+
+from conftest import add_exam, count_queries, login
+from models import db, Question
+from services.exam_papers import ExamPaperService
+
+
+def test_paper_is_held_back_until_the_start_time(client, make_user, exam_services):
+    exam = add_exam(['1'], scheduled_date=datetime.utcnow() + timedelta(minutes=10))
+    login(client, make_user())
+
+    response = client.get(f'/api/exams/{exam.id}/paper')
+
+    assert response.status_code == 403
+    assert 0 < int(response.headers['Retry-After']) <= 601
+
+    exam.scheduled_date = datetime.utcnow() - timedelta(minutes=1)
+    db.session.commit()
+    assert client.get(f'/api/exams/{exam.id}/paper').status_code == 200
+
+
+def test_paper_is_served_without_question_queries_and_revalidated(client, make_user, exam_services):
+    exam = add_exam(['1', '2'])
+    exam_id = exam.id
+    login(client, make_user())
+    first = client.get(f'/api/exams/{exam_id}/paper')
+    db.session.remove()
+
+    with count_queries() as statements:
+        again = client.get(f'/api/exams/{exam_id}/paper', headers={'If-None-Match': first.headers['ETag']})
+
+    assert again.status_code == 304
+    assert not [statement for statement in statements if 'FROM questions' in statement]
+    assert 'answer_key' not in first.get_data(as_text=True) and 'Problem 1' in first.get_data(as_text=True)
+
+
+def test_editing_a_question_bumps_the_revision_and_renders_a_new_paper(client, make_user, exam_services):
+    exam = add_exam(['1'])
+    exam_id, revision = exam.id, exam.paper_revision
+    login(client, make_user())
+    old = client.get(f'/api/exams/{exam_id}/paper')
+    old_url = f'/api/exams/{exam_id}/paper/{old.get_etag()[0]}.json'
+
+    question = Question.query.one()
+    question.problem_statement = 'Corrected problem'
+    db.session.commit()
+    new = client.get(f'/api/exams/{exam_id}/paper')
+
+    assert exam.paper_revision == revision + 1
+    assert new.headers['ETag'] != old.headers['ETag'] and 'Corrected problem' in new.get_data(as_text=True)
+    # The old immutable URL now points at the current version
+    assert client.get(old_url).status_code == 302
+
+
+def test_workers_share_the_rendered_paper_on_disk(app, exam_services):
+    papers, _ = exam_services
+    exam = add_exam(['1'])
+    rendered = papers.get(exam.id, revision=exam.paper_revision)
+
+    other_worker = ExamPaperService()
+    other_worker.directory = papers.directory
+
+    assert other_worker.get(exam.id, revision=exam.paper_revision).etag == rendered.etag
+    exam.title = 'Renamed'
+    db.session.commit()
+    # Its copy in memory is for the old revision, so it renders the paper again
+    current = other_worker.get(exam.id, revision=exam.paper_revision)
+    assert current.etag != rendered.etag and current.revision == exam.paper_revision
@@ -0,0 +1,109 @@
+"""
+Timed exam sessions: autosave deltas, the write-behind flush and submit
+"""
+
+import json
+
+import pytest
+
+from conftest import add_exam, login
+from models import db, ExamAttempt, Submission
+from services.exam_sessions import ExamSessionService
+
+
+@pytest.fixture
+def exam(exam_services):
+    return add_exam(['42', '1/2', 'seven'])
+
+
+@pytest.fixture
+def student(client, make_user):
+    user = make_user()
+    login(client, user)
+    return user.id
+
+
+def question_ids(exam):
+    return [str(item.question_id) for item in exam.questions]
+
+
+def start(client, exam_id):
+    return client.post(f'/api/exams/{exam_id}/start').get_json()['attempt']['attempt_id']
+
+
+def autosave(client, exam_id, answers, seq=None):
+    return client.post(f'/api/exams/{exam_id}/autosave', json={'answers': answers, 'seq': seq})
+
+
+def stored_answers(attempt_id):
+    db.session.expire_all()
+    return db.session.get(ExamAttempt, attempt_id).answers
+
+
+def test_autosaves_are_merged_and_stale_ones_ignored(client, student, exam, exam_services):
+    _, sessions = exam_services
+    first, second, third = question_ids(exam)
+    attempt_id = start(client, exam.id)
+
+    assert autosave(client, exam.id, {first: '41', second: '0.5'}, 1).get_json() == {'saved': 2, 'seq': 1}
+    assert autosave(client, exam.id, {first: '42', second: None}, 3).get_json() == {'saved': 2, 'seq': 3}
+    assert autosave(client, exam.id, {first: 'late retry'}, 2).get_json() == {'saved': 0, 'seq': 3}
+    sessions.flush()
+
+    assert stored_answers(attempt_id) == {first: '42'}
+
+    # Another worker's buffer holds a different question; its flush merges instead of overwriting
+    other_worker = ExamSessionService()
+    other_worker.app = client.application
+    other_worker.autosave(exam.id, student, {third: 'Seven'})
+    other_worker.flush()
+
+    assert stored_answers(attempt_id) == {first: '42', third: 'Seven'}
+
+
+def test_bad_autosaves_are_rejected(client, student, exam):
+    first = question_ids(exam)[0]
+
+    assert autosave(client, exam.id, {first: '1'}).status_code == 404  # Not started
+    start(client, exam.id)
+    assert autosave(client, exam.id, {first: '1'}, seq='2').status_code == 400
+    assert autosave(client, exam.id, {'999999': '1'}).status_code == 400
+    assert autosave(client, exam.id, {first: 'x' * 5000}).status_code == 413
+
+
+def test_submit_grades_once_and_later_calls_return_the_same_submission(client, student, exam, exam_services):
+    first, second, third = question_ids(exam)
+    start(client, exam.id)
+    autosave(client, exam.id, {first: '42'})
+
+    # Answers sent with the submit count too; numbers compare by value
+    submitted = client.post(f'/api/exams/{exam.id}/submit', json={'answers': {second: '.5'}}).get_json()
+    retried = client.post(f'/api/exams/{exam.id}/submit', json={'answers': {third: 'seven'}}).get_json()
+
+    assert submitted['submission']['score'] == 67
+    assert retried['submission'] == submitted['submission']
+    assert Submission.query.count() == 1
+    assert autosave(client, exam.id, {third: 'seven'}).status_code == 409
+
+
+def test_writes_that_keep_failing_go_to_the_dead_letter_file(app, make_user, exam, tmp_path, monkeypatch):
+    sessions = ExamSessionService(max_retries=2)
+    sessions.app = app
+    sessions.dead_letter_path = str(tmp_path / 'dead_letter.jsonl')
+    student = make_user().id
+    sessions.start(exam, student)
+    first = question_ids(exam)[0]
+
+    def broken_write(deltas, now):
+        raise RuntimeError('disk I/O error')
+    monkeypatch.setattr(sessions, '_write', broken_write)
+    sessions.autosave(exam.id, student, {first: '42'})
+
+    assert sessions.flush() == 0
+    assert sessions.pending  # Kept for the next flush
+    sessions.flush()
+
+    assert not sessions.pending
+    with open(sessions.dead_letter_path, encoding='utf-8') as f:
+        letter = json.loads(f.read())
+    assert letter['answers'] == {first: '42'} and letter['error'] == 'disk I/O error'
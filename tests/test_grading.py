@@ -0,0 +1,64 @@
+"""
+Vectorized grading: answer matching, partial credit and regrades
+"""
+
+from conftest import add_exam, login
+from models import db, ExamQuestion, Submission, UserStats
+from services.grading import AnswerKey, normalize_part
+
+
+def test_answers_match_by_value_case_and_spacing():
+    assert normalize_part('0.5') == normalize_part('.5') == normalize_part('1/2') == normalize_part('2/4')
+    assert normalize_part('  Isosceles   Triangle ') == normalize_part('isosceles triangle')
+    assert normalize_part('1/0') == '1/0'
+    assert normalize_part('0.5') != normalize_part('5')
+
+
+def test_partial_credit_parts_and_alternatives():
+    key = AnswerKey([
+        (1, 4, '2; 3|three; 5', True),  # Three parts, the second with two accepted forms
+        (2, 2, 'a|b', False),  # Without partial credit '|' is part of the one answer
+        (3, 5, None, False),  # No key yet: worth nothing
+    ])
+
+    scores = key.score([
+        {'1': '2;THREE;5', '2': 'a|b'},
+        {'1': '2; 4; 5.0', '2': 'a'},
+        {'1': '2'},
+        {'3': 'anything'},
+        {},
+    ])
+
+    assert key.total == 6
+    assert scores.tolist() == [100, 44, 22, 0, 0]
+
+
+def test_dry_run_regrade_reports_without_saving(client, make_user, exam_services):
+    exam = add_exam(['12', '7'])
+    first, second = (str(item.question_id) for item in exam.questions)
+    exam_id, question_id = exam.id, exam.questions[1].question_id
+    students = [make_user() for _ in range(3)]
+    db.session.add_all([Submission(exam_id=exam_id, user_id=student.id, answers=answers, score=score)
+                        for student, answers, score in zip(students, [{first: '12', second: '7'},
+                                                                      {first: '12', second: '8'},
+                                                                      {first: '11', second: '8'}], [100, 50, 0])])
+    db.session.commit()
+    login(client, make_user('teacher'))
+
+    def regrade(dry_run):
+        return client.post(f'/teacher/exams/{exam_id}/regrade',
+                           json={'answer_key': {question_id: '8'}, 'dry_run': dry_run}).get_json()
+
+    preview = regrade(True)
+    db.session.expire_all()
+
+    assert (preview['changed'], preview['students'], preview['saved']) == (3, 3, False)
+    assert [submission.score for submission in Submission.query.order_by(Submission.id)] == [100, 50, 0]
+    assert db.session.get(ExamQuestion, exam.questions[1].id).answer_key == '7'
+
+    report = regrade(False)
+    db.session.expire_all()
+
+    assert (report['changed'], report['keys_corrected']) == (3, 1)
+    assert [submission.score for submission in Submission.query.order_by(Submission.id)] == [50, 100, 50]
+    assert db.session.get(UserStats, students[0].id).best_score == 50
@@ -0,0 +1,65 @@
+"""
+Exam leaderboards: ranks from the score index and the rank/leaderboard endpoints
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.exceptions import NotFound
+
+from conftest import login
+from models import db, Exam, Submission
+from services.leaderboards import ExamLeaderboard, leaderboards
+
+
+@pytest.fixture(autouse=True)
+def fresh_boards():
+    # Boards outlive the per-test database, whose ids start over
+    leaderboards.boards.clear()
+    leaderboards.snapshots.clear()
+
+
+def test_ties_share_a_rank_and_only_the_best_score_counts():
+    board = ExamLeaderboard()
+    start = datetime(2024, 1, 1)
+    for submission_id, (user_id, score) in enumerate([(1, 90), (2, 70), (3, 90), (4, 40), (2, 95), (3, 50)]):
+        board.offer(user_id, score, start + timedelta(minutes=submission_id), submission_id)
+
+    assert board.rank(2) == {'score': 95, 'rank': 1, 'percentile': 75.0, 'participants': 4}
+    assert board.rank(1)['rank'] == board.rank(3)['rank'] == 2
+    assert board.rank(4) == {'score': 40, 'rank': 4, 'percentile': 0.0, 'participants': 4}
+    assert [user_id for user_id, _, _ in board.top(3)] == [2, 1, 3]
+
+
+def submit(exam, user, score):
+    db.session.add(Submission(exam_id=exam.id, user_id=user.id, score=score))
+    db.session.commit()
+
+
+def test_rank_of_a_published_exam(client, make_user):
+    exam = Exam(title='Exam', is_published=True)
+    db.session.add(exam)
+    db.session.commit()
+    students = [make_user() for _ in range(4)]
+    for student, score in zip(students, [50, 80, 65, 80]):
+        submit(exam, student, score)
+    login(client, students[2])
+
+    response = client.get(f'/api/exams/{exam.id}/rank')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'exam_id': exam.id, 'score': 65, 'rank': 3, 'percentile': 25.0, 'participants': 4}
+
+
+def test_rank_of_an_unpublished_exam_is_not_found(client, make_user, monkeypatch):
+    # A bare 404 instead of the app's error page, which needs the 404.html template
+    monkeypatch.setitem(client.application.error_handler_spec[None][404], NotFound, lambda error: ('', 404))
+    exam = Exam(title='Draft', is_published=False)
+    db.session.add(exam)
+    db.session.commit()
+    student = make_user()
+    submit(exam, student, 90)
+    login(client, student)
+
+    assert client.get(f'/api/exams/{exam.id}/rank').status_code == 404
+    assert client.get(f'/api/exams/{exam.id}/leaderboard').status_code == 404
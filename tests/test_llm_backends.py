@@ -0,0 +1,51 @@
+"""
+Offline stub backend used for load tests
+"""
+
+import types
+
+import pytest
+
+from services.llm_backends import StubBackend, StubBackendError, create_backend
+
+
+def test_stub_is_deterministic_and_streams_the_same_text():
+    backend = StubBackend(latency_ms=0, distribution='fixed', chunk_chars=10, chunk_delay_ms=0)
+
+    answer = backend.generate('prompt one')
+    chunks = list(backend.stream('prompt one'))
+
+    assert answer == backend.generate('prompt one') != backend.generate('prompt two')
+    assert ''.join(chunks) == answer
+    assert all(len(chunk) <= 10 for chunk in chunks) and len(chunks) > 1
+
+
+def test_stub_fails_at_the_configured_rate():
+    backend = StubBackend(latency_ms=0, distribution='fixed', error_rate=0.3, seed=7)
+    failures = 0
+    for _ in range(1000):
+        try:
+            backend.generate('prompt')
+        except StubBackendError:
+            failures += 1
+
+    assert 250 < failures < 350
+
+
+def test_stub_latency_follows_the_distribution():
+    backend = StubBackend(latency_ms=100, distribution='lognormal', seed=3)
+    latencies = sorted(backend._latency() for _ in range(2001))
+
+    assert latencies[1000] == pytest.approx(0.1, rel=0.1)  # Median
+    assert latencies[-20] > 2 * latencies[1000]  # Long tail
+    assert StubBackend(latency_ms=100, distribution='fixed')._latency() == 0.1
+
+
+def test_config_selects_the_backend():
+    config = types.SimpleNamespace(AI_BACKEND='stub', AI_STUB_LATENCY_MS=5, AI_STUB_DISTRIBUTION='fixed',
+                                   AI_STUB_ERROR_RATE=0, AI_STUB_CHUNK_CHARS=40, AI_STUB_SEED=None,
+                                   GEMINI_API_KEY='')
+
+    assert create_backend(config).name == 'stub'
+    # Gemini without an API key: no backend, so the tutor reports itself unavailable
+    assert create_backend(types.SimpleNamespace(**dict(vars(config), AI_BACKEND='gemini'))) is None
@@ -0,0 +1,51 @@
+"""
+Near-duplicate detection with MinHash signatures and LSH buckets
+"""
+
+from models import db, Question
+from services.near_duplicates import near_duplicates
+from services.question_ingest import QuestionIngestor
+
+ORIGINAL = 'Find all positive integers n such that n squared plus three n plus two is a perfect square.'
+REWORDED = 'Find all positive integers n such that n squared plus three n plus two is a perfect square number.'
+UNRELATED = 'A triangle has sides three four and five; find the radius of the circle inscribed in it.'
+
+
+def ingest(statements, **options):
+    return QuestionIngestor().ingest([{'problem_statement': statement, 'source': 'Test'} for statement in statements],
+                                     **options)
+
+
+def ids():
+    return {row.problem_statement: row.id for row in db.session.query(Question.id, Question.problem_statement)}
+
+
+def test_reworded_copy_is_flagged_and_found(app):
+    ingest([ORIGINAL, UNRELATED])
+
+    report = ingest([REWORDED])
+    stored = ids()
+
+    assert report['near_duplicates'] == 1 and report['inserted'] == 1
+    assert [qid for qid, _ in near_duplicates.find(ORIGINAL)] == [stored[ORIGINAL], stored[REWORDED]]
+    assert [qid for qid, _ in near_duplicates.find(ORIGINAL, exclude_id=stored[ORIGINAL])] == [stored[REWORDED]]
+    assert near_duplicates.pairs()[0][:2] == (stored[ORIGINAL], stored[REWORDED])
+    assert len(near_duplicates.pairs()) == 1
+
+
+def test_reworded_copies_can_be_skipped_within_a_batch(app):
+    report = ingest([ORIGINAL, REWORDED, UNRELATED], skip_near_duplicates=True)
+
+    assert report['near_duplicates'] == 1 and report['inserted'] == 2
+    assert set(ids()) == {ORIGINAL, UNRELATED}
+
+
+def test_rebuild_indexes_questions_added_without_a_signature(app):
+    db.session.add_all([Question(title='Old', problem_statement=statement) for statement in (ORIGINAL, REWORDED)])
+    db.session.commit()
+    assert near_duplicates.pairs() == []
+
+    assert near_duplicates.rebuild(missing_only=True) == 2
+
+    similarity = near_duplicates.pairs()[0][2]
+    assert near_duplicates.threshold <= similarity < 1
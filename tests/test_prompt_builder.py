@@ -0,0 +1,39 @@
+"""
+Tutor prompts keep the newest history that fits the character budget
+"""
+
+from services.prompt_builder import PromptBuilder
+
+
+def turns(count, length=100):
+    return [{'role': 'student' if index % 2 == 0 else 'tutor', 'content': f'{index:03d}' + 'x' * (length - 3)}
+            for index in range(count)]
+
+
+def test_short_history_is_kept_whole():
+    prompt, stats = PromptBuilder('SYSTEM', max_chars=2000).build('What is 2 + 2?', turns(3))
+
+    assert prompt.startswith('SYSTEM\n\n')
+    assert prompt.endswith('What is 2 + 2?\n\nউত্তর:')
+    assert stats['turns_kept'] == 3 and stats['turns_dropped'] == 0
+    assert 'বাদ দেওয়া' not in prompt
+
+
+def test_oldest_turns_are_dropped_to_fit_the_budget():
+    builder = PromptBuilder('SYSTEM', max_chars=1200)
+
+    prompt, stats = builder.build('Why?', turns(40), summary='Earlier: primes')
+
+    assert len(prompt) <= 1200
+    assert stats['turns_dropped'] == 40 - stats['turns_kept'] > 0
+    kept = [line[line.index(': ') + 2:][:3] for line in prompt.splitlines() if line.startswith(('student:', 'tutor:'))]
+    assert kept == [f'{index:03d}' for index in range(40 - stats['turns_kept'], 40)]
+    assert f"আগের {stats['turns_dropped']}টি বার্তা" in prompt
+    assert builder.stats()['turns_dropped'] == stats['turns_dropped']
+
+
+def test_long_turns_are_truncated():
+    prompt, stats = PromptBuilder('SYSTEM', max_chars=12000, max_turn_chars=50).build('Q', turns(1, length=500))
+
+    assert stats['turns_kept'] == 1
+    assert '000' + 'x' * 47 + ' …' in prompt and 'x' * 48 not in prompt
@@ -0,0 +1,66 @@
+"""
+List pages must read related rows in the same SELECT, not one query per row
+"""
+
+from conftest import count_queries, login
+from models import db, ChatMessage, LiveClass
+
+
+def add_messages(class_id, authors):
+    db.session.add_all([ChatMessage(user_id=author.id, live_class_id=class_id, message=f'message {index}')
+                        for index, author in enumerate(authors)])
+    db.session.commit()
+
+
+def test_chat_history_loads_authors_with_the_messages(app, make_user):
+    live_class = LiveClass(title='Class', channel_name='history')
+    db.session.add(live_class)
+    db.session.commit()
+    class_id = live_class.id
+    add_messages(class_id, [make_user() for _ in range(20)])
+    db.session.expire_all()
+
+    with count_queries() as statements:
+        messages = [msg.to_dict() for msg in ChatMessage.query_with_author().filter_by(
+            live_class_id=class_id
+        ).order_by(ChatMessage.id).all()]
+
+    assert len(messages) == 20
+    assert messages[0]['user'] == 'User 1'
+    assert len(statements) == 1
+
+
+def test_live_classes_load_instructors_with_the_classes(app, make_user):
+    db.session.add_all([LiveClass(title=f'Class {index}', channel_name=f'channel-{index}',
+                                  instructor_id=make_user('teacher').id) for index in range(10)])
+    db.session.commit()
+    db.session.expire_all()
+
+    with count_queries() as statements:
+        classes = [live_class.to_dict() for live_class in LiveClass.query.order_by(LiveClass.id).all()]
+
+    assert [item['instructor'] for item in classes] == [f'User {index}' for index in range(1, 11)]
+    assert len(statements) == 1
+
+
+def test_teacher_panel_query_count_does_not_grow_with_messages(client, make_user):
+    admin = make_user('admin')
+    live_class = LiveClass(title='Class', channel_name='panel')
+    db.session.add(live_class)
+    db.session.commit()
+    class_id = live_class.id
+    login(client, admin)
+
+    add_messages(class_id, [make_user()])
+    db.session.remove()
+    with count_queries() as few:
+        assert client.get('/teacher').status_code == 200
+
+    add_messages(class_id, [make_user() for _ in range(9)])
+    db.session.remove()
+    with count_queries() as many:
+        response = client.get('/teacher')
+    assert response.status_code == 200
+    assert b'message 8' in response.data
+
+    assert len(many) == len(few)
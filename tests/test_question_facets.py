@@ -0,0 +1,44 @@
+"""
+Facet counts stay cached until the question bank changes
+"""
+
+import pytest
+
+from conftest import count_queries
+from models import db, Question
+from services.question_facets import question_facets
+from services.question_ingest import QuestionIngestor
+
+
+@pytest.fixture(autouse=True)
+def fresh_facets(app):
+    question_facets.invalidate()
+
+
+def question(number, topic):
+    return {'title': f'Question {number}', 'topic': topic, 'difficulty': 'easy',
+            'problem_statement': f'Find all primes p such that p squared plus {number} is also a prime number.'}
+
+
+def test_counts_are_cached_until_a_question_is_added():
+    db.session.add(Question(**question(1, 'Number Theory')))
+    db.session.commit()
+
+    assert question_facets.get()['topic'] == {'Number Theory': 1}
+    with count_queries() as statements:
+        question_facets.get()
+    assert statements == []
+
+    db.session.add(Question(**question(2, 'Algebra')))
+    db.session.commit()
+
+    assert question_facets.get()['topic'] == {'Algebra': 1, 'Number Theory': 1}
+
+
+def test_bulk_ingest_invalidates_the_counts():
+    assert question_facets.get()['total'] == 0
+
+    QuestionIngestor().ingest([question(number, 'Geometry') for number in range(3)])
+
+    facets = question_facets.get()
+    assert facets['total'] == 3 and facets['topic'] == {'Geometry': 3}
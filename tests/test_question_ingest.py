@@ -0,0 +1,110 @@
+"""
+Question ingestion: normalization, deduplication and batched writes
+"""
+
+import gzip
+import json
+
+from conftest import count_queries
+from models import db, Exam, ExamQuestion, Question, QuestionBucket
+from services.question_facets import question_facets
+from services.question_ingest import QuestionIngestor, content_hash, normalize_statement
+
+
+def question(statement, **fields):
+    return dict(fields, problem_statement=statement, source='Test')
+
+
+def statements():
+    return [row.problem_statement for row in db.session.query(Question.problem_statement).order_by(Question.id)]
+
+
+def test_normalization_ignores_case_width_spacing_and_punctuation():
+    assert normalize_statement('Find  ALL  primes p,\nsuch that p² + 2 is prime!') == \
+        normalize_statement('find all primes p such that p²+2 is prime !')
+    assert normalize_statement('Ｆｉｎｄ x＝1') == 'find x=1'
+    # Bengali vowel signs are part of the word, not noise
+    assert normalize_statement('সকল মৌলিক সংখ্যা নির্ণয় করো।') == 'সকল মৌলিক সংখ্যা নির্ণয় করো'
+    assert content_hash('Solve x + 1 = 2.') != content_hash('Solve x + 1 = 3.')
+
+
+def test_duplicates_in_the_input_and_the_bank_are_counted_not_stored(app):
+    ingestor = QuestionIngestor(batch_size=2)
+    ingestor.ingest([question('Find all primes p such that p squared plus two is prime.')])
+
+    report = ingestor.ingest([
+        question('FIND ALL PRIMES p such that p squared plus two is prime'),  # Already in the bank
+        question('Solve x plus one equals two.'),
+        question('Solve  x plus one equals two'),  # Same statement later in the input, in another batch
+        question('   '),
+        question('Prove the triangle inequality.', created_at='yesterday'),
+        question('Prove the triangle inequality.'),
+    ])
+
+    assert report == {'received': 6, 'inserted': 2, 'updated': 0, 'invalid': 2, 'duplicates_in_input': 1,
+                      'duplicates_existing': 1, 'near_duplicates': 0}
+    assert statements() == ['Find all primes p such that p squared plus two is prime.',
+                            'Solve x plus one equals two.', 'Prove the triangle inequality.']
+
+
+def test_upsert_refreshes_the_stored_question(app):
+    ingestor = QuestionIngestor()
+    ingestor.ingest([question('Solve x plus one equals two.', solution='x = 1', difficulty='easy')])
+
+    report = ingestor.ingest([question('solve x plus one equals two', solution='Subtract one: x = 1',
+                                       difficulty='medium')], upsert=True)
+    stored = Question.query.one()
+
+    assert report['updated'] == 1 and report['inserted'] == 0
+    assert stored.problem_statement == 'Solve x plus one equals two.'
+    assert (stored.solution, stored.difficulty) == ('Subtract one: x = 1', 'medium')
+
+
+def test_each_batch_checks_the_bank_with_one_query(app):
+    ingestor = QuestionIngestor(batch_size=50)
+
+    with count_queries() as statements:
+        report = ingestor.ingest(question(f'Compute the sum of the first {number} odd numbers.') for number in range(100))
+    lookups = [statement for statement in statements if 'FROM questions' in statement and 'content_hash IN' in statement]
+
+    assert report['inserted'] == 100
+    assert len(lookups) == 2
+
+
+def test_export_round_trips_through_the_ingest_command(app, tmp_path):
+    QuestionIngestor().ingest([
+        question('Solve x plus one equals two.', solution='x = 1', topic='Algebra', year=2020),
+        question('সকল মৌলিক সংখ্যা নির্ণয় করো।', solution_bangla='২ এবং ৩', topic='Number Theory'),
+    ])
+    before = list(map(json.loads, export(app, tmp_path / 'first.jsonl.gz')))
+    QuestionBucket.query.delete()  # SQLite leaves foreign keys unenforced, so nothing cascades
+    Question.query.delete()
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['ingest-questions', str(tmp_path / 'first.jsonl.gz')])
+
+    assert 'Ingested 2 of 2 questions' in result.output
+    assert list(map(json.loads, export(app, tmp_path / 'second.jsonl.gz'))) == before
+    assert before[1]['solution_bangla'] == '২ এবং ৩' and before[0]['year'] == 2020
+
+
+def test_upsert_marks_exam_papers_stale_and_refreshes_facets(app, tmp_path):
+    QuestionIngestor().ingest([question('Solve x plus one equals two.', title='Linear', topic='Algebra')])
+    exam = Exam(title='Mock', questions=[ExamQuestion(question_id=Question.query.one().id, answer_key='1')])
+    db.session.add(exam)
+    db.session.commit()
+    revision = exam.paper_revision
+    assert question_facets.get()['topic'] == {'Algebra': 1}
+
+    QuestionIngestor().ingest([question('Solve x plus one equals two.', title='Linear equation', topic='Equations')],
+                              upsert=True)
+    db.session.expire_all()
+
+    assert exam.paper_revision == revision + 1
+    assert question_facets.get()['topic'] == {'Equations': 1}
+
+
+def export(app, path):
+    app.test_cli_runner().invoke(args=['export-questions', str(path)])
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return f.read().splitlines()
@@ -0,0 +1,54 @@
+"""
+Keyset pagination of the question bank
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import login
+from models import db, Question
+from services.related_questions import related_questions
+
+
+@pytest.fixture
+def bank(client, make_user, monkeypatch):
+    monkeypatch.setattr(related_questions, 'related', lambda question_id: [])
+    start = datetime(2024, 1, 1)
+    # Pairs of questions share a timestamp, so pages must break ties on id
+    db.session.add_all([Question(title=f'Question {number}', problem_statement=f'Statement {number}',
+                                 topic='Algebra' if number % 3 else 'Geometry',
+                                 created_at=start + timedelta(minutes=number // 2))
+                        for number in range(25)])
+    db.session.commit()
+    login(client, make_user())
+    return client
+
+
+def walk(client, query):
+    titles, cursor = [], None
+    while True:
+        response = client.get(f'/api/questions?{query}' + (f'&cursor={cursor}' if cursor else ''))
+        page = response.get_json()
+        titles += [question['title'] for question in page['questions']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            return titles
+
+
+def test_pages_cover_every_question_once_newest_first(bank):
+    titles = walk(bank, 'limit=10')
+
+    expected = sorted(Question.query.all(), key=lambda q: (q.created_at, q.id), reverse=True)
+    assert titles == [question.title for question in expected]
+
+
+def test_pages_follow_the_topic_filter(bank):
+    titles = walk(bank, 'topic=Geometry&limit=3')
+
+    assert titles == [f'Question {number}' for number in range(24, -1, -3)]
+
+
+def test_bad_cursor_and_limit(bank):
+    assert bank.get('/api/questions?cursor=not-a-cursor').status_code == 400
+    assert len(bank.get('/api/questions?limit=-5').get_json()['questions']) == 1
@@ -0,0 +1,64 @@
+"""
+Full-text question search: Bangla tokenisation, ranking, highlighting and index sync
+"""
+
+import pytest
+
+from conftest import login
+from models import db, Question
+from services.question_search import question_search
+
+
+@pytest.fixture
+def questions(app):
+    rows = [
+        Question(title='ত্রিভুজের ক্ষেত্রফল', problem_statement='একটি ত্রিভুজের বাহুগুলো ৩, ৪ ও ৫ হলে ক্ষেত্রফল কত?'),
+        Question(title='Prime pairs', problem_statement='Find all primes p such that p + 2 is prime.',
+                 solution='Consider the triangle inequality is irrelevant here.'),
+        Question(title='Triangle inequality', problem_statement='Show that a + b > c for a triangle with sides a, b, c.'),
+        Question(title='<b>Markup</b> in a title', problem_statement='Solve x² = 4 <script>alert(1)</script>'),
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    return rows
+
+
+def ids(query, **filters):
+    return [result['id'] for result in question_search.search(query, **filters)[0]]
+
+
+def test_bangla_words_stay_whole(questions):
+    assert ids('ত্রিভুজের') == [1]
+    assert ids('ত্রিভু') == [1]  # The last word also matches as a prefix
+    # Without the combining marks as token characters, unicode61 would split ত্রিভুজের at its vowel signs
+    assert ids('ভুজের') == []
+
+
+def test_title_matches_rank_above_solution_matches(questions):
+    assert ids('triangle') == [3, 2]
+
+
+def test_snippets_are_escaped_and_highlighted(questions):
+    results, _ = question_search.search('x²')
+
+    assert [result['id'] for result in results] == [4]
+    assert '<mark>x²</mark>' in results[0]['snippet']
+    assert '<script>' not in results[0]['snippet'] and '&lt;script&gt;' in results[0]['snippet']
+
+
+def test_index_follows_updates_and_deletes(questions):
+    db.session.get(Question, 2).title = 'Twin primes'
+    db.session.delete(db.session.get(Question, 3))
+    db.session.commit()
+
+    assert ids('twin') == [2]
+    assert ids('inequality') == [2]  # Still in question 2's solution; question 3 is gone
+
+
+def test_query_syntax_is_treated_as_text(client, make_user, questions):
+    login(client, make_user())
+
+    assert ids('"prime" ( *') == [2]
+    assert ids('prime AND') == []  # AND is a word to find, not an operator
+    response = client.get('/api/questions/search?q=prime&limit=-1')
+    assert [result['id'] for result in response.get_json()['results']] == [2]
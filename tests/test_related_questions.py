@@ -0,0 +1,69 @@
+"""
+Related-question index: neighbours, and picking up writes it was not told about
+"""
+
+import threading
+
+import pytest
+
+from models import db, Question
+from services.related_questions import related_questions
+
+STATEMENTS = [
+    'Find every prime p for which p squared plus two is also prime.',
+    'Find all primes p such that p squared plus two is prime as well.',
+    'A triangle has sides three four and five; find the radius of its incircle.',
+    'Find the radius of the circle inscribed in the triangle with sides five twelve and thirteen.',
+]
+
+
+@pytest.fixture
+def index(app, monkeypatch):
+    # The index outlives the per-test database, whose ids start over
+    monkeypatch.setattr(related_questions, 'rebuild_growth', 1.0)  # Fold additions in rather than rebuild
+    related_questions._reset()
+    related_questions.built = False
+    db.session.add_all([Question(title=f'Question {number}', problem_statement=statement, difficulty='easy',
+                                 topic='Number Theory' if number < 2 else 'Geometry')
+                        for number, statement in enumerate(STATEMENTS)])
+    db.session.commit()
+    related_questions.build()
+    yield related_questions
+    related_questions._reset()
+    related_questions.built = False
+
+
+def sync_now(index):
+    """Run the refresh a request would start, and wait for it"""
+    index.checked_at = 0
+    index.related(1)
+    index.syncer.join(timeout=10)
+
+
+def test_similar_questions_are_neighbours(index):
+    assert [item['id'] for item in index.related(1)][:1] == [2]
+    assert [item['id'] for item in index.related(3)][:1] == [4]
+
+
+def test_questions_written_elsewhere_are_picked_up(index):
+    # Written without telling the index, as another worker would
+    db.session.get(Question, 4).title = 'Incircle radius'
+    db.session.add(Question(title='Question 5', topic='Number Theory', difficulty='easy',
+                            problem_statement='Find all primes p such that p squared plus two is also a prime.'))
+    db.session.commit()
+
+    sync_now(index)
+
+    assert index.related(3)[0]['title'] == 'Incircle radius'
+    assert 5 in [item['id'] for item in index.related(1)]
+
+
+def test_refresh_does_not_sync_in_the_request(index, monkeypatch):
+    index.checked_at = 0
+    calls = []
+    monkeypatch.setattr(index, 'sync', lambda: calls.append(threading.current_thread().name))
+
+    index.related(1)
+    index.syncer.join(timeout=10)
+
+    assert calls == ['related-questions-sync']
@@ -0,0 +1,82 @@
+"""
+Model calls: in-flight cap, timeouts and circuit breaker
+"""
+
+import threading
+import time
+
+import pytest
+
+from services.resilience import ModelUnavailableError, ResilientCaller
+
+
+def fail():
+    raise ValueError('provider error')
+
+
+def test_breaker_opens_after_repeated_failures_and_recovers_after_a_trial():
+    caller = ResilientCaller(failure_threshold=3, reset_timeout=0.2)
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            caller.call(fail)
+
+    with pytest.raises(ModelUnavailableError):
+        caller.call(lambda: 'not called')
+    assert caller.stats()['state'] == 'open'
+
+    time.sleep(0.25)
+    assert caller.call(lambda: 'ok') == 'ok'
+    stats = caller.stats()
+    assert stats['state'] == 'closed' and stats['short_circuited'] == 1 and stats['failures'] == 3
+
+
+def test_failed_trial_reopens_the_breaker():
+    caller = ResilientCaller(failure_threshold=1, reset_timeout=0.1)
+    with pytest.raises(ValueError):
+        caller.call(fail)
+    time.sleep(0.15)
+
+    with pytest.raises(ValueError):
+        caller.call(fail)
+
+    assert caller.stats()['state'] == 'open'
+
+
+def test_slow_call_times_out_but_keeps_its_slot_until_it_ends():
+    caller = ResilientCaller(max_in_flight=1, timeout=0.1, slot_wait=0.05)
+    release = threading.Event()
+
+    with pytest.raises(ModelUnavailableError):
+        caller.call(release.wait)
+    with pytest.raises(ModelUnavailableError):
+        caller.call(lambda: 'no free slot')
+
+    release.set()
+    time.sleep(0.05)
+    assert caller.call(lambda: 'ok') == 'ok'
+    assert caller.stats()['timeouts'] == 1 and caller.stats()['rejected'] == 1
+
+
+def test_stream_yields_chunks_and_frees_its_slot():
+    caller = ResilientCaller(max_in_flight=1, slot_wait=0.05)
+
+    assert list(caller.stream(lambda: iter(['a', 'b']))) == ['a', 'b']
+    chunks = caller.stream(lambda: iter(['c', 'd']))
+    assert next(chunks) == 'c'
+    chunks.close()  # Client went away mid-stream
+
+    assert caller.call(lambda: 'ok') == 'ok'
+    assert caller.stats()['failures'] == 0
+
+
+def test_tutor_answers_from_stale_cache_or_fallback_while_the_breaker_is_open(tutor):
+    tutor.cache.ttl = 0  # Every cached answer is already stale
+    fresh = tutor.ask('What is a prime?')
+    tutor.caller.state, tutor.caller.opened_at = 'open', time.time()
+    tutor.fallbacks.append(lambda question: f'precomputed: {question}')
+
+    assert tutor.ask('What is a prime?') == fresh
+    assert tutor.ask('What is a square?') == 'precomputed: What is a square?'
+    tutor.fallbacks.clear()
+    with pytest.raises(ModelUnavailableError):
+        tutor.ask('What is a cube?', raise_errors=True)
@@ -0,0 +1,68 @@
+"""
+Tutor response cache: memory LRU over a SQLite tier with TTL and size eviction
+"""
+
+import pytest
+
+from services import response_cache
+from services.response_cache import ResponseCache, make_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ResponseCache(str(tmp_path / 'cache.db'), ttl_seconds=60, max_entries=3, memory_entries=2)
+
+
+def test_keys_ignore_case_and_spacing():
+    assert make_key('ask', 'What is  a Prime?', None) == make_key('ask', ' what is a prime? ', None)
+    assert make_key('ask', 'What is a prime?') != make_key('explain', 'What is a prime?')
+
+
+def test_least_recently_used_entries_leave_memory_but_stay_on_disk(cache):
+    cache.set('a', 'A')
+    cache.set('b', 'B')
+    assert cache.get('a') == 'A'  # b is now the least recently used
+    cache.set('c', 'C')
+
+    assert list(cache.memory) == ['a', 'c']
+    assert cache.get('b') == 'B'
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_expired_entries_miss_unless_stale_is_allowed(cache, clock):
+    cache.set('a', 'A')
+    clock.now += 61
+
+    assert cache.get('a') is None
+    assert cache.get('a', allow_stale=True) == 'A'
+
+
+def test_eviction_drops_expired_then_least_recently_read_rows(cache, clock):
+    cache.set('old', 'expires first')
+    clock.now += 30
+    for key in ('a', 'b', 'c', 'd'):
+        clock.now += 1
+        cache.set(key, key.upper())
+    clock.now += 31  # 'old' has expired, the rest have not
+    cache.memory.clear()
+    assert cache.get('a') == 'A'  # Read from disk: now the most recently used
+
+    cache._evict(clock.now)
+
+    cache.memory.clear()
+    assert [key for key in ('old', 'a', 'b', 'c', 'd') if cache.get(key)] == ['a', 'c', 'd']
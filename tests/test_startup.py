@@ -0,0 +1,19 @@
+"""
+Importing the app (as every flask command and migration does) must not start background workers
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_starts_no_background_threads(tmp_path):
+    script = 'import threading, app; print(sorted(thread.name for thread in threading.enumerate()))'
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'startup.db'}")
+
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True)
+
+    assert result.stdout.strip().splitlines()[-1] == "['MainThread']"
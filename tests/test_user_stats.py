@@ -0,0 +1,85 @@
+"""
+Per-student dashboard stats kept current from submission writes
+"""
+
+from datetime import datetime, timedelta
+
+from conftest import count_queries, login
+from models import db, Exam, Submission, UserStats
+from services.user_stats import user_stats
+
+START = datetime(2026, 3, 1, 9, 0)
+
+
+def snapshot(user_id):
+    db.session.expire_all()
+    stats = db.session.get(UserStats, user_id)
+    return stats and (stats.attempt_count, stats.score_sum, stats.best_score, stats.last_activity_at, stats.recent)
+
+
+def submit(user_id, exam_ids, scores):
+    submissions = [Submission(user_id=user_id, exam_id=exam_ids[index % len(exam_ids)], score=score,
+                              submitted_at=START + timedelta(days=index)) for index, score in enumerate(scores)]
+    db.session.add_all(submissions)
+    db.session.commit()
+    return submissions
+
+
+def exams():
+    items = [Exam(title=f'Mock {number}') for number in range(2)]
+    db.session.add_all(items)
+    db.session.commit()
+    return [exam.id for exam in items]
+
+
+def test_stats_follow_inserts_and_keep_the_latest_five(app, make_user):
+    student = make_user()
+
+    submit(student.id, exams(), [40, 90, 70, 10, 50, 60])
+    attempts, score_sum, best, last, recent = snapshot(student.id)
+
+    assert (attempts, score_sum, best, last) == (6, 320, 90, START + timedelta(days=5))
+    assert [entry['score'] for entry in recent] == [60, 50, 10, 70, 90]
+    assert recent[0]['exam_title'] == 'Mock 1'
+
+
+def test_updates_and_deletes_match_a_full_rebuild(app, make_user):
+    student, other = make_user(), make_user()
+    papers = exams()
+    first, best, _ = submit(student.id, papers, [40, 90, 70])
+    submit(other.id, papers, [30])
+
+    first.score = 55  # A regrade below the best score applies a delta
+    db.session.commit()
+    best.score = 20  # Lowering the best score recomputes the row
+    db.session.commit()
+    incremental = snapshot(student.id)
+    assert incremental[:3] == (3, 145, 70)
+
+    user_stats.rebuild()
+    assert snapshot(student.id) == incremental
+
+    db.session.delete(first)
+    db.session.commit()
+    assert snapshot(student.id)[:3] == (2, 90, 70)
+    assert snapshot(other.id)[:3] == (1, 30, 30)
+
+
+def test_dashboard_reads_one_stats_row_however_long_the_history(client, make_user):
+    student = make_user()
+    login(client, student)
+    student_id, papers = student.id, exams()
+
+    submit(student_id, papers, [50])
+    client.get('/dashboard')  # Fills the site-wide summary cache
+    db.session.remove()
+    with count_queries() as few:
+        assert client.get('/dashboard').status_code == 200
+
+    submit(student_id, papers, [60] * 30)
+    db.session.remove()
+    with count_queries() as many:
+        response = client.get('/dashboard')
+
+    assert response.status_code == 200
+    assert len(many) == len(few)